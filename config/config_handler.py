@@ -1,15 +1,20 @@
 import os, json
-import openai
 import streamlit as st
-from neo4j import GraphDatabase
 
 CONFIG_FILE = "config.json"
 
 default_config = {
+    "graph": {
+        "backend": "neo4j",
+        "memory_file": ".cache/sdgraph.json"
+    },
     "neo4j": {
         "URI": "bolt://localhost:7687",
         "Username": "neo4j",
-        "Password": "password"
+        "Password": "password",
+        "MaxConnectionPoolSize": 50,
+        "MaxConnectionLifetime": 3600,
+        "BatchSize": 1000
     },
     "openai": {
         "api_type": "",
@@ -17,6 +22,10 @@ default_config = {
         "api_version": "",
         "api_base": "",
         "engine": ""
+    },
+    "cache": {
+        "snapshot_dir": "",
+        "max_snapshots": 32
     }
 }
 
@@ -40,17 +49,22 @@ def load_config():
 def save_config(config):
     with open(CONFIG_FILE, "w") as f:
         json.dump(config, f, indent=4)
+    from core.driver_registry import close_neo4j_drivers
+    close_neo4j_drivers(keep=(config["neo4j"]["URI"], config["neo4j"]["Username"]))
     st.success("Configuration saved successfully!")
 
-def test_neo4j_connection(uri, username, password):
+def test_neo4j_connection(uri, username, password, **pool_options):
+    # neo4j and openai are only imported when a connection is actually tested
+    from core.driver_registry import get_neo4j_driver, get_pool_metrics
     try:
-        with GraphDatabase.driver(uri, auth=(username, password)) as driver:
-            driver.verify_connectivity()
+        get_neo4j_driver(uri, username, password, **pool_options).verify_connectivity()
         st.success("Successfully connected to Neo4j!")
+        st.json(get_pool_metrics(uri, username))
     except Exception as e:
         st.error(f"Neo4j connection failed: {e}")
 
 def test_openai_connection(api_type, api_key, api_version, api_base, engine):
+    import openai
     try:
         openai.api_type = api_type
         openai.api_key = api_key
@@ -67,13 +81,31 @@ def test_openai_connection(api_type, api_key, api_version, api_base, engine):
 def show_configuration(config):
     st.title("Configuration")
 
+    st.subheader("Graph Backend")
+    backends = ["neo4j", "memory"]
+    config["graph"]["backend"] = st.selectbox(
+        "Backend", backends, index=backends.index(config["graph"]["backend"]),
+        help="memory: in-process graph persisted to a JSON file, no Neo4j server needed"
+    )
+    if config["graph"]["backend"] == "memory":
+        config["graph"]["memory_file"] = st.text_input("Graph file", config["graph"]["memory_file"])
+
     st.subheader("Neo4j Settings")
     config["neo4j"]["URI"] = st.text_input("URI", config["neo4j"]["URI"])
     config["neo4j"]["Username"] = st.text_input("Username", config["neo4j"]["Username"])
     config["neo4j"]["Password"] = st.text_input("Password", config["neo4j"]["Password"], type="password")
+    config["neo4j"]["MaxConnectionPoolSize"] = st.number_input("Max Connection Pool Size", min_value=1, value=int(config["neo4j"]["MaxConnectionPoolSize"]))
+    config["neo4j"]["MaxConnectionLifetime"] = st.number_input("Max Connection Lifetime (seconds)", min_value=1, value=int(config["neo4j"]["MaxConnectionLifetime"]))
+    config["neo4j"]["BatchSize"] = st.number_input("Bulk Load Batch Size (rows)", min_value=1, value=int(config["neo4j"]["BatchSize"]))
 
     if st.button("Test Neo4j Connection"):
-        test_neo4j_connection(config["neo4j"]["URI"], config["neo4j"]["Username"], config["neo4j"]["Password"])
+        from core.driver_registry import pool_options_from_config
+        test_neo4j_connection(
+            config["neo4j"]["URI"],
+            config["neo4j"]["Username"],
+            config["neo4j"]["Password"],
+            **pool_options_from_config(config["neo4j"])
+        )
 
     st.subheader("OpenAI Settings")
     config["openai"]["api_type"] = st.text_input("API Type", config["openai"]["api_type"])
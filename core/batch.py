@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from core.data_cache import build_cache, dataset_version, load_dataset
+from core.distance_engine import StopDistanceEngine
+from core.indicators.sdg_11_2_1 import Indicator11_2_1
+from core.spatial_hierarchy import SpatialHierarchy
+
+# Worker state, loaded once per process by _init_worker
+_worker = {}
+
+
+def _init_worker(years):
+    population_df = load_dataset("population", years=years)
+    _worker["population"] = population_df
+    _worker["units"] = load_dataset("population_geo")
+    _worker["engine"] = StopDistanceEngine(load_dataset("transport_geo"), load_dataset("transport", years=years))
+    _worker["hierarchy"] = SpatialHierarchy(population_df["CODE_IRIS"].astype(str).unique())
+
+
+def regions_of(population_df, region_level):
+    """ Codes of the regions (communes, départements...) that the batch is split into. """
+    hierarchy = SpatialHierarchy(population_df["CODE_IRIS"].astype(str).unique())
+    return sorted(pd.unique(hierarchy.code_column(population_df["CODE_IRIS"], region_level)))
+
+
+def compute_11_2_1(region, region_level, params):
+    """ 11.2.1 shares (per row and population-weighted) of every unit of one region, per year and threshold. """
+    population_df = _worker["population"]
+    hierarchy = _worker["hierarchy"]
+    in_region = hierarchy.code_column(population_df["CODE_IRIS"], region_level) == region
+    population_df = population_df[in_region]
+    codes = set(population_df["CODE_IRIS"].astype(str)) | set(population_df["CODE_COMMUNE"].astype(str))
+    units = _worker["units"][_worker["units"]["id"].astype(str).isin(codes)]
+
+    indicator = Indicator11_2_1(population_df, units, _worker["engine"], params["method"], params.get("per_year", True))
+    filters = {"modes": params["modes"], "fclasses": params["fclasses"], "level": params["level"]}
+    shares = indicator.sweep(params["thresholds"], by_unit=True, **filters)
+    weighted = indicator.sweep(params["thresholds"], by_unit=True, weighted=True, **filters)
+    result = pd.concat(
+        [shares.stack().rename("share"), weighted.stack().rename("weighted_share")], axis=1
+    ).rename_axis(["unit_id", "ANNEE_DONNEES", "threshold"]).reset_index()
+    result.insert(0, "region", region)
+    return result
+
+
+INDICATORS = {
+    "11.2.1": compute_11_2_1
+}
+
+
+def _run_key(indicator, params, region_level):
+    payload = {"indicator": indicator, "region_level": region_level, "params": params,
+               "data": dataset_version("population", "population_geo", "transport", "transport_geo")}
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def _run_region(indicator, region, region_level, params, part_path):
+    result = INDICATORS[indicator](region, region_level, params)
+    tmp_path = f"{part_path}.tmp"
+    result.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, part_path)
+    return region, len(result)
+
+
+def run_batch(indicator, output, params, years=None, region_level="COMMUNE", workers=None, log=print):
+    """ Computes an indicator region by region over a process pool and writes one Parquet or CSV file.
+
+    Every finished region is written to its own part file under <output>.parts/<run key>/, so an interrupted run
+    resumes with the regions that are still missing. The parts are then streamed into output, one at a time.
+    """
+    if indicator not in INDICATORS:
+        raise ValueError(f"Unknown indicator {indicator}; available: {', '.join(INDICATORS)}")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    parts_dir = os.path.join(f"{output}.parts", _run_key(indicator, {**params, "years": years}, region_level))
+    os.makedirs(parts_dir, exist_ok=True)
+
+    regions = regions_of(load_dataset("population", columns=["CODE_IRIS"], years=years), region_level)
+    part_paths = {region: os.path.join(parts_dir, f"{region}.parquet") for region in regions}
+    todo = [region for region in regions if not os.path.exists(part_paths[region])]
+    log(f"{len(regions)} regions, {len(regions) - len(todo)} already done, {len(todo)} to compute")
+
+    if todo:
+        # Parquet caches are built once here rather than by every worker at the same time
+        for name in ("population", "population_geo", "transport", "transport_geo"):
+            build_cache(name)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(years,)) as executor:
+            futures = [
+                executor.submit(_run_region, indicator, region, region_level, params, part_paths[region])
+                for region in todo
+            ]
+            for done, future in enumerate(as_completed(futures), 1):
+                region, rows = future.result()
+                log(f"[{done}/{len(todo)}] {region}: {rows} rows")
+
+    _combine(regions, part_paths, output)
+    log(f"Results written to {output}")
+    return output
+
+
+def _combine(regions, part_paths, output):
+    tmp_path = f"{output}.tmp"
+    if output.endswith(".csv"):
+        pd.DataFrame().to_csv(tmp_path, index=False)
+        for i, region in enumerate(regions):
+            pd.read_parquet(part_paths[region]).to_csv(tmp_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+    else:
+        writer = None
+        try:
+            for region in regions:
+                table = pq.read_table(part_paths[region])
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, table.schema)
+                writer.write_table(table.cast(writer.schema))
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            pq.write_table(pa.table({}), tmp_path)
+    os.replace(tmp_path, output)
@@ -0,0 +1,164 @@
+import json
+import threading
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from core.intervals import IntervalTree, overlap_fraction, parse_interval
+from core.spatial_hierarchy import SIM_CONTAINS, SIM_EQUAL, SIM_WITHIN, SpatialHierarchy
+
+# TSM weights: space, time, context, reliability, completeness (precision)
+WEIGHTS = {"s": 0.25, "t": 0.25, "c": 0.2, "r": 0.15, "p": 0.15}
+
+def _tokens(context):
+    return {token.strip().lower() for token in str(context or "").split(",") if token.strip()}
+
+
+class DatasetCatalog:
+    """ Registered datasets with their TSM metadata (D_s, D_t, D_c, D_r, D_p), indexed for ranking many at once.
+
+    Spatial codes go into a hierarchy index (region > département > commune > IRIS) for containment matching, context
+    strings into a sparse dataset x token matrix, times are parsed into year intervals (arrays plus an interval
+    tree), and reliability / completeness go into aligned arrays. Datasets come from add / add_many and from the
+    :Database nodes of the graph, synced by refresh.
+    """
+
+    def __init__(self):
+        self._added = {}
+        self._rows_key = None
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.names = []
+        self.entries = []
+        self.hierarchy = SpatialHierarchy()
+        self._space_codes = {}
+        self._context_tokens = {}
+        self._arrays = None
+        self._tree = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, D_s="", D_t="", D_c="", D_r=0.0, D_p=0.0, **extra):
+        if name in self.names:
+            return
+        self._added[name] = {"D_s": D_s, "D_t": D_t, "D_c": D_c, "D_r": D_r, "D_p": D_p, **extra}
+        self._index(name, D_s, D_t, D_c, D_r, D_p, **extra)
+
+    def _index(self, name, D_s="", D_t="", D_c="", D_r=0.0, D_p=0.0, **extra):
+        index = len(self.names)
+        self.names.append(name)
+        self.entries.append({"D_s": D_s or "", "D_t": D_t or "", "D_c": D_c or "", "D_r": float(D_r or 0.0),
+                             "D_p": float(D_p or 0.0), **extra})
+        if D_s:
+            code = self.hierarchy.add(D_s)
+            self._space_codes.setdefault(code, []).append(index)
+        for token in _tokens(D_c):
+            self._context_tokens.setdefault(token, []).append(index)
+        self._arrays = None
+        self._tree = None
+
+    def add_many(self, datasets):
+        for name, data in datasets.items():
+            self.add(name, **data)
+
+    def refresh(self, backend):
+        """ Syncs the catalog with the :Database nodes of the graph, whichever process wrote them: when their rows
+        changed (registrations, removals, metadata updates), it is rebuilt from the added datasets and those rows.
+        Returns whether it was rebuilt. Datasets added with add take precedence over nodes of the same name. """
+        rows = sorted(backend.catalog_rows(list(self._added)), key=lambda row: row["name"])
+        key = json.dumps(rows, sort_keys=True, default=str)
+        with self._lock:
+            if key == self._rows_key:
+                return False
+            self._reset()
+            for name, data in self._added.items():
+                self._index(name, **data)
+            for row in rows:
+                self._index(**row)
+            self._rows_key = key
+        return True
+
+    def _get_arrays(self):
+        if self._arrays is None:
+            intervals = [parse_interval(e["D_t"]) for e in self.entries]
+            self._arrays = {
+                "start": np.array([i[0] if i else np.nan for i in intervals], dtype=float),
+                "end": np.array([i[1] if i else np.nan for i in intervals], dtype=float),
+                "D_r": np.array([e["D_r"] for e in self.entries], dtype=float),
+                "D_p": np.array([e["D_p"] for e in self.entries], dtype=float)
+            }
+            tokens = list(self._context_tokens)
+            datasets = [index for token in tokens for index in self._context_tokens[token]]
+            columns = [j for j, token in enumerate(tokens) for _ in self._context_tokens[token]]
+            self._arrays["tokens"] = np.array(tokens, dtype=str)
+            self._arrays["context"] = csr_matrix(
+                (np.ones(len(datasets)), (datasets, columns)), shape=(len(self), len(tokens))
+            )
+        return self._arrays
+
+    def sim_space(self, q_s):
+        """ 1.0 for the same unit, 0.75 for datasets covering an area that contains q_s, 0.5 for datasets inside q_s. """
+        scores = np.zeros(len(self))
+        query = self.hierarchy.add(q_s)
+        for code in self.hierarchy.within(query):
+            scores[self._space_codes.get(code, [])] = SIM_WITHIN
+        for code in self.hierarchy.ancestors[query]:
+            scores[self._space_codes.get(code, [])] = SIM_CONTAINS
+        scores[self._space_codes.get(query, [])] = SIM_EQUAL
+        return scores
+
+    def sim_time(self, q_t):
+        """ Share of the query period covered by each dataset period (0 when either cannot be parsed). """
+        query = parse_interval(q_t)
+        arrays = self._get_arrays()
+        if query is None:
+            return np.zeros(len(self))
+        return np.nan_to_num(overlap_fraction(arrays["start"], arrays["end"], query))
+
+    def overlapping(self, q_t, covering=False):
+        """ Names of the datasets whose period overlaps (or, with covering, contains) the query period. """
+        query = parse_interval(q_t)
+        if query is None:
+            return []
+        if self._tree is None:
+            self._tree = IntervalTree(
+                (interval[0], interval[1], index)
+                for index, interval in enumerate(parse_interval(e["D_t"]) for e in self.entries) if interval
+            )
+        indices = self._tree.covering(*query) if covering else self._tree.overlapping(*query)
+        return [self.names[index] for index in sorted(indices)]
+
+    def sim_context(self, q_c):
+        """ 1.0 when the query context is one of (or part of one of) the dataset context tokens, else 0. """
+        arrays = self._get_arrays()
+        query = str(q_c).strip().lower()
+        if not len(arrays["tokens"]):
+            return np.zeros(len(self))
+        # Tokens containing the query, matched over the whole vocabulary at once
+        matched = (np.char.find(arrays["tokens"], query) >= 0).astype(float)
+        return (arrays["context"] @ matched > 0).astype(float)
+
+    def score(self, query, weights=WEIGHTS):
+        """ TSM details of every dataset for a query {q_s, q_t, q_c}, computed in one vectorized pass. """
+        arrays = self._get_arrays()
+        sims = {
+            "Spatial Sim": self.sim_space(query["q_s"]),
+            "Temporal Sim": self.sim_time(query["q_t"]),
+            "Context Sim": self.sim_context(query["q_c"]),
+            "Reliability": arrays["D_r"],
+            "Completeness": arrays["D_p"]
+        }
+        w = np.array([weights["s"], weights["t"], weights["c"], weights["r"], weights["p"]])
+        tsm = np.column_stack(list(sims.values())) @ w / w.sum()
+        return pd.DataFrame({"Source": self.names, **sims, "Final TSM Score": np.round(tsm, 3)})
+
+    def top_k(self, query, k=10, weights=WEIGHTS):
+        """ The k best datasets for the query, best first. """
+        details = self.score(query, weights)
+        scores = details["Final TSM Score"].to_numpy()
+        if k < len(scores):
+            best = np.argpartition(-scores, k)[:k]
+            details = details.iloc[best]
+        return details.sort_values("Final TSM Score", ascending=False, kind="stable").reset_index(drop=True)
@@ -0,0 +1,236 @@
+import difflib
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+import openai
+
+MAPPING_CACHE_FILE = os.path.join(".cache", "column_mapping.json")
+
+# Column-name hints (French and English) for the Attribute ids of the SDG graph
+ATTRIBUTE_HINTS = {
+    "Space": ["code", "iris", "commune", "insee", "geo", "zone", "region", "departement", "dep", "osm", "id", "lieu"],
+    "Time": ["annee", "year", "date", "time", "periode", "period", "mois", "month"],
+    "Value": ["valeur", "value", "nombre", "count", "total", "pop", "effectif", "nb"],
+    "Age": ["age", "tranche"],
+    "Sex": ["sexe", "sex", "gender", "genre"],
+    "Disability": ["handicap", "disability", "pmr"],
+    "Capacity": ["fclass", "capacity", "capacite", "class", "type", "mode"]
+}
+
+# Value patterns: an attribute is suggested when most sample values match
+VALUE_PATTERNS = {
+    "Time": re.compile(r"^(1[89]|20)\d{2}(-\d{2}(-\d{2})?)?([ T].*)?$"),
+    "Space": re.compile(r"^(\d{5}|\d{9}|2[AB]\d{3}|2[AB]\d{7})$"),
+    "Age": re.compile(r"^\d{1,3}\s*(-|à|to)\s*\d{1,3}(\s*ans)?$|^\d{1,3}\s*(ans)?\s*(et plus|\+)$", re.IGNORECASE),
+    "Sex": re.compile(r"^(m|f|h|male|female|homme|femme|hommes|femmes)$", re.IGNORECASE),
+    "Value": re.compile(r"^-?\d+([.,]\d+)?$")
+}
+
+# Errors worth another attempt; any other failure (bad key, invalid request, unreadable answer) is reported at once
+TRANSIENT_ERRORS = (
+    TimeoutError,
+    openai.error.Timeout,
+    openai.error.APIConnectionError,
+    openai.error.RateLimitError,
+    openai.error.ServiceUnavailableError,
+    openai.error.TryAgain
+)
+
+_cache_lock = threading.Lock()
+
+
+def _normalize(text):
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+
+def _name_score(column, attribute):
+    tokens = _normalize(column).split()
+    hints = ATTRIBUTE_HINTS.get(attribute, []) + [_normalize(attribute)]
+    best = 0.0
+    for token in tokens:
+        for hint in hints:
+            if token == hint:
+                best = max(best, 1.0)
+            elif len(hint) > 2 and (token.startswith(hint) or hint in token):
+                best = max(best, 0.8)
+            else:
+                # Typos and abbreviations only: loose fuzzy matches are ignored
+                ratio = difflib.SequenceMatcher(None, token, hint).ratio()
+                if ratio >= 0.8:
+                    best = max(best, ratio * 0.7)
+    return best
+
+
+def _value_score(samples, attribute):
+    pattern = VALUE_PATTERNS.get(attribute)
+    values = [str(v).strip() for v in samples if v is not None and str(v).strip()]
+    if pattern is None or not values:
+        return 0.0
+    return sum(bool(pattern.match(v)) for v in values) / len(values)
+
+
+def heuristic_match(column, samples, attributes, min_score=0.5):
+    """ Offline matcher: name and value-pattern similarity of a column against the Attribute ids. """
+    scores = {
+        attribute: max(_name_score(column, attribute), 0.9 * _value_score(samples, attribute))
+        for attribute in attributes
+    }
+    if not scores:
+        return "Drop"
+    attribute = max(scores, key=scores.get)
+    return attribute if scores[attribute] >= min_score else "Drop"
+
+
+def mapping_key(column, samples, attributes):
+    samples_hash = hashlib.sha1(json.dumps([str(v) for v in samples]).encode("utf-8")).hexdigest()
+    return hashlib.sha1(json.dumps([column, samples_hash, sorted(attributes)]).encode("utf-8")).hexdigest()
+
+
+def _load_cache(path):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def _save_cache(cache, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, path)
+
+
+def build_prompt(unique_values, attributes):
+    return f"""
+    You are an AI assistant that maps CSV columns to a predefined list of attributes.
+    The user has provided a DataFrame with the following columns and example unique values:
+
+    {json.dumps(unique_values, indent=2, default=str)}
+
+    The available attributes to map to are:
+    {attributes}
+
+    Return a JSON object mapping each column name to either one of the attributes or "Drop".
+    """
+
+
+def openai_completion(prompt, config, timeout):
+    """ Default completion endpoint: the configured OpenAI ChatCompletion engine. Returns the message text. """
+    response = openai.ChatCompletion.create(
+        engine=config["openai"]["engine"],
+        temperature=0,
+        request_timeout=timeout,
+        messages=[{"role": "system", "content": "You are an expert data classifier."},
+                  {"role": "user", "content": prompt}]
+    )
+    if "choices" in response and response["choices"]:
+        return response["choices"][0]["message"]["content"]
+    raise ValueError("Empty or invalid OpenAI response")
+
+
+def _ask(completion, batch, attributes, config, timeout, retries):
+    """ One LLM request for a batch of (column, samples); returns the valid part of the answer and the error
+    that stopped the request, if any. Only TRANSIENT_ERRORS are retried. """
+    unique_values = {column: samples[:10] for column, samples in batch}
+    for attempt in range(retries + 1):
+        try:
+            text = completion(build_prompt(unique_values, attributes), config, timeout)
+        except TRANSIENT_ERRORS as e:
+            if attempt == retries:
+                return {}, f"{type(e).__name__}: {e} (after {retries + 1} attempts)"
+            time.sleep(0.5 * 2 ** attempt)
+            continue
+        except Exception as e:
+            return {}, f"{type(e).__name__}: {e}"
+        try:
+            answer = json.loads(text)
+        except json.JSONDecodeError as e:
+            return {}, f"Invalid JSON answer: {e}"
+        if not isinstance(answer, dict):
+            return {}, "Invalid answer: not a JSON object"
+        return {
+            column: answer[column] for column, _ in batch
+            if answer.get(column) in attributes or answer.get(column) == "Drop"
+        }, None
+
+
+def map_columns_batch(datasets, attributes, config=None, completion=None, use_llm=True, batch_size=50,
+                      max_workers=4, timeout=30, retries=2, cache_path=MAPPING_CACHE_FILE):
+    """ Maps the columns of many datasets at once.
+
+    datasets is a dict of dataset name -> {column: sample values}. Cached answers are reused; misses of all
+    datasets are grouped into LLM requests of batch_size columns, sent with at most max_workers in flight.
+    Whatever the LLM does not answer (no config, timeout, invalid reply) falls back to heuristic_match.
+    Returns dataset name -> {column: {"attribute", "source", "error"}}, source being "llm" or "heuristic" and
+    error the reason the LLM answer is missing (None when it was not asked for).
+    """
+    with _cache_lock:
+        cache = _load_cache(cache_path)
+
+    keys = {}
+    misses = {}
+    for name, samples in datasets.items():
+        for column, values in samples.items():
+            key = mapping_key(column, values, attributes)
+            keys[(name, column)] = key
+            if key not in cache:
+                misses.setdefault(key, (column, values))
+
+    answers = {}
+    errors = {}
+    if misses and use_llm and not (completion is not None or (config and config["openai"].get("engine"))):
+        errors = {key: "OpenAI is not configured" for key in misses}
+    elif misses and use_llm:
+        if completion is None:
+            completion = openai_completion
+            openai.api_type = config["openai"]["api_type"]
+            openai.api_key = config["openai"]["api_key"]
+            openai.api_version = config["openai"]["api_version"]
+            openai.api_base = config["openai"]["api_base"]
+        # A column name may only appear once per request, since the answer is keyed by column name
+        batches = []
+        for key, entry in misses.items():
+            batch = next((batch for batch in batches if len(batch) < batch_size and entry[0] not in {e[0] for _, e in batch}), None)
+            if batch is None:
+                batch = []
+                batches.append(batch)
+            batch.append((key, entry))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(
+                lambda batch: (batch, _ask(completion, [entry for _, entry in batch], attributes, config, timeout, retries)),
+                batches
+            )
+            for batch, (answer, error) in results:
+                for key, (column, _) in batch:
+                    if column in answer:
+                        answers[key] = answer[column]
+                    else:
+                        errors[key] = error or "No valid attribute in the answer"
+
+    # Only LLM answers are persisted; the heuristic is cheap and is recomputed until the LLM answers
+    if answers:
+        with _cache_lock:
+            cache = {**_load_cache(cache_path), **cache, **answers}
+            _save_cache(cache, cache_path)
+
+    def resolve(key, column, values):
+        if cache.get(key):
+            return {"attribute": cache[key], "source": "llm", "error": None}
+        return {"attribute": heuristic_match(column, values, attributes), "source": "heuristic", "error": errors.get(key)}
+
+    return {
+        name: {column: resolve(keys[(name, column)], column, values) for column, values in samples.items()}
+        for name, samples in datasets.items()
+    }
+
+
+def map_columns(samples, attributes, config=None, **options):
+    """ Maps the columns of one dataset, given as {column: sample values}; same result as map_columns_batch. """
+    return map_columns_batch({"dataset": samples}, attributes, config, **options)["dataset"]
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import pandas as pd
+import geopandas as gpd
+
+CACHE_DIR = os.path.join(".cache", "parquet")
+
+# Compact dtypes for the known columns of any dataset, applied when the Parquet cache is built
+SCHEMA = {
+    "CODE_IRIS": "category",
+    "CODE_COMMUNE": "category",
+    "MODE_TRANS": "category",
+    "ANNEE_DONNEES": "int16",
+    "VALEUR": "float32",
+    "osm_id": "category",
+    "fclass": "category",
+    "year": "int16"
+}
+SCHEMA_VERSION = hashlib.sha1(repr(sorted(SCHEMA.items())).encode("utf-8")).hexdigest()[:8]
+
+# Registered input datasets: source file, how to parse it and which column holds the year
+# (used for predicate pushdown when reading the Parquet cache)
+DATASETS = {
+    "population": {
+        "path": "data/Population (2017-2021, INSEE).csv",
+        "read": {"dtype": {"CODE_IRIS": str, "CODE_COMMUNE": str}},
+        "year_column": "ANNEE_DONNEES"
+    },
+    "population_geo": {
+        "path": "data/Population (2017-2021, INSEE).geojson",
+        "year_column": None
+    },
+    "transport": {
+        "path": "data/PublicTransportStop (2014-2024, OpenStreetMap).csv",
+        "read": {"dtype": {"osm_id": str}},
+        "year_column": "year"
+    },
+    "transport_geo": {
+        "path": "data/PublicTransportStop (2014-2024, OpenStreetMap).geojson",
+        "year_column": None
+    }
+}
+
+_hashes = {}
+
+
+def file_hash(path):
+    """ SHA-1 of the file content, memoized on (size, mtime) so unchanged files are hashed once per process. """
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    if key not in _hashes:
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        _hashes[key] = digest.hexdigest()
+    return _hashes[key]
+
+
+def _is_geo(spec):
+    return spec["path"].lower().endswith((".geojson", ".json", ".shp", ".gpkg"))
+
+
+def _parse_source(spec):
+    if _is_geo(spec):
+        df = gpd.read_file(spec["path"])
+    else:
+        df = pd.read_csv(spec["path"], **spec.get("read", {}))
+    return apply_schema(df)
+
+
+def apply_schema(df):
+    """ Casts the columns listed in SCHEMA to their compact dtype. """
+    return df.astype({column: dtype for column, dtype in SCHEMA.items() if column in df.columns})
+
+
+def memory_footprint(df):
+    """ Deep memory usage of a frame, in bytes. """
+    return int(df.memory_usage(deep=True).sum())
+
+
+def memory_report(frames):
+    """ Memory footprint per dataset, given a dict of name -> frame, as a frame sorted by size. """
+    report = pd.DataFrame(
+        [{"dataset": name, "rows": len(df), "bytes": memory_footprint(df)} for name, df in frames.items()]
+    )
+    report["MB"] = (report["bytes"] / 2 ** 20).round(2)
+    return report.sort_values("bytes", ascending=False, ignore_index=True)
+
+
+def cache_path(name, datasets=None):
+    spec = (datasets or DATASETS)[name]
+    return os.path.join(CACHE_DIR, f"{name}-{file_hash(spec['path'])[:16]}-{SCHEMA_VERSION}.parquet")
+
+
+def dataset_version(*names, datasets=None):
+    """ Version of a set of registered datasets: changes whenever one of their files or the SCHEMA changes. """
+    hashes = [file_hash((datasets or DATASETS)[name]["path"]) for name in names]
+    return hashlib.sha1("|".join(hashes + [SCHEMA_VERSION]).encode("utf-8")).hexdigest()[:16]
+
+
+def build_cache(name, datasets=None):
+    """ Parses the source file of a registered dataset and writes it as (Geo)Parquet, unless already cached.
+    datasets is the registry to look the name up in, DATASETS by default. """
+    datasets = datasets or DATASETS
+    path = cache_path(name, datasets)
+    if not os.path.exists(path):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        for stale in os.listdir(CACHE_DIR):
+            if stale.startswith(f"{name}-") and stale.endswith(".parquet"):
+                os.remove(os.path.join(CACHE_DIR, stale))
+        df = _parse_source(datasets[name])
+        # Per-process temporary file, so concurrent builders never write to the same file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    return path
+
+
+def load_dataset(name, columns=None, years=None, datasets=None):
+    """ Loads a registered dataset from its Parquet cache, reading only the given columns and years. """
+    spec = (datasets or DATASETS)[name]
+    path = build_cache(name, datasets)
+    filters = None
+    if years is not None and spec["year_column"]:
+        filters = [(spec["year_column"], "in", [int(year) for year in years])]
+    if _is_geo(spec):
+        if columns is not None and "geometry" not in columns:
+            columns = list(columns) + ["geometry"]
+        return gpd.read_parquet(path, columns=columns, filters=filters)
+    return pd.read_parquet(path, columns=columns, filters=filters)
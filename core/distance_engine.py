@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from shapely import STRtree
+from scipy.spatial import cKDTree
+
+# Lambert-93, metric projection covering metropolitan France
+PROJECTED_CRS = "EPSG:2154"
+
+
+class StopDistanceEngine:
+    """ Nearest-stop distances between spatial units (IRIS, communes) and public transport stops, computed on demand.
+
+    Stops come from the PublicTransportStop GeoJSON (id, geometry) and its CSV (osm_id, fclass, year), so any
+    year / fclass subset can be queried. One STRtree (exact polygon distances) and one KD-tree (centroid
+    k-nearest) are built per subset and kept for later queries.
+    """
+
+    def __init__(self, stops_gdf, stops_df, crs=PROJECTED_CRS):
+        self.crs = crs
+        stops_gdf = stops_gdf[["id", "geometry"]].drop_duplicates("id").to_crs(crs)
+        self.stop_ids = stops_gdf["id"].astype(str).to_numpy()
+        self.stop_geometries = stops_gdf.geometry.to_numpy()
+        self.stop_coords = np.column_stack([shapely.get_x(self.stop_geometries), shapely.get_y(self.stop_geometries)])
+        self.stop_index = pd.Series(np.arange(len(self.stop_ids)), index=self.stop_ids)
+
+        stops_df = stops_df[stops_df["osm_id"].astype(str).isin(self.stop_index.index)]
+        self.stop_years = stops_df[["osm_id", "fclass", "year"]].assign(
+            position=self.stop_index.loc[stops_df["osm_id"].astype(str)].to_numpy()
+        )
+        self._trees = {}
+
+    @classmethod
+    def from_files(cls, geojson_path, csv_path, crs=PROJECTED_CRS):
+        return cls(gpd.read_file(geojson_path), pd.read_csv(csv_path, dtype={"osm_id": str}), crs)
+
+    def _subset(self, years=None, fclasses=None):
+        """ Returns the stop positions, STRtree and KD-tree of the stops present in the given years and classes. """
+        key = (
+            tuple(sorted(years)) if years is not None else None,
+            tuple(sorted(fclasses)) if fclasses is not None else None
+        )
+        if key not in self._trees:
+            rows = self.stop_years
+            if years is not None:
+                rows = rows[rows["year"].isin(years)]
+            if fclasses is not None:
+                rows = rows[rows["fclass"].isin(fclasses)]
+            positions = np.unique(rows["position"].to_numpy())
+            self._trees[key] = (positions, STRtree(self.stop_geometries[positions]), cKDTree(self.stop_coords[positions]))
+        return self._trees[key]
+
+    def _unit_geometries(self, units_gdf, method):
+        geometries = units_gdf.geometry.to_crs(self.crs)
+        if method == "centroid":
+            geometries = geometries.centroid
+        return geometries.to_numpy()
+
+    def nearest(self, units_gdf, years=None, fclasses=None, method="geometry", id_column="id"):
+        """ Distance in meters from each unit to its nearest stop, as population_id / transport_id / distance rows.
+        method="geometry" measures from the unit polygon (0 when a stop lies inside it), "centroid" from its centroid. """
+        positions, tree, _ = self._subset(years, fclasses)
+        if len(positions) == 0:
+            return pd.DataFrame(columns=["population_id", "transport_id", "distance"])
+        (unit_idx, tree_idx), distances = tree.query_nearest(
+            self._unit_geometries(units_gdf, method), return_distance=True, all_matches=False
+        )
+        return pd.DataFrame({
+            "population_id": units_gdf[id_column].astype(str).to_numpy()[unit_idx],
+            "transport_id": self.stop_ids[positions[tree_idx]],
+            "distance": distances
+        })
+
+    def count_within(self, units_gdf, radius, years=None, fclasses=None, method="geometry", id_column="id"):
+        """ Number of stops within radius meters of each unit. """
+        positions, tree, _ = self._subset(years, fclasses)
+        geometries = self._unit_geometries(units_gdf, method)
+        unit_idx, _ = tree.query(geometries, predicate="dwithin", distance=radius)
+        counts = np.bincount(unit_idx, minlength=len(geometries))
+        return pd.Series(counts, index=units_gdf[id_column].astype(str).to_numpy(), name="stops_within")
+
+    def k_nearest(self, units_gdf, k, years=None, fclasses=None, id_column="id"):
+        """ The k nearest stops of each unit centroid as population_id / rank / transport_id / distance rows. """
+        positions, _, kdtree = self._subset(years, fclasses)
+        k = min(k, len(positions))
+        centroids = self._unit_geometries(units_gdf, "centroid")
+        unit_ids = units_gdf[id_column].astype(str).to_numpy()
+        if k == 0 or len(centroids) == 0:
+            return pd.DataFrame(columns=["population_id", "rank", "transport_id", "distance"])
+        distances, order = kdtree.query(np.column_stack([shapely.get_x(centroids), shapely.get_y(centroids)]), k=k)
+        distances, order = distances.reshape(len(unit_ids), k), order.reshape(len(unit_ids), k)
+        return pd.DataFrame({
+            "population_id": np.repeat(unit_ids, k),
+            "rank": np.tile(np.arange(1, k + 1), len(unit_ids)),
+            "transport_id": self.stop_ids[positions[order]].ravel(),
+            "distance": distances.ravel()
+        })
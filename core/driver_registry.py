@@ -0,0 +1,225 @@
+import atexit
+import threading
+import time
+from neo4j import GraphDatabase
+
+DEFAULT_POOL_OPTIONS = {
+    "max_connection_pool_size": 50,
+    "max_connection_lifetime": 3600,
+    "connection_acquisition_timeout": 60
+}
+
+# One driver per (URI, user) for the whole process, so Streamlit reruns and pages share the same pool
+_drivers = {}
+# Drivers replaced (new password or options) or dropped while sessions still used them; closed with their last session
+_retired = []
+_lock = threading.Lock()
+
+
+class TimedSession:
+    """ Neo4j session that accounts for the pooled connection it holds, using only the public session API.
+
+    The driver does not expose its pool state, so every session takes one of max_connection_pool_size slots of
+    its driver entry while it may hold a connection: for the duration of a managed transaction, and from run()
+    until the next call or close() (the driver keeps the connection until the result is consumed). The wait
+    for a slot is the connection-acquisition wait, bounded by connection_acquisition_timeout like the driver's.
+    """
+
+    def __init__(self, entry, session):
+        # entry["open_sessions"] is counted by open_session, under the lock that resolved the entry
+        self._entry = entry
+        self._session = session
+        self._holding = False
+        self._closed = False
+
+    def _acquire(self):
+        if self._holding:
+            return
+        entry = self._entry
+        start = time.perf_counter()
+        if not entry["slots"].acquire(timeout=entry["options"]["connection_acquisition_timeout"]):
+            raise TimeoutError(
+                f'No pooled connection became free within {entry["options"]["connection_acquisition_timeout"]} s'
+            )
+        wait = time.perf_counter() - start
+        self._holding = True
+        with _lock:
+            entry["in_use"] += 1
+            entry["peak_in_use"] = max(entry["peak_in_use"], entry["in_use"])
+            entry["acquisitions"] += 1
+            entry["total_wait"] += wait
+            entry["max_wait"] = max(entry["max_wait"], wait)
+
+    def _release(self):
+        if not self._holding:
+            return
+        self._holding = False
+        with _lock:
+            self._entry["in_use"] -= 1
+        self._entry["slots"].release()
+
+    def _timed(self, method, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with _lock:
+                self._entry["calls"] += 1
+                self._entry["total_time"] += elapsed
+                self._entry["max_time"] = max(self._entry["max_time"], elapsed)
+
+    def run(self, *args, **kwargs):
+        self._acquire()
+        try:
+            return self._timed(self._session.run, *args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+
+    def _transaction(self, method, *args, **kwargs):
+        self._acquire()
+        try:
+            return self._timed(method, *args, **kwargs)
+        finally:
+            self._release()
+
+    def execute_read(self, *args, **kwargs):
+        return self._transaction(self._session.execute_read, *args, **kwargs)
+
+    def execute_write(self, *args, **kwargs):
+        return self._transaction(self._session.execute_write, *args, **kwargs)
+
+    def close(self):
+        try:
+            self._session.close()
+        finally:
+            self._release()
+            if not self._closed:
+                self._closed = True
+                with _lock:
+                    self._entry["open_sessions"] -= 1
+                    _close_retired()
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def pool_options_from_config(neo4j_config):
+    """ Reads the pool settings of the "neo4j" config section. """
+    return {
+        "max_connection_pool_size": int(neo4j_config.get("MaxConnectionPoolSize", DEFAULT_POOL_OPTIONS["max_connection_pool_size"])),
+        "max_connection_lifetime": int(neo4j_config.get("MaxConnectionLifetime", DEFAULT_POOL_OPTIONS["max_connection_lifetime"]))
+    }
+
+
+def _retire(entry):
+    """ Closes a driver that is no longer cached, now or once its last session closes. Called with _lock held. """
+    _retired.append(entry)
+    _close_retired()
+
+
+def _close_retired():
+    for entry in [entry for entry in _retired if entry["open_sessions"] == 0]:
+        _retired.remove(entry)
+        entry["driver"].close()
+
+
+def _get_entry(uri, username, password, options):
+    """ The cached entry for (uri, username), replacing it if the password or pool options changed. Called with _lock held. """
+    key = (uri, username)
+    entry = _drivers.get(key)
+    if entry and (entry["password"] != password or entry["options"] != options):
+        _retire(_drivers.pop(key))
+        entry = None
+    if entry is None:
+        entry = {
+            "driver": GraphDatabase.driver(uri, auth=(username, password), **options),
+            "password": password,
+            "options": options,
+            "slots": threading.BoundedSemaphore(options["max_connection_pool_size"]),
+            "open_sessions": 0,
+            "in_use": 0,
+            "peak_in_use": 0,
+            "acquisitions": 0,
+            "total_wait": 0.0,
+            "max_wait": 0.0,
+            "calls": 0,
+            "total_time": 0.0,
+            "max_time": 0.0
+        }
+        _drivers[key] = entry
+    return entry
+
+
+def get_neo4j_driver(uri, username, password, **pool_options):
+    """ Returns the cached driver for (uri, username), recreating it if the password or pool options changed.
+    The replaced driver is closed once the sessions still using it are closed. """
+    with _lock:
+        return _get_entry(uri, username, password, {**DEFAULT_POOL_OPTIONS, **pool_options})["driver"]
+
+
+def open_session(uri, username, password, database="neo4j", **pool_options):
+    """ A TimedSession on the cached driver for (uri, username). """
+    with _lock:
+        entry = _get_entry(uri, username, password, {**DEFAULT_POOL_OPTIONS, **pool_options})
+        # Counted before the lock is released, so the driver cannot be closed under the new session
+        entry["open_sessions"] += 1
+    try:
+        return TimedSession(entry, entry["driver"].session(database=database))
+    except BaseException:
+        with _lock:
+            entry["open_sessions"] -= 1
+            _close_retired()
+        raise
+
+
+def close_neo4j_drivers(keep=None):
+    """ Drops every cached driver except the (uri, username) key given in keep; each is closed once its open
+    sessions are. """
+    with _lock:
+        for key in list(_drivers):
+            if key != keep:
+                _retire(_drivers.pop(key))
+
+
+def get_pool_metrics(uri, username):
+    """ Connection pool usage of a cached driver, or None: connections in use and idle, and the connection-acquisition
+    waits, as accounted by TimedSession (see there), plus the time spent in run() and managed transactions.
+
+    idle is an upper bound: the driver opens a connection only when none is idle, so it has opened peak_in_use of
+    them, but it may since have closed some (max_connection_lifetime, failed liveness checks). """
+    with _lock:
+        entry = _drivers.get((uri, username))
+        if entry is None:
+            return None
+        return {
+            "in_use": entry["in_use"],
+            "idle": entry["peak_in_use"] - entry["in_use"],
+            "max_connection_pool_size": entry["options"]["max_connection_pool_size"],
+            "open_sessions": entry["open_sessions"],
+            "acquisitions": entry["acquisitions"],
+            "mean_acquisition_wait": entry["total_wait"] / entry["acquisitions"] if entry["acquisitions"] else 0.0,
+            "max_acquisition_wait": entry["max_wait"],
+            "calls": entry["calls"],
+            "mean_call_time": entry["total_time"] / entry["calls"] if entry["calls"] else 0.0,
+            "max_call_time": entry["max_time"]
+        }
+
+
+def _close_all_drivers():
+    with _lock:
+        for entry in list(_drivers.values()) + _retired:
+            entry["driver"].close()
+        _drivers.clear()
+        _retired.clear()
+
+
+atexit.register(_close_all_drivers)
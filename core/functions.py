@@ -1,9 +1,8 @@
-import json
-import openai
-import folium
-import matplotlib.pyplot as plt
 import streamlit as st
 
+# folium, matplotlib, openai and the geo stack are imported by the functions that use them,
+# so that pages only needing LABEL_COLORS do not load them
+
 LABEL_COLORS = {
     "Goal": "#f16667",
     "Target": "#f79767",
@@ -14,45 +13,27 @@ LABEL_COLORS = {
     "Database": "#c990c0"
 }
 
-def Mapp_columns_with_openai(df, attributes, config):
-    """Uses OpenAI to map DataFrame columns to attributes."""
-    unique_values = {
-        col: df[col].dropna().unique()[:10].tolist()
-        for col in df.columns
-    }
-
-    prompt = f"""
-    You are an AI assistant that maps CSV columns to a predefined list of attributes.
-    The user has provided a DataFrame with the following columns and example unique values:
-
-    {json.dumps(unique_values, indent=2)}
-
-    The available attributes to map to are:
-    {attributes}
-
-    Return a JSON object mapping each column name to either one of the attributes or "Drop".
-    """
+def Mapp_columns_with_openai(df, attributes, config, use_llm=True):
+    """Maps DataFrame columns to attributes with the cached OpenAI mapping service (heuristic fallback).
+    df is either a DataFrame or a dict of column -> sample values (e.g. from a CSV profile).
+    Returns column -> {"attribute", "source", "error"} (see core.column_mapping.map_columns_batch)."""
+    if isinstance(df, dict):
+        unique_values = {col: values[:10] for col, values in df.items()}
+    else:
+        unique_values = {
+            col: df[col].dropna().unique()[:10].tolist()
+            for col in df.columns
+        }
 
     try:
-        openai.api_type = config["openai"]["api_type"]
-        openai.api_key = config["openai"]["api_key"]
-        openai.api_version = config["openai"]["api_version"]
-        openai.api_base = config["openai"]["api_base"]
-        response = openai.ChatCompletion.create(
-            engine=config["openai"]["engine"],
-            temperature=0,
-            messages=[{"role": "system", "content": "You are an expert data classifier."},
-                      {"role": "user", "content": prompt}]
-        )
-        if "choices" in response and response["choices"]:
-            return json.loads(response["choices"][0]["message"]["content"])
-        else:
-            return {"error": "Empty or invalid OpenAI response"}
+        from core.column_mapping import map_columns
+        return map_columns(unique_values, attributes, config, use_llm=use_llm)
     except Exception as e:
         return {"error": str(e)}
 
 def plot_map(p, t, s, selected_year):
-    m = folium.Map(location=[0, 0], zoom_start=2)
+    import folium
+    from core.map_rendering import base_map, map_view, simplify_for_zoom, stop_layer
 
     def filter_by_year(gdf, time_col):
         if gdf is not None and time_col in gdf.columns:
@@ -60,32 +41,35 @@ def plot_map(p, t, s, selected_year):
         return gdf
 
     p = filter_by_year(p, "ANNEE_DONNEES")
-    t = filter_by_year(t, "year").head(100) if t is not None else None
-    s = filter_by_year(s, "year").head(100) if s is not None else None
+    t = filter_by_year(t, "year")
+    s = filter_by_year(s, "year")
+
+    view = map_view(p, t, s)
+    m = base_map(view, tiles="OpenStreetMap")
 
-    def add_gdf_to_map(gdf, color):
-        if gdf is not None:
-            for _, row in gdf.iterrows():
-                geom = row.geometry
-                if geom.geom_type == "Point":
-                    folium.Marker([geom.y, geom.x], icon=folium.Icon(color=color)).add_to(m)
-                else:
-                    folium.GeoJson(geom, style_function=lambda x: {"color": color}).add_to(m)
+    def add_gdf_to_map(gdf, color, name):
+        if gdf is None or gdf.empty:
+            return
+        is_point = (gdf.geom_type == "Point").to_numpy()
+        if is_point.any():
+            stop_layer(gdf[is_point], name=name, color=color).add_to(m)
+        if not is_point.all():
+            shapes = simplify_for_zoom(gdf.loc[~is_point, [gdf.geometry.name]], view["zoom"])
+            folium.GeoJson(shapes.to_json(drop_id=True), name=name, style_function=lambda x: {"color": color}).add_to(m)
 
-    add_gdf_to_map(p, "blue")
-    add_gdf_to_map(t, "green")
-    add_gdf_to_map(s, "red")
+    add_gdf_to_map(p, "blue", "Population")
+    add_gdf_to_map(t, "green", "Transport")
+    add_gdf_to_map(s, "red", "Stops")
 
     return m
 
 def plot_accessibility_graph(p):
+    import matplotlib.pyplot as plt
+    from core.indicators.sdg_11_2_1 import weighted_accessibility
+
     if "ANNEE_DONNEES" in p.columns and "VALEUR" in p.columns and "is_accessible" in p.columns:
         p["year"] = p["ANNEE_DONNEES"].dt.year
-        grouped = p.groupby("year").agg(
-            total_VALEUR=("VALEUR", "sum"),
-            accessible_VALEUR=("VALEUR", lambda x: x[p["is_accessible"]].sum())
-        )
-        grouped["ratio"] = grouped["accessible_VALEUR"] / grouped["total_VALEUR"]
+        grouped = weighted_accessibility(p, p["is_accessible"], by=["year"]).set_index("year")
 
         fig, ax = plt.subplots()
         grouped["ratio"].plot(kind="line", marker="o", ax=ax)
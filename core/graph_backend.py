@@ -0,0 +1,323 @@
+import abc
+
+DEFAULT_BATCH_SIZE = 1000
+
+REGISTER_DATABASE_QUERY = """
+    OPTIONAL MATCH (existing:Database {id: $db_name})
+    WITH existing WHERE existing IS NULL
+    MERGE (db:Database {id: $db_name})
+    SET db.geojson_filepath = $geojson_path,
+        db.csv_filepath = $csv_path,
+        db.csv_encoding = $encoding,
+        db.csv_separator = $separator,
+        db += $metadata
+    WITH db
+    OPTIONAL MATCH (concept:Concept {id: $concept})
+    FOREACH (_ IN CASE WHEN concept IS NULL THEN [] ELSE [1] END | MERGE (concept)-[:HAS_INSTANCE]->(db))
+    WITH db
+    CALL {
+        WITH db
+        UNWIND $columns AS row
+        MERGE (col:Column {id: row.id})
+        SET col.name = row.column
+        MERGE (attr:Attribute {id: row.attribute})
+        MERGE (attr)<-[:IS_MAPPED_TO]-(col)
+        MERGE (db)-[:HAS_COLUMN]->(col)
+        RETURN count(*) AS mapped
+    }
+    WITH db
+    OPTIONAL MATCH (g:Goal)-->(t:Target)-->(i:Indicator {id: "11.2.1"})-[:HAS_CONCEPT]->(c:Concept)
+          -[:HAS_INSTANCE]->(db)-[:HAS_COLUMN]->(col:Column)
+          -[:IS_MAPPED_TO]->(attr:Attribute)
+    WHERE $return_subgraph
+    RETURN g, t, i, db, c, col, attr
+"""
+
+CATALOG_QUERY = """
+    MATCH (db:Database) WHERE NOT db.id IN $known
+    OPTIONAL MATCH (c:Concept)-[:HAS_INSTANCE]->(db)
+    RETURN db.id AS name, db.space AS D_s, db.time AS D_t, db.context AS D_c,
+           db.reliability AS D_r, db.completeness AS D_p, collect(c.id) AS concepts
+"""
+
+FIND_QUERY = """
+    MATCH (n:{label})
+    WHERE toString(n.id) = $text OR toLower(coalesce(n.name, "")) CONTAINS toLower($text)
+    RETURN toString(n.id) AS id, coalesce(n.name, toString(n.id)) AS name
+    ORDER BY size(toString(n.id)), id
+    LIMIT $limit
+"""
+
+# One page of neighbours per frontier node: node data only for nodes the client has not seen yet
+NEIGHBOURHOOD_QUERY = """
+    UNWIND $frontier AS f
+    MATCH (n:{label} {{id: f.id}})
+    OPTIONAL MATCH (n)-[r]-(m)
+    WITH n, f, r, m ORDER BY toString(m.id)
+    WITH n, f, size([(n)--() | 1]) AS degree,
+         collect(CASE WHEN r IS NULL THEN null ELSE {{r: r, m: m}} END)[f.skip..f.skip + $page_size] AS page
+    UNWIND (CASE WHEN page = [] THEN [null] ELSE page END) AS entry
+    WITH n, f, degree, entry, entry.m AS m, entry.r AS r
+    RETURN toString(n.id) AS origin, degree,
+           type(r) AS type, startNode(r) = n AS outgoing,
+           toString(m.id) AS id,
+           CASE WHEN toString(m.id) IN $seen THEN null ELSE [l IN labels(m) WHERE l IN $labels][0] END AS label,
+           CASE WHEN toString(m.id) IN $seen THEN null ELSE coalesce(m.name, toString(m.id)) END AS name
+"""
+
+# Databases registered for each concept of an indicator, with their files and column -> attribute mapping
+LINEAGE_QUERY = """
+    MATCH (i:Indicator {id: $indicator})-[:HAS_CONCEPT]->(c:Concept)-[:HAS_INSTANCE]->(db:Database)
+    OPTIONAL MATCH (db)-[:HAS_COLUMN]->(col:Column)-[:IS_MAPPED_TO]->(a:Attribute)
+    WITH c, db, collect(CASE WHEN col IS NULL THEN null ELSE [coalesce(col.name, col.id), a.id] END) AS columns
+    RETURN c.id AS concept, db.id AS database,
+           db.csv_filepath AS csv_path, db.geojson_filepath AS geojson_path,
+           db.csv_encoding AS encoding, db.csv_separator AS separator, columns
+    ORDER BY concept, database
+"""
+
+
+def _has_label(var, labels):
+    return " OR ".join(f"{var}:{label}" for label in labels)
+
+
+def registration_parameters(db_name, csv_path, geojson_path, encoding, separator, concept, column_mapping,
+                            return_subgraph=False, metadata=None):
+    """ Parameters of GraphBackend.register_database; columns mapped to "Drop" are left out.
+    Column nodes are scoped to their database (id "<database>/<column>", the column name in name), so that
+    each database keeps its own column -> attribute mapping. """
+    return {
+        "db_name": db_name,
+        "geojson_path": geojson_path or "",
+        "csv_path": csv_path or "",
+        "encoding": encoding,
+        "separator": separator,
+        "concept": concept,
+        "columns": [
+            {"id": f"{db_name}/{column}", "column": column, "attribute": attribute}
+            for column, attribute in column_mapping.items() if attribute != "Drop"
+        ],
+        "return_subgraph": return_subgraph,
+        "metadata": {k: v for k, v in (metadata or {}).items() if v not in (None, "")}
+    }
+
+
+class GraphBackend(abc.ABC):
+    """ The operations the app runs on the SDGraph, one method per query.
+
+    Implemented by Neo4jBackend (Cypher over a driver session) and core.memory_graph.MemoryGraph, so that every
+    caller works on either. Rows are plain values and dicts; nodes returned by register_database expose
+    their properties as a mapping and their labels as .labels. Backends are context managers; a backend missing
+    one of the abstract methods fails at instantiation rather than on its first call.
+
+    identity names the graph a backend reads (not the backend object, of which there is one per session), so
+    that caches keyed on it are shared by the sessions of one graph and never between two graphs.
+    """
+
+    identity = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        pass
+
+    def flush(self):
+        """ Persists buffered writes (a no-op where every write is already durable). """
+
+    # --- Writes ---
+
+    @abc.abstractmethod
+    def clear(self):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def create_constraints(self, labels):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def merge_nodes(self, label, rows, batch_size=None):
+        """ MERGEs nodes {"id", "properties"} of one label; returns the number of rows. batch_size overrides the
+        backend's rows per round trip, where it batches. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def merge_edges(self, rel_type, source_label, target_label, rows, batch_size=None):
+        """ MERGEs relationships between existing nodes, given {"source", "target"} ids; rows whose endpoints
+        do not exist are skipped. Returns the number of rows. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def register_database(self, parameters):
+        """ Registers a database from registration_parameters in one write. Returns None if it already
+        exists, otherwise the lineage records (g, t, i, c, db, col, attr) when return_subgraph, else []. """
+        raise NotImplementedError
+
+    # --- Reads ---
+
+    @abc.abstractmethod
+    def concepts(self):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def concept_attributes(self, concept):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def subgraph(self, labels):
+        """ Nodes of the given labels as {"label", "id", "name", "description", "image"} rows, and the
+        (start id, end id, type) of the relationships between them. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def edges(self):
+        """ (start id, end id, type) of every relationship. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def catalog_rows(self, known):
+        """ The :Database nodes not in known, with their TSM metadata and concepts. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def find_rows(self, label, text, limit):
+        """ Nodes of a label whose id is text or whose name contains it, as {"id", "name"} rows. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def neighbourhood_rows(self, label, frontier, seen, labels, page_size):
+        """ One page of neighbours of each frontier node ({"id", "skip"}) of one label, as {"origin", "degree",
+        "type", "outgoing", "id", "label", "name"} rows; label and name are None for neighbours in seen. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def lineage_rows(self, indicator):
+        """ The databases registered for the concepts of an indicator, as {"concept", "database", "csv_path",
+        "geojson_path", "encoding", "separator", "columns"} rows, columns being [column, attribute] pairs. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def checksum(self):
+        """ Cheap fingerprint of the graph content: (node count, relationship count). """
+        raise NotImplementedError
+
+
+class Neo4jBackend(GraphBackend):
+    """ GraphBackend running Cypher on a Neo4j session. Bulk writes are sent as UNWIND batches of batch_size
+    rows, one transaction per call. """
+
+    def __init__(self, session, batch_size=DEFAULT_BATCH_SIZE, uri=None, database="neo4j"):
+        self.session = session
+        self.batch_size = batch_size
+        self.identity = ("neo4j", uri, database)
+
+    def close(self):
+        self.session.close()
+
+    def _write_batches(self, query, rows, batch_size=None):
+        batch_size = batch_size or self.batch_size
+
+        def write(tx):
+            for i in range(0, len(rows), batch_size):
+                tx.run(query, rows=rows[i:i + batch_size]).consume()
+        self.session.execute_write(write)
+        return len(rows)
+
+    def clear(self):
+        self.session.run("MATCH (n) DETACH DELETE n").consume()
+
+    def create_constraints(self, labels):
+        for label in labels:
+            self.session.run(f"CREATE CONSTRAINT {label.lower()}_id IF NOT EXISTS FOR (n:{label}) REQUIRE n.id IS UNIQUE")
+
+    def merge_nodes(self, label, rows, batch_size=None):
+        return self._write_batches(f"""
+            UNWIND $rows AS row
+            MERGE (n:{label} {{id: row.id}})
+            SET n += row.properties
+        """, rows, batch_size)
+
+    def merge_edges(self, rel_type, source_label, target_label, rows, batch_size=None):
+        source = f"a:{source_label}" if source_label else "a"
+        target = f"b:{target_label}" if target_label else "b"
+        return self._write_batches(f"""
+            UNWIND $rows AS row
+            MATCH ({source} {{id: row.source}}), ({target} {{id: row.target}})
+            MERGE (a)-[:{rel_type}]->(b)
+        """, rows, batch_size)
+
+    def register_database(self, parameters):
+        def write(tx):
+            records = list(tx.run(REGISTER_DATABASE_QUERY, parameters))
+            if not records:
+                return None
+            return [record for record in records if record["col"] is not None]
+        return self.session.execute_write(write)
+
+    def concepts(self):
+        return [record[0] for record in self.session.run("MATCH (c:Concept) RETURN c.id").values()]
+
+    def concept_attributes(self, concept):
+        return [record[0] for record in self.session.run(
+            "MATCH (c:Concept {id: $concept})-[:HAS_ATTRIBUTE]->(a:Attribute) RETURN a.id",
+            {"concept": concept}
+        ).values()]
+
+    def subgraph(self, labels):
+        if not labels:
+            return [], []
+        # Nodes and edges in one projected query
+        query = f"""
+            MATCH (n) WHERE {_has_label("n", labels)}
+            RETURN "node" AS kind, [l IN labels(n) WHERE l IN $labels][0] AS label, toString(n.id) AS id,
+                   coalesce(n.name, toString(n.id)) AS name,
+                   coalesce(n.description, "No description available.") AS description,
+                   n.image AS image, null AS start, null AS end
+            UNION ALL
+            MATCH (a)-[r]->(b) WHERE ({_has_label("a", labels)}) AND ({_has_label("b", labels)})
+            RETURN "edge" AS kind, type(r) AS label, null AS id, null AS name, null AS description,
+                   null AS image, toString(a.id) AS start, toString(b.id) AS end
+        """
+        nodes, edges = [], []
+        for record in self.session.run(query, labels=list(labels)):
+            if record["kind"] == "node":
+                nodes.append({key: record[key] for key in ("label", "id", "name", "description", "image")})
+            else:
+                edges.append((record["start"], record["end"], record["label"]))
+        return nodes, edges
+
+    def edges(self):
+        return [
+            (record["start"], record["end"], record["type"])
+            for record in self.session.run(
+                "MATCH (a)-[r]->(b) RETURN toString(a.id) AS start, toString(b.id) AS end, type(r) AS type"
+            )
+        ]
+
+    def catalog_rows(self, known):
+        return [record.data() for record in self.session.run(CATALOG_QUERY, known=list(known))]
+
+    def find_rows(self, label, text, limit):
+        return [record.data() for record in self.session.run(FIND_QUERY.format(label=label), text=str(text), limit=limit)]
+
+    def neighbourhood_rows(self, label, frontier, seen, labels, page_size):
+        return [record.data() for record in self.session.run(
+            NEIGHBOURHOOD_QUERY.format(label=label),
+            frontier=frontier, seen=list(seen), labels=list(labels), page_size=page_size
+        )]
+
+    def lineage_rows(self, indicator):
+        return [record.data() for record in self.session.run(LINEAGE_QUERY, indicator=indicator)]
+
+    def checksum(self):
+        # Both counts in one round trip, answered by Neo4j from its count store
+        record = self.session.run("""
+            CALL { MATCH (n) RETURN count(n) AS nodes }
+            CALL { MATCH ()-[r]->() RETURN count(r) AS relationships }
+            RETURN nodes, relationships
+        """).single()
+        return record["nodes"], record["relationships"]
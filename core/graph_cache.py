@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Bumped by every write path of core.graph_utils so that cached snapshots are never served stale
+_version = 0
+_version_lock = threading.Lock()
+
+
+def graph_version():
+    return _version
+
+
+def bump_graph_version():
+    global _version
+    with _version_lock:
+        _version += 1
+    snapshot_cache.clear()
+    return _version
+
+
+def graph_checksum(session):
+    """ Cheap fingerprint of the graph content (node and relationship counts). """
+    return session.checksum()
+
+
+class SnapshotCache:
+    """ LRU cache of rendered graph elements, optionally persisted as JSON files in cache_dir. """
+
+    def __init__(self, max_snapshots=32, cache_dir=None):
+        self.max_snapshots = max_snapshots
+        self.cache_dir = cache_dir or None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, max_snapshots=None, cache_dir=None):
+        with self._lock:
+            if max_snapshots:
+                self.max_snapshots = max_snapshots
+            self.cache_dir = cache_dir or None
+            while len(self._entries) > self.max_snapshots:
+                self._entries.popitem(last=False)
+
+    def _path(self, key):
+        digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"snapshot_{digest}.json")
+
+    def get(self, key):
+        with self._lock:
+            key_str = json.dumps(key, sort_keys=True)
+            if key_str in self._entries:
+                self._entries.move_to_end(key_str)
+                return self._entries[key_str]
+            if self.cache_dir and os.path.exists(self._path(key)):
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    value = json.load(f)
+                self._put(key_str, value)
+                return value
+        return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._put(json.dumps(key, sort_keys=True), value)
+            if self.cache_dir:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(self._path(key), "w", encoding="utf-8") as f:
+                    json.dump(value, f)
+
+    def _put(self, key_str, value):
+        self._entries[key_str] = value
+        self._entries.move_to_end(key_str)
+        while len(self._entries) > self.max_snapshots:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self.cache_dir and os.path.isdir(self.cache_dir):
+                for name in os.listdir(self.cache_dir):
+                    if name.startswith("snapshot_") and name.endswith(".json"):
+                        os.remove(os.path.join(self.cache_dir, name))
+
+
+snapshot_cache = SnapshotCache()
+
+
+def cached_elements(session, labels, build, cache_config=None):
+    """ Returns the elements dict for the given labels, calling build() only when the graph changed since the last render.
+    Snapshots are keyed on the graph the session reads (backend kind and URI / database or file), so graphs with
+    the same node and relationship counts never share one. """
+    if cache_config:
+        snapshot_cache.configure(int(cache_config.get("max_snapshots", 32)), cache_config.get("snapshot_dir"))
+    key = {"graph": list(session.identity), "labels": sorted(labels), "checksum": list(graph_checksum(session))}
+    elements = snapshot_cache.get(key)
+    if elements is None:
+        elements = build()
+        snapshot_cache.put(key, elements)
+    return elements
@@ -0,0 +1,164 @@
+import threading
+import numpy as np
+
+# Layer of each node type in the hierarchical layout (Goal -> Target -> Indicator -> Concept -> ...)
+RANKS = {"Goal": 0, "Target": 1, "Indicator": 2, "Concept": 3, "Attribute": 4, "Database": 4, "Column": 5}
+X_SPACING, Y_SPACING = 120.0, 300.0
+# Layers wider than this wrap onto several rows
+MAX_PER_ROW = 80
+
+
+def _arrays(elements):
+    """ Node ids, ranks and edge index arrays of st-link-analysis elements. """
+    ids = [n["data"]["id"] for n in elements["nodes"]]
+    index = {node_id: i for i, node_id in enumerate(ids)}
+    max_rank = max(RANKS.values()) + 1
+    ranks = np.array([RANKS.get(n["data"].get("label"), max_rank) for n in elements["nodes"]], dtype=int)
+    edges = [(index[e["data"]["source"]], index[e["data"]["target"]]) for e in elements["edges"]
+             if e["data"]["source"] in index and e["data"]["target"] in index]
+    edges = np.array(edges, dtype=int).reshape(-1, 2)
+    return ids, ranks, edges[:, 0], edges[:, 1]
+
+
+def hierarchical_layout(elements):
+    """ Layered layout: one band per node type, each layer ordered by the barycenter of its neighbours
+    in the layers above (one vectorized pass per layer). Returns id -> (x, y). """
+    ids, ranks, src, dst = _arrays(elements)
+    x = np.zeros(len(ids))
+    y = np.zeros(len(ids))
+    placed = np.zeros(len(ids), dtype=bool)
+    # Undirected edge lists, so that parents are found whatever the edge direction
+    a, b = np.concatenate([src, dst]), np.concatenate([dst, src])
+    order_key = np.array(ids, dtype=str)
+
+    for rank in np.unique(ranks):
+        members = np.flatnonzero(ranks == rank)
+        from_above = placed[b] & (ranks[a] == rank)
+        sums = np.bincount(a[from_above], weights=x[b[from_above]], minlength=len(ids))
+        counts = np.bincount(a[from_above], minlength=len(ids))
+        barycenter = np.where(counts > 0, sums / np.maximum(counts, 1), np.inf)[members]
+        members = members[np.lexsort((order_key[members], barycenter))]
+
+        rows = np.arange(len(members)) // MAX_PER_ROW
+        columns = np.arange(len(members)) % MAX_PER_ROW
+        row_width = np.minimum(len(members) - rows * MAX_PER_ROW, MAX_PER_ROW)
+        x[members] = (columns - (row_width - 1) / 2) * X_SPACING
+        y[members] = rank * Y_SPACING + rows * Y_SPACING / 4
+        placed[members] = True
+    return {node_id: (float(x[i]), float(y[i])) for i, node_id in enumerate(ids)}
+
+
+def force_layout(elements, initial=None, fixed=(), iterations=60, k=X_SPACING, block=512):
+    """ Vectorized Fruchterman-Reingold layout. Starts from initial positions (id -> (x, y), hierarchical
+    by default); nodes in fixed do not move. Repulsion is computed in blocks of rows to bound memory. """
+    ids, _, src, dst = _arrays(elements)
+    initial = initial or hierarchical_layout(elements)
+    pos = np.array([initial.get(node_id, (0.0, 0.0)) for node_id in ids], dtype=float)
+    movable = ~np.isin(np.array(ids, dtype=object), list(fixed))
+    temperature = 10 * k
+
+    for _ in range(iterations):
+        displacement = np.zeros_like(pos)
+        for start in range(0, len(ids), block):
+            delta = pos[start:start + block, None, :] - pos[None, :, :]
+            dist2 = np.maximum((delta ** 2).sum(axis=2), 1e-2)
+            displacement[start:start + block] = (delta * (k * k / dist2)[:, :, None]).sum(axis=1)
+        delta = pos[src] - pos[dst]
+        attraction = delta * (np.linalg.norm(delta, axis=1, keepdims=True) / k)
+        np.add.at(displacement, src, -attraction)
+        np.add.at(displacement, dst, attraction)
+
+        length = np.maximum(np.linalg.norm(displacement, axis=1, keepdims=True), 1e-9)
+        pos[movable] += (displacement / length * np.minimum(length, temperature))[movable]
+        temperature *= 0.93
+    return {node_id: (float(pos[i, 0]), float(pos[i, 1])) for i, node_id in enumerate(ids)}
+
+
+ALGORITHMS = {
+    "hierarchical": hierarchical_layout,
+    "force": force_layout
+}
+
+
+class LayoutService:
+    """ Node positions computed server-side once and kept across graph versions.
+
+    The first call lays out the whole graph; later calls return the cached positions, and nodes seen for the
+    first time (new imports, other type filters) are placed incrementally next to their already placed
+    neighbours, so every known node keeps its position. reset() forces a full layout on the next call.
+    """
+
+    def __init__(self, algorithm="hierarchical"):
+        self.algorithm = algorithm
+        self.positions = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.positions = {}
+
+    def positions_for(self, elements):
+        with self._lock:
+            ids = [n["data"]["id"] for n in elements["nodes"]]
+            missing = [node_id for node_id in ids if node_id not in self.positions]
+            if not self.positions:
+                self.positions = ALGORITHMS[self.algorithm](elements)
+            elif missing:
+                self._place(elements, missing)
+            return {node_id: self.positions[node_id] for node_id in ids}
+
+    def _place(self, elements, missing):
+        """ Positions for new nodes, layer by layer: below the barycenter of their placed neighbours,
+        or at the end of their layer. """
+        ids, ranks, src, dst = _arrays(elements)
+        index = {node_id: i for i, node_id in enumerate(ids)}
+        known = np.array([node_id in self.positions for node_id in ids])
+        pos = np.array([self.positions.get(node_id, (np.nan, np.nan)) for node_id in ids], dtype=float)
+        a, b = np.concatenate([src, dst]), np.concatenate([dst, src])
+        # Rightmost placed node of each layer
+        layer_end = {rank: (-X_SPACING, rank * Y_SPACING) for rank in np.unique(ranks)}
+        for i in np.flatnonzero(known):
+            if pos[i, 0] > layer_end[ranks[i]][0]:
+                layer_end[ranks[i]] = (pos[i, 0], pos[i, 1])
+
+        # Grid cells already taken, so that new nodes never land on top of another one
+        cell = lambda p: (round(p[0] / (X_SPACING / 2)), round(p[1] / (Y_SPACING / 4)))
+        occupied = {cell(p) for p in pos[known]}
+
+        missing = np.array([index[node_id] for node_id in missing], dtype=int)
+        for rank in np.unique(ranks[missing]):
+            # Neighbours placed so far, including new nodes of the layers above
+            linked = known[b] & ~known[a]
+            counts = np.bincount(a[linked], minlength=len(ids))
+            sums = np.column_stack([np.bincount(a[linked], weights=pos[b[linked], axis], minlength=len(ids)) for axis in (0, 1)])
+            used = {}
+            for i in missing[ranks[missing] == rank]:
+                if counts[i]:
+                    anchor = tuple((sums[i] / counts[i]).round(1))
+                    # Siblings attached to the same neighbours fan out below them
+                    slot = used.get(anchor, 0)
+                    while True:
+                        pos[i] = (anchor[0] + (slot % 8 - 3.5) * X_SPACING / 2, anchor[1] + Y_SPACING / 2 + slot // 8 * Y_SPACING / 4)
+                        slot += 1
+                        if cell(pos[i]) not in occupied:
+                            break
+                    used[anchor] = slot
+                else:
+                    end_x, row_y = layer_end[rank]
+                    while cell((end_x + X_SPACING, row_y)) in occupied:
+                        end_x += X_SPACING
+                    layer_end[rank] = (end_x + X_SPACING, row_y)
+                    pos[i] = layer_end[rank]
+                occupied.add(cell(pos[i]))
+            known[missing[ranks[missing] == rank]] = True
+
+        for i in missing:
+            self.positions[ids[i]] = (float(pos[i, 0]), float(pos[i, 1]))
+
+
+def preset_layout(elements, service):
+    """ Elements with a cytoscape position on every node, and the matching preset layout. """
+    positions = service.positions_for(elements)
+    nodes = [{**n, "position": {"x": positions[n["data"]["id"]][0], "y": positions[n["data"]["id"]][1]}}
+             for n in elements["nodes"]]
+    return {"nodes": nodes, "edges": elements["edges"]}, {"name": "preset", "fit": True, "animate": False}
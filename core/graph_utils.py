@@ -1,82 +1,87 @@
 import streamlit as st
 from streamlit_agraph import Node, Edge
-from neo4j import GraphDatabase
 import json
 from core.functions import LABEL_COLORS  
-
-def get_neo4j_session(uri, username, password):
-    driver = GraphDatabase.driver(uri, auth=(username, password))
-    return driver.session(database="neo4j")
-
-def add_to_graph(session, db_name, csv_path, geojson_path, encoding, separator, concept, column_mapping, return_subgraph=False):
+from core.driver_registry import open_session, pool_options_from_config
+from core.graph_backend import DEFAULT_BATCH_SIZE, Neo4jBackend, registration_parameters
+from core.graph_cache import bump_graph_version
+from core.import_timing import timed_phase
+from core.memory_graph import MEMORY_GRAPH_FILE, get_memory_graph
+
+NEO4J_DATABASE = "neo4j"
+
+def get_neo4j_session(uri, username, password, **pool_options):
+    return open_session(uri, username, password, database=NEO4J_DATABASE, **pool_options)
+
+def batch_size_from_config(config):
+    """ Rows per UNWIND batch of the bulk writes, from the "neo4j" config section. """
+    return int(config.get("neo4j", {}).get("BatchSize", DEFAULT_BATCH_SIZE))
+
+def get_graph_session(config):
+    """ GraphBackend of the configured graph: Neo4j, or the in-memory graph when config["graph"]["backend"]
+    is "memory". Every function of this module takes either. """
+    graph_config = config.get("graph", {})
+    if graph_config.get("backend") == "memory":
+        return get_memory_graph(graph_config.get("memory_file") or MEMORY_GRAPH_FILE)
+    return Neo4jBackend(get_neo4j_session(
+        config["neo4j"]["URI"],
+        config["neo4j"]["Username"],
+        config["neo4j"]["Password"],
+        **pool_options_from_config(config["neo4j"])
+    ), batch_size=batch_size_from_config(config), uri=config["neo4j"]["URI"], database=NEO4J_DATABASE)
+
+def clear_graph(session):
+    session.clear()
+    bump_graph_version()
+
+def fetch_concepts(session):
+    return session.concepts()
+
+def fetch_concept_attributes(session, concept):
+    return session.concept_attributes(concept)
+
+def register_database(session, db_name, csv_path, geojson_path, encoding, separator, concept, column_mapping, return_subgraph=False, metadata=None):
+    """ Registers a database, its concept link and its mapped columns in a single transaction.
+    metadata holds optional catalog properties (space, time, context, reliability, completeness).
+    Returns None if the database already exists, otherwise the list of subgraph records (empty unless return_subgraph). """
+    records = session.register_database(registration_parameters(
+        db_name, csv_path, geojson_path, encoding, separator, concept, column_mapping, return_subgraph, metadata
+    ))
+    if records is not None:
+        bump_graph_version()
+    return records
+
+def register_databases(session, registrations):
+    """ Registers many databases from a script, each given as a dict of register_database keyword arguments.
+    Returns a dict telling, for each database name, whether it was newly created. """
+    created = {}
+    for registration in registrations:
+        created[registration["db_name"]] = register_database(session, **registration) is not None
+    return created
+
+def add_to_graph(session, db_name, csv_path, geojson_path, encoding, separator, concept, column_mapping, return_subgraph=False, metadata=None):
     """ Inserts the database and column nodes into Neo4j and optionally returns the subgraph. """
     try:
-        # Check if database already exists
-        result = session.run(
-            "MATCH (db:Database {id: $db_name}) RETURN db LIMIT 1",
-            {"db_name": db_name}
-        ).single()
+        records = register_database(
+            session, db_name, csv_path, geojson_path, encoding, separator, concept, column_mapping,
+            return_subgraph=return_subgraph, metadata=metadata
+        )
 
-        if result:
+        if records is None:
             st.warning(f"Database '{db_name}' already exists in the graph.")
             return ([], []) if return_subgraph else None
 
-        # Create Database node
-        session.run("""
-            MERGE (db:Database {id: $db_name})
-            SET db.geojson_filepath = $geojson_path,
-                db.csv_filepath = $csv_path,
-                db.csv_encoding = $encoding,
-                db.csv_separator = $separator
-        """, {
-            "db_name": db_name,
-            "geojson_path": geojson_path or "",
-            "csv_path": csv_path or "",
-            "encoding": encoding,
-            "separator": separator
-        })
-
-        # Link Database to Concept
-        session.run("""
-            MATCH (c:Concept {id: $concept}), (db:Database {id: $db_name})
-            MERGE (c)-[:HAS_INSTANCE]->(db)
-        """, {"concept": concept, "db_name": db_name})
-
-        # Create Column nodes and relationships
-        for column, attribute in column_mapping.items():
-            if attribute != "Drop":
-                session.run("""
-                    MERGE (col:Column {id: $column})
-                    MERGE (db:Database {id: $db_name})
-                    MERGE (attr:Attribute {id: $attribute})
-                    MERGE (attr)<-[:IS_MAPPED_TO]-(col)
-                    MERGE (db)-[:HAS_COLUMN]->(col)
-                """, {
-                    "column": column,
-                    "db_name": db_name,
-                    "attribute": attribute
-                })
-
         st.success(f"Database '{db_name}' and its columns have been added to the graph!")
 
         if return_subgraph:
-            # --- Query for subgraph related to the newly added database ---
-            query = """
-            MATCH (g:Goal)-->(t:Target)-->(i:Indicator {id: "11.2.1"})-[:HAS_CONCEPT]->(c:Concept)
-                  -[:HAS_INSTANCE]->(db:Database {id: $db_name})-[:HAS_COLUMN]->(col:Column)
-                  -[:IS_MAPPED_TO]->(attr:Attribute)
-            RETURN g, t, i, db, c, col, attr
-            """
-            result = session.run(query, {"db_name": db_name})
-
             filtered_nodes = {}
             filtered_edges = []
 
-            for record in result:
+            for record in records:
                 g, t, i, db, c, col, attr = record["g"], record["t"], record["i"], record["db"], record["c"], record["col"], record["attr"]
                 for node_obj in [g, t, i, db, c, col, attr]:
                     node_id = node_obj["id"]
-                    node_label = node_obj.get("label", node_id)
+                    node_label = node_obj.get("label", node_obj.get("name", node_id))
                     if node_id not in filtered_nodes:
                         filtered_nodes[node_id] = Node(
                             id=node_id,
@@ -103,65 +108,81 @@ def add_to_graph(session, db_name, csv_path, geojson_path, encoding, separator,
         return ([], []) if return_subgraph else None
 
 
+def _make_node(label, node_id, name, description, image_url):
+    title = f"{label}[id:{node_id}]\n{description}"
+    if image_url:
+        return Node(
+            id=node_id, label="", title=title,
+            shape="image", image=image_url, size=80
+        )
+    return Node(
+        id=node_id, label=name, title=title,
+        color=LABEL_COLORS.get(label, "#888"), size=16, font={"size": 12, "vadjust": -30}
+    )
+
 def fetch_nodes(session):
-    nodes = {}
-    for label, color in LABEL_COLORS.items():
-        query = f"MATCH (n:{label}) RETURN n"
-        result = session.run(query)
-        for record in result:
-            node_data = record["n"]
-            node_id = str(node_data["id"])
-            node_label = node_data.get("name", node_id)
-            description = node_data.get("description", "No description available.")
-            title = f"{label}[id:{node_id}]\n{description}"
-            image_url = node_data.get("image", None)
-
-            if image_url:
-                nodes[node_id] = Node(
-                    id=node_id, label="", title=title,
-                    shape="image", image=image_url, size=80
-                )
-            else:
-                nodes[node_id] = Node(
-                    id=node_id, label=node_label, title=title,
-                    color=color, size=16, font={"size": 12, "vadjust": -30}
-                )
-    return nodes
+    nodes, _ = session.subgraph(list(LABEL_COLORS))
+    return {
+        row["id"]: _make_node(row["label"], row["id"], row["name"], row["description"], row["image"])
+        for row in nodes
+    }
 
 def fetch_edges(session):
-    query = "MATCH p=()-[r]->() RETURN p"
-    result = session.run(query)
-    edges = []
-    for record in result:
-        for rel in record["p"].relationships:
-            edges.append(Edge(
-                source=str(rel.start_node["id"]),
-                target=str(rel.end_node["id"]),
-                label=rel.type,
-                font={"size": 6}
-            ))
-    return edges
-
-def load_sdg_data(session, file_path="sdg_initt.json"):
+    return [Edge(source=start, target=end, label=label, font={"size": 6}) for start, end, label in session.edges()]
+
+def fetch_graph(session, labels):
+    """ Fetches the nodes of the given labels and the edges between them (one projected query on Neo4j). """
+    labels = [label for label in LABEL_COLORS if label in labels]
+    if not labels:
+        return {}, []
+    node_rows, edge_rows = session.subgraph(labels)
+    nodes = {
+        row["id"]: _make_node(row["label"], row["id"], row["name"], row["description"], row["image"])
+        for row in node_rows
+    }
+    edges = [Edge(source=start, target=end, label=label, font={"size": 6}) for start, end, label in edge_rows]
+    return nodes, edges
+
+def create_constraints(session):
+    """ Creates the uniqueness constraints (and their backing indexes) on the id of every node label. """
+    session.create_constraints(list(LABEL_COLORS))
+
+def bulk_load_nodes(session, nodes, batch_size=None):
+    """ MERGEs nodes grouped by type, one write per type (sent as UNWIND batches of batch_size rows on Neo4j,
+    the session's batch size by default). """
+    groups = {}
+    for node in nodes:
+        properties = {k: v for k, v in node.items() if k not in ["id", "type"]}
+        groups.setdefault(node["type"], []).append({"id": node["id"], "properties": properties})
+    return sum(session.merge_nodes(label, rows, batch_size) for label, rows in groups.items())
+
+def bulk_load_edges(session, edges, node_types, batch_size=None):
+    """ MERGEs edges grouped by (label, source type, target type) so that endpoint lookups hit the id indexes. """
+    groups = {}
+    for edge in edges:
+        key = (edge["label"], node_types.get(edge["source"]), node_types.get(edge["target"]))
+        groups.setdefault(key, []).append({"source": edge["source"], "target": edge["target"]})
+    return sum(session.merge_edges(label, source_type, target_type, rows, batch_size) for (label, source_type, target_type), rows in groups.items())
+
+def load_sdg_data(session, file_path="sdg_initt.json", batch_size=None):
+    """ Loads the SDG taxonomy in batch_size row batches; each step is timed in core.import_timing. """
     try:
         with open(file_path, "r", encoding="utf-8") as f:
             data = json.load(f)
 
-        for node in data["nodes"]:
-            properties = {k: v for k, v in node.items() if k not in ["id", "type"]}
-            query = f"""
-                MERGE (n:{node['type']} {{id: $id}})
-                SET n += $properties
-            """
-            session.run(query, id=node["id"], properties=properties)
-
-        for edge in data["edges"]:
-            query = """
-                MATCH (a {id: $source}), (b {id: $target})
-                MERGE (a)-[:{label}]->(b)
-            """.replace("{label}", edge["label"])
-            session.run(query, source=edge["source"], target=edge["target"])
+        with timed_phase("SDG load: constraints"):
+            create_constraints(session)
+
+        with timed_phase("SDG load: nodes") as phase:
+            phase["rows"] = bulk_load_nodes(session, data["nodes"], batch_size)
+
+        node_types = {node["id"]: node["type"] for node in data["nodes"]}
+        with timed_phase("SDG load: edges") as phase:
+            phase["rows"] = bulk_load_edges(session, data["edges"], node_types, batch_size)
 
+        session.flush()
         st.success("SDG data loaded successfully!")
     except Exception as e:
         st.error(f"Error loading SDG data: {e}")
+    finally:
+        bump_graph_version()
@@ -0,0 +1,49 @@
+import importlib
+import sys
+import time
+from contextlib import contextmanager
+
+# module name -> first-import cost in this process
+IMPORT_TIMES = {}
+# phase name -> duration of its last run in this process (e.g. the steps of the SDG bulk load)
+PHASE_TIMES = {}
+
+
+def timed_import(module_name):
+    """ Imports a module, recording how long its first import took and how many modules it loaded. """
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    loaded = len(sys.modules)
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    IMPORT_TIMES[module_name] = {
+        "module": module_name,
+        "seconds": round(time.perf_counter() - start, 3),
+        "modules loaded": len(sys.modules) - loaded
+    }
+    return module
+
+
+def import_report():
+    """ First-import costs recorded so far, slowest first. """
+    return sorted(IMPORT_TIMES.values(), key=lambda entry: entry["seconds"], reverse=True)
+
+
+@contextmanager
+def timed_phase(name):
+    """ Records how long the block takes under name. Setting "rows" on the yielded dict also records the throughput. """
+    entry = {"phase": name}
+    start = time.perf_counter()
+    try:
+        yield entry
+    finally:
+        elapsed = time.perf_counter() - start
+        entry["seconds"] = round(elapsed, 3)
+        if "rows" in entry:
+            entry["rows/s"] = round(entry["rows"] / max(elapsed, 1e-9))
+        PHASE_TIMES[name] = entry
+
+
+def phase_report():
+    """ Phases timed so far, in the order they first ran. """
+    return list(PHASE_TIMES.values())
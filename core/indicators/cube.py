@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from core.indicators.sdg_11_2_1 import LevelQueries
+
+CUBE_DIR = os.path.join(".cache", "cubes")
+
+# Sentinel bucket of rows without any stop of the transport class
+NO_STOP = np.iinfo(np.int16).max
+# Layout of the saved arrays; part of the file name so that cubes of an older layout are rebuilt
+CUBE_FORMAT = 3
+
+
+class AccessibilityCube(LevelQueries):
+    """ Materialized 11.2.1 cube over (spatial unit, year, MODE_TRANS, fclass, distance bucket).
+
+    For each spatial level, every population row (unit x year x mode) stores its VALEUR and, for each transport
+    class, the 1 m distance bucket of its nearest stop of that class (ceil of the distance, capped at
+    max_distance + 1). The bucket for a set of classes is the minimum over their rows, so the cube grows
+    linearly with the number of classes. Queries run the indicator's filters and threshold shares
+    (LevelQueries) on the buckets of the selected classes. Population sums per class subset are not stored, as
+    there are 2 ** len(fclasses) subsets.
+    """
+
+    def __init__(self, fclasses, years, modes, levels, max_distance=1000, hierarchy=None):
+        self.fclasses = list(fclasses)
+        self.years = list(years)
+        self.modes = list(modes)
+        self.levels = {
+            level: {**table, "unit_categories": pd.Index(table["unit_categories"])} for level, table in levels.items()
+        }
+        self.max_distance = max_distance
+        self.hierarchy = hierarchy
+
+    @classmethod
+    def build(cls, indicator, max_distance=1000):
+        """ Materializes the cube from an Indicator11_2_1 (its per-level population x distance tables). """
+        levels = {}
+        for level, table in indicator.levels.items():
+            # One contiguous row of buckets per transport class
+            buckets = np.full((len(indicator.fclasses), len(table["rows"])), NO_STOP, dtype=np.int16)
+            for j in range(len(indicator.fclasses)):
+                distance = table["distances"][:, j]
+                finite = np.isfinite(distance)
+                buckets[j, finite] = np.minimum(np.ceil(distance[finite]), max_distance + 1)
+            levels[level] = {
+                "unit_categories": np.asarray(table["unit_categories"], dtype=str),
+                "unit_codes": table["unit_codes"].astype(np.int32),
+                "year_codes": table["year_codes"].astype(np.int16),
+                "mode_codes": table["mode_codes"].astype(np.int16),
+                "values": table["values"].astype(np.float64),
+                "buckets": buckets
+            }
+        return cls(indicator.fclasses, indicator.years, indicator.modes, levels, max_distance, indicator.hierarchy)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        arrays = {
+            f"{level}/{name}": np.asarray(array, dtype=str) if name == "unit_categories" else array
+            for level, table in self.levels.items() for name, array in table.items()
+        }
+        np.savez_compressed(path, **arrays, meta=np.array(json.dumps({
+            "fclasses": self.fclasses, "years": [int(y) for y in self.years], "modes": self.modes,
+            "max_distance": self.max_distance
+        })))
+
+    @classmethod
+    def load(cls, path, hierarchy=None):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            levels = {}
+            for key in data.files:
+                if key != "meta":
+                    level, name = key.split("/")
+                    levels.setdefault(level, {})[name] = data[key]
+        return cls(meta["fclasses"], meta["years"], meta["modes"], levels, meta["max_distance"], hierarchy)
+
+    def buckets(self, level, fclasses=None):
+        """ Distance bucket of every row of a level to its nearest stop of any of the given transport classes. """
+        buckets = self.levels[level]["buckets"]
+        rows = [j for j, fclass in enumerate(self.fclasses) if fclasses is None or fclass in fclasses]
+        if not rows:
+            return np.full(buckets.shape[1], NO_STOP, dtype=np.int16)
+        return buckets[rows].min(axis=0)
+
+    def query(self, threshold, years=None, modes=None, fclasses=None, level="COMMUNE", units=None, weighted=False):
+        """ Share of rows (or of population, with weighted) within threshold meters of a stop, per year. """
+        if threshold > self.max_distance:
+            raise ValueError(f"threshold must not exceed the cube max_distance ({self.max_distance} m)")
+        table = self.levels[level]
+        buckets = self.buckets(level, fclasses)
+        # A bucket is the ceiling of the distance, so bucket <= threshold <=> distance <= threshold (whole meters)
+        distance = np.where(buckets == NO_STOP, np.inf, buckets)
+        shares = self._shares(table, distance, self._mask(table, years, modes, units), [threshold], weighted)
+        return shares.iloc[:, 0].rename("under_threshold")
+
+
+def load_or_build_cube(indicator, version, mapping=None, max_distance=1000, cube_dir=CUBE_DIR):
+    """ The cube of a dataset version, loaded from cube_dir or built from the indicator and persisted.
+
+    The file is keyed on the dataset version, the column mapping the inputs were read with (None for the
+    bundled files) and the distance method and mode of the indicator, so a cube is never served for other inputs.
+    """
+    key = hashlib.sha1(json.dumps({
+        "version": version, "mapping": mapping, "method": indicator.method, "per_year": indicator.per_year
+    }, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    path = os.path.join(cube_dir, f"sdg_11_2_1-v{CUBE_FORMAT}-{key}-{max_distance}.npz")
+    if os.path.exists(path):
+        return AccessibilityCube.load(path, indicator.hierarchy)
+    cube = AccessibilityCube.build(indicator, max_distance)
+    cube.save(path)
+    return cube
@@ -0,0 +1,218 @@
+import numpy as np
+import pandas as pd
+from core.data_cache import apply_schema
+from core.spatial_hierarchy import SpatialHierarchy
+
+LEVELS = ["COMMUNE", "IRIS"]
+BREAKDOWN = ["ANNEE_DONNEES", "MODE_TRANS", "CODE_COMMUNE"]
+ROLLUP_LEVELS = ["IRIS", "COMMUNE", "DEPARTEMENT"]
+# SDGraph attributes read for each concept of the indicator, and the column each becomes in the computation
+ATTRIBUTES = {
+    "Population": {"Space": "CODE_IRIS", "Time": "ANNEE_DONNEES", "Value": "VALEUR"},
+    "PublicTransport": {"Space": "osm_id", "Time": "year", "Capacity": "fclass"}
+}
+
+
+def weighted_accessibility(df, accessible, by=BREAKDOWN):
+    """ Population-weighted accessibility: accessible and total VALEUR and their ratio per group, as a tidy frame.
+    accessible is a boolean mask aligned with df. """
+    by = list(by)
+    values = df["VALEUR"].to_numpy(dtype=float)
+    frame = df[by].copy()
+    frame["total_VALEUR"] = values
+    frame["accessible_VALEUR"] = values * np.asarray(accessible, dtype=bool)
+    grouped = frame.groupby(by, observed=True, as_index=False)[["total_VALEUR", "accessible_VALEUR"]].sum()
+    grouped["ratio"] = grouped["accessible_VALEUR"] / grouped["total_VALEUR"]
+    return grouped
+
+
+def inputs_from_attributes(population_df, transport_df, units_gdf, stops_gdf):
+    """ Population, unit geometry, stop and stop geometry frames of the indicator from frames whose columns are
+    attribute ids (see ATTRIBUTES) and the registered GeoJSON layers.
+
+    The commune is derived from the IRIS code, and MODE_TRANS, which no attribute describes, becomes a single
+    "all" category. Raises ValueError when an attribute of ATTRIBUTES is missing, or when a geometry layer has
+    no "id" column (the unit or stop code the distances are joined on).
+    """
+    frames = {"Population": population_df, "PublicTransport": transport_df}
+    missing = [f"{concept}.{attribute}" for concept, columns in ATTRIBUTES.items()
+               for attribute in columns if attribute not in frames[concept].columns]
+    if missing:
+        raise ValueError(f"No column mapped to {', '.join(missing)}")
+    for concept, gdf in [("Population", units_gdf), ("PublicTransport", stops_gdf)]:
+        if "id" not in gdf.columns:
+            raise ValueError(f'The {concept} geometry file has no "id" column')
+    population_df = population_df[list(ATTRIBUTES["Population"])].rename(columns=ATTRIBUTES["Population"])
+    transport_df = transport_df[list(ATTRIBUTES["PublicTransport"])].rename(columns=ATTRIBUTES["PublicTransport"])
+    codes = population_df["CODE_IRIS"].astype(str)
+    population_df = population_df.assign(
+        CODE_IRIS=codes,
+        CODE_COMMUNE=SpatialHierarchy(codes.unique()).code_column(codes, "COMMUNE"),
+        MODE_TRANS="all"
+    )
+    return (
+        apply_schema(population_df),
+        units_gdf.assign(id=units_gdf["id"].astype(str)),
+        apply_schema(transport_df.assign(osm_id=transport_df["osm_id"].astype(str))),
+        stops_gdf.assign(id=stops_gdf["id"].astype(str))
+    )
+
+
+def _level_rows(population_df, level, hierarchy):
+    """ Population rows of a spatial level with a unit_id column (communes are summed from their IRIS). """
+    if level == "COMMUNE":
+        rows = population_df.groupby(
+            ["CODE_COMMUNE", "ANNEE_DONNEES", "MODE_TRANS"], as_index=False, observed=True
+        )["VALEUR"].sum()
+        rows["unit_id"] = rows["CODE_COMMUNE"]
+    else:
+        rows = population_df[["CODE_IRIS", "CODE_COMMUNE", "ANNEE_DONNEES", "MODE_TRANS", "VALEUR"]].rename(
+            columns={"CODE_IRIS": "unit_id"}
+        )
+    rows["CODE_DEPARTEMENT"] = hierarchy.code_column(rows["CODE_COMMUNE"], "DEPARTEMENT")
+    return rows
+
+
+class LevelQueries:
+    """ Filters and threshold shares over per-level row tables, shared by Indicator11_2_1 and the cube.
+
+    A table holds, for every population row, unit_codes into unit_categories (a pd.Index), year_codes and
+    mode_codes into the years and modes of the owner, and values (VALEUR). The owner also sets hierarchy.
+    """
+
+    def _mask(self, table, years=None, modes=None, units=None):
+        mask = np.ones(len(table["values"]), dtype=bool)
+        # Per-category lookups, so each filter is a single gather over the row codes
+        if years is not None:
+            mask &= np.isin(self.years, list(years))[table["year_codes"]]
+        if modes is not None:
+            mask &= np.isin(np.asarray(self.modes, dtype=object), list(modes))[table["mode_codes"]]
+        if units is not None:
+            # Codes of a coarser level (département, region) select all their units of the table's level
+            units = {
+                unit for code in units
+                for unit in ([code] if code in table["unit_categories"] else self.hierarchy.within(code))
+            }
+            mask &= np.isin(table["unit_codes"], table["unit_categories"].get_indexer(list(units)))
+        return mask
+
+    def _shares(self, table, distance, mask, thresholds, weighted=False, by_unit=False):
+        """ Share of the masked rows with a finite distance (or of their population, with weighted) under each
+        threshold, as a year x threshold frame (unit_id x year with by_unit), in one pass over the rows. """
+        mask = mask & np.isfinite(distance)
+        thresholds = np.sort(np.asarray(thresholds, dtype=float))
+
+        n_groups = len(self.years)
+        groups = table["year_codes"][mask].astype(np.int64)
+        if by_unit:
+            n_groups *= len(table["unit_categories"])
+            groups += table["unit_codes"][mask].astype(np.int64) * len(self.years)
+
+        # Row under threshold k <=> its insertion point is <= k, so cumulative sums give every threshold at once
+        bins = np.searchsorted(thresholds, distance[mask], side="left")
+        n_bins = len(thresholds) + 1
+        counts = np.bincount(
+            groups * n_bins + bins, weights=table["values"][mask] if weighted else None, minlength=n_groups * n_bins
+        ).reshape(n_groups, n_bins)
+        totals = counts.sum(axis=1)
+        under = np.cumsum(counts, axis=1)[:, :len(thresholds)]
+
+        present = totals > 0
+        if by_unit:
+            index = pd.MultiIndex.from_product(
+                [table["unit_categories"], self.years], names=["unit_id", "ANNEE_DONNEES"]
+            )[present]
+        else:
+            index = pd.Index(np.asarray(self.years)[present], name="ANNEE_DONNEES")
+        return pd.DataFrame(under[present] / totals[present, None], index=index, columns=thresholds)
+
+
+class Indicator11_2_1(LevelQueries):
+    """ SDG 11.2.1 (share of population with convenient access to public transport) on precomputed arrays.
+
+    The population x nearest-stop table is joined once per spatial level: for every population row the distance
+    to the nearest stop of each transport class in that year is stored, so the nearest distance for any class
+    subset is a row-wise minimum. With per_year=False the nearest stop is taken over the stops of all the years
+    instead, as in data/distances_2017_2021.csv. Filters are then boolean masks over NumPy arrays. Units can be given as
+    any INSEE code (e.g. "92" selects every commune or IRIS of Hauts-de-Seine), and population totals are
+    precomputed per IRIS, commune and département in population_by_level.
+    """
+
+    def __init__(self, population_df, units_gdf, engine, method="geometry", per_year=True):
+        self.method = method
+        self.per_year = per_year
+        self.years = sorted(population_df["ANNEE_DONNEES"].unique())
+        self.modes = sorted(population_df["MODE_TRANS"].unique())
+        self.fclasses = sorted(engine.stop_years["fclass"].unique())
+        self.hierarchy = SpatialHierarchy(population_df["CODE_IRIS"].astype(str).unique())
+        self.population_by_level = self.hierarchy.rollup(
+            population_df, "CODE_IRIS", ["VALEUR"], by=["ANNEE_DONNEES", "MODE_TRANS"], levels=ROLLUP_LEVELS
+        )
+        units_gdf = units_gdf.drop_duplicates("id")
+        self.levels = {
+            level: self._build_level(_level_rows(population_df, level, self.hierarchy), units_gdf, engine, method, per_year)
+            for level in LEVELS
+        }
+
+    def _build_level(self, rows, units_gdf, engine, method, per_year):
+        units_gdf = units_gdf[units_gdf["id"].isin(rows["unit_id"].unique())]
+        rows = rows[rows["unit_id"].isin(units_gdf["id"])].reset_index(drop=True)
+
+        distances = np.full((len(rows), len(self.fclasses)), np.inf)
+        stops = np.full((len(rows), len(self.fclasses)), None, dtype=object)
+        # (rows, stop years) pairs: each year's rows against that year's stops, or every row against all of them
+        if per_year:
+            groups = [(np.flatnonzero(rows["ANNEE_DONNEES"].to_numpy() == year), [year]) for year in self.years]
+        else:
+            groups = [(np.arange(len(rows)), self.years)]
+        for selected, years in groups:
+            unit_ids = rows["unit_id"].to_numpy()[selected]
+            for j, fclass in enumerate(self.fclasses):
+                nearest = engine.nearest(units_gdf, years, [fclass], method).set_index("population_id")
+                if nearest.empty:
+                    continue
+                distances[selected, j] = nearest["distance"].reindex(unit_ids).fillna(np.inf).to_numpy()
+                stops[selected, j] = nearest["transport_id"].reindex(unit_ids).to_numpy()
+
+        units = pd.Categorical(rows["unit_id"])
+        return {
+            "rows": rows,
+            "unit_categories": units.categories,
+            "unit_codes": units.codes,
+            "year_codes": np.searchsorted(self.years, rows["ANNEE_DONNEES"].to_numpy()),
+            "mode_codes": np.searchsorted(self.modes, rows["MODE_TRANS"].to_numpy()),
+            "values": rows["VALEUR"].to_numpy(dtype=float),
+            "distances": distances,
+            "stops": stops
+        }
+
+    def _nearest(self, table, fclasses=None):
+        """ Nearest distance and stop id over the given transport classes, for every row. """
+        columns = [j for j, fclass in enumerate(self.fclasses) if fclasses is None or fclass in fclasses]
+        if not columns:
+            return np.full(len(table["rows"]), np.inf), np.full(len(table["rows"]), None, dtype=object)
+        distances = table["distances"][:, columns]
+        best = distances.argmin(axis=1)
+        return distances[np.arange(len(best)), best], table["stops"][:, columns][np.arange(len(best)), best]
+
+    def rows(self, years=None, modes=None, fclasses=None, level="COMMUNE", units=None):
+        """ Filtered population rows with their nearest stop (transport_id) and distance. """
+        table = self.levels[level]
+        mask = self._mask(table, years, modes, units)
+        distance, stop = self._nearest(table, fclasses)
+        rows = table["rows"][mask].copy()
+        rows["distance"] = distance[mask]
+        rows["transport_id"] = stop[mask]
+        return rows[np.isfinite(rows["distance"].to_numpy())]
+
+    def sweep(self, thresholds, years=None, modes=None, fclasses=None, level="COMMUNE", units=None, weighted=False,
+              by_unit=False):
+        """ Share of rows (or of population, with weighted) under each threshold, as a year x threshold frame
+        (unit_id x year with by_unit), in one pass over the rows. """
+        table = self.levels[level]
+        distance, _ = self._nearest(table, fclasses)
+        return self._shares(table, distance, self._mask(table, years, modes, units), thresholds, weighted, by_unit)
+
+    def query(self, threshold, years=None, modes=None, fclasses=None, level="COMMUNE", units=None):
+        """ Share of rows within threshold meters of a stop, per year. """
+        return self.sweep([threshold], years, modes, fclasses, level, units).iloc[:, 0].rename("under_threshold")
@@ -0,0 +1,118 @@
+import datetime
+import re
+import numpy as np
+
+EARLIEST_YEAR = 1900
+
+_RANGE = re.compile(r"((?:1[89]|20)\d{2})\s*(?:-|–|to|à|au)\s*((?:1[89]|20)\d{2})", re.IGNORECASE)
+_SINCE = re.compile(r"(since|from|depuis|after|après)\s*((?:1[89]|20)\d{2})|((?:1[89]|20)\d{2})\s*(?:-|–|\+)\s*$", re.IGNORECASE)
+_UNTIL = re.compile(r"(until|before|up to|jusqu'en|avant)\s*((?:1[89]|20)\d{2})", re.IGNORECASE)
+# Bounds that exclude their year ("before 2020" ends in 2019, "after 2017" starts in 2018)
+_EXCLUSIVE = {"after", "après", "before", "avant"}
+_YEAR = re.compile(r"(?:1[89]|20)\d{2}")
+
+
+def parse_interval(text, today=None):
+    """ Parses a time description ("2017-2022", "Since 2017", "until 2020", "before 2020", "2019") into an
+    inclusive (start_year, end_year) interval, or None when no year is found. "since" and "until" include
+    their year, "after" and "before" exclude it. """
+    text = str(text or "").strip()
+    current_year = (today or datetime.date.today()).year
+    match = _RANGE.search(text)
+    if match:
+        start, end = int(match.group(1)), int(match.group(2))
+        return min(start, end), max(start, end)
+    match = _SINCE.search(text)
+    if match:
+        if match.group(2):
+            start = int(match.group(2)) + (match.group(1).lower() in _EXCLUSIVE)
+            return start, max(start, current_year)
+        return int(match.group(3)), current_year
+    match = _UNTIL.search(text)
+    if match:
+        return EARLIEST_YEAR, int(match.group(2)) - (match.group(1).lower() in _EXCLUSIVE)
+    years = [int(year) for year in _YEAR.findall(text)]
+    if years:
+        return min(years), max(years)
+    return None
+
+
+def overlap_fraction(starts, ends, query):
+    """ Share of the query interval covered by each [start, end] interval (inclusive years), vectorized. """
+    q_start, q_end = query
+    overlap = np.minimum(ends, q_end) - np.maximum(starts, q_start) + 1
+    return np.clip(overlap, 0, None) / (q_end - q_start + 1)
+
+
+class IntervalTree:
+    """ Static centered interval tree over inclusive integer intervals, answering overlap queries in O(log n + k). """
+
+    def __init__(self, intervals):
+        """ intervals is a list of (start, end, payload). """
+        self.root = self._build(list(intervals))
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+        points = sorted(p for start, end, _ in intervals for p in (start, end))
+        center = points[len(points) // 2]
+        here = [i for i in intervals if i[0] <= center <= i[1]]
+        return {
+            "center": center,
+            "by_start": sorted(here, key=lambda i: i[0]),
+            "by_end": sorted(here, key=lambda i: i[1], reverse=True),
+            "left": self._build([i for i in intervals if i[1] < center]),
+            "right": self._build([i for i in intervals if i[0] > center])
+        }
+
+    def overlapping(self, start, end):
+        """ Payloads of the intervals overlapping [start, end]. """
+        found = []
+        node = self.root
+        stack = [node] if node else []
+        while stack:
+            node = stack.pop()
+            if end < node["center"]:
+                # Every interval here ends at or after the center, so only the start needs checking
+                for i in node["by_start"]:
+                    if i[0] > end:
+                        break
+                    found.append(i[2])
+                if node["left"]:
+                    stack.append(node["left"])
+            elif start > node["center"]:
+                for i in node["by_end"]:
+                    if i[1] < start:
+                        break
+                    found.append(i[2])
+                if node["right"]:
+                    stack.append(node["right"])
+            else:
+                found.extend(i[2] for i in node["by_start"])
+                if node["left"]:
+                    stack.append(node["left"])
+                if node["right"]:
+                    stack.append(node["right"])
+        return found
+
+    def covering(self, start, end):
+        """ Payloads of the intervals containing the whole of [start, end]. """
+        found = []
+        node = self.root
+        # Intervals containing [start, end] contain start, so a stabbing query on start suffices
+        while node:
+            if start < node["center"]:
+                for i in node["by_start"]:
+                    if i[0] > start:
+                        break
+                    if i[1] >= end:
+                        found.append(i[2])
+                node = node["left"]
+            else:
+                for i in node["by_end"]:
+                    if i[1] < start:
+                        break
+                    if i[0] <= start and i[1] >= end:
+                        found.append(i[2])
+                node = node["right"]
+        return found
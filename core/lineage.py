@@ -0,0 +1,86 @@
+import re
+import threading
+import pyarrow.parquet as pq
+from core.data_cache import DATASETS, build_cache, load_dataset
+from core.graph_cache import graph_version
+
+# (graph identity, indicator) -> (graph state, sources)
+_lineage = {}
+_lineage_lock = threading.Lock()
+
+
+def resolve_lineage(session, indicator):
+    """ Data sources of an indicator: concept -> list of {"database", "csv_path", "geojson_path", "encoding",
+    "separator", "columns"}, columns being the CSV column -> attribute id mapping.
+
+    The graph is walked once per state of the graph the session reads (its checksum, which also changes with
+    writes of other processes, and the local graph version); later calls are answered from memory.
+    """
+    key = (session.identity, indicator)
+    version = (tuple(session.checksum()), graph_version())
+    with _lineage_lock:
+        cached = _lineage.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    sources = {}
+    for row in session.lineage_rows(indicator):
+        columns = {}
+        for column, attribute in row["columns"]:
+            if columns.setdefault(column, attribute) != attribute:
+                raise ValueError(
+                    f'Column {column} of {row["database"]} is mapped to several attributes '
+                    f'({columns[column]}, {attribute}); register the database again with one attribute per column'
+                )
+        sources.setdefault(row["concept"], []).append({
+            "database": row["database"],
+            "csv_path": row["csv_path"],
+            "geojson_path": row["geojson_path"],
+            "encoding": row["encoding"] or "utf-8",
+            "separator": row["separator"] or ",",
+            "columns": columns
+        })
+    with _lineage_lock:
+        _lineage[key] = (version, sources)
+    return sources
+
+
+def source_names(source):
+    """ The dataset names of the CSV and of the GeoJSON (None without one) of a data source. """
+    name = "db_" + re.sub(r"\W+", "_", str(source["database"])).strip("_").lower()
+    return name, f"{name}_geo" if source.get("geojson_path") else None
+
+
+def source_datasets(source):
+    """ core.data_cache.DATASETS with the files of a data source added, so that they get a Parquet cache like the
+    bundled datasets; pass it as datasets= to the core.data_cache functions. DATASETS itself is left as is. """
+    name, geo_name = source_names(source)
+    columns = source["columns"]
+    time_columns = [column for column, attribute in columns.items() if attribute == "Time"]
+    datasets = {**DATASETS}
+    datasets[name] = {
+        "path": source["csv_path"],
+        "read": {
+            "encoding": source["encoding"],
+            "sep": source["separator"],
+            # Codes keep their leading zeros
+            "dtype": {column: str for column, attribute in columns.items() if attribute == "Space"}
+        },
+        "year_column": time_columns[0] if time_columns else None
+    }
+    if geo_name:
+        datasets[geo_name] = {"path": source["geojson_path"], "year_column": None}
+    return datasets
+
+
+def load_attributes(source, attributes, years=None):
+    """ The columns of a source mapped to the given attributes, renamed to the attribute ids. Only these columns
+    are read from the Parquet cache; attributes without a mapped column are absent from the frame. """
+    name, _ = source_names(source)
+    datasets = source_datasets(source)
+    # Mappings may name columns the file does not have (e.g. edited since registration)
+    present = set(pq.read_schema(build_cache(name, datasets)).names)
+    columns = {
+        column: attribute for column, attribute in source["columns"].items()
+        if attribute in attributes and column in present
+    }
+    return load_dataset(name, columns=list(columns), years=years, datasets=datasets).rename(columns=columns)
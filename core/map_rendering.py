@@ -0,0 +1,70 @@
+import json
+import math
+import folium
+import numpy as np
+import shapely
+from folium.plugins import FastMarkerCluster
+from core.graph_cache import SnapshotCache
+
+# Simplification tolerance (meters, in Lambert-93) per zoom level: a few pixels at that zoom
+ZOOM_TOLERANCES = {8: 250.0, 10: 60.0, 12: 15.0, 14: 4.0, 16: 1.0}
+METRIC_CRS = "EPSG:2154"
+MAP_CRS = "EPSG:4326"
+
+# Serialized layers keyed by (dataset version, filters, zoom), shared by every map of the page
+geojson_cache = SnapshotCache(max_snapshots=16)
+
+
+def tolerance_for_zoom(zoom):
+    levels = [level for level in sorted(ZOOM_TOLERANCES) if level <= zoom]
+    return ZOOM_TOLERANCES[levels[-1] if levels else min(ZOOM_TOLERANCES)]
+
+
+def map_view(*gdfs, width=450):
+    """ Center, bounds ([[south, west], [north, east]]) and fitting zoom of the given layers, from their total bounds. """
+    bounds = np.array([gdf.to_crs(MAP_CRS).total_bounds for gdf in gdfs if gdf is not None and not gdf.empty])
+    if not len(bounds):
+        return {"center": [0, 0], "bounds": None, "zoom": 2}
+    west, south = float(bounds[:, 0].min()), float(bounds[:, 1].min())
+    east, north = float(bounds[:, 2].max()), float(bounds[:, 3].max())
+    span = max(east - west, 1e-6)
+    zoom = int(np.clip(math.log2(360 * width / 256 / span), 2, 18))
+    return {"center": [(south + north) / 2, (west + east) / 2], "bounds": [[south, west], [north, east]], "zoom": zoom}
+
+
+def simplify_for_zoom(gdf, zoom):
+    """ Polygons simplified for the zoom level (topology preserved), in EPSG:4326 with 6-decimal coordinates. """
+    gdf = gdf.to_crs(METRIC_CRS)
+    gdf = gdf.set_geometry(gdf.geometry.simplify(tolerance_for_zoom(zoom), preserve_topology=True)).to_crs(MAP_CRS)
+    return gdf.set_geometry(shapely.set_precision(gdf.geometry.values, 1e-6))
+
+
+def cached_geojson(version, filters, gdf, zoom, properties=()):
+    """ GeoJSON of the simplified layer with only the given properties, serialized once per (version, filters, zoom).
+    version identifies the content of the geometry file (see core.data_cache.dataset_version), so a file replaced
+    under the same dataset name is serialized again. """
+    key = {"version": version, "filters": json.loads(json.dumps(filters, sort_keys=True, default=str)), "zoom": zoom}
+    geojson = geojson_cache.get(key)
+    if geojson is None:
+        layer = simplify_for_zoom(gdf[list(properties) + [gdf.geometry.name]], zoom)
+        geojson = json.loads(layer.to_json(drop_id=True))
+        geojson_cache.put(key, geojson)
+    return geojson
+
+
+def stop_layer(gdf, name=None, color="#3388ff"):
+    """ Clustered circle-marker layer of point geometries, built client-side from a plain coordinate array. """
+    points = gdf.to_crs(MAP_CRS).geometry
+    points = points[points.geom_type == "Point"]
+    coordinates = shapely.get_coordinates(points.values)[:, ::-1]
+    callback = f"""function (row) {{
+        return L.circleMarker(new L.LatLng(row[0], row[1]), {{radius: 4, color: "{color}"}});
+    }}"""
+    return FastMarkerCluster(np.round(coordinates, 6).tolist(), callback=callback, name=name)
+
+
+def base_map(view, tiles="CartoDB positron"):
+    m = folium.Map(location=view["center"], zoom_start=view["zoom"], tiles=tiles)
+    if view["bounds"]:
+        m.fit_bounds(view["bounds"])
+    return m
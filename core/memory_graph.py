@@ -0,0 +1,451 @@
+import atexit
+import itertools
+import json
+import os
+import threading
+import numpy as np
+from core.graph_backend import GraphBackend
+
+MEMORY_GRAPH_FILE = os.path.join(".cache", "sdgraph.json")
+SDG_FILE = "sdg_initt.json"
+# The write log is folded into the snapshot once it holds this many entries
+COMPACT_AFTER = 100000
+# Identities of the graphs without a path, unique to the process as snapshots keyed on them may be on disk
+_unnamed = itertools.count()
+
+
+class MemoryNode(dict):
+    """ Node properties, with .labels like a neo4j Node, so that records read the same from both backends. """
+
+    def __init__(self, labels, properties):
+        super().__init__(properties)
+        self.labels = frozenset(labels)
+
+
+class MemoryGraph(GraphBackend):
+    """ In-memory GraphBackend, for running the app and the tests without a database server.
+
+    Nodes are unique per (label, id), as under the Neo4j uniqueness constraints, and held in a label index and
+    an id index. Relationships are appended to edge lists; for each relationship type an outgoing and an
+    incoming CSR adjacency (indptr / indices NumPy arrays) is rebuilt lazily after writes, so traversals are
+    array slices. Reads take the same lock as writes, so they never see a write operation half applied.
+
+    With a path, the graph is persisted as a JSON snapshot plus an append-only log of the writes made since
+    (<path>.log, one JSON line per write): each write operation appends its entries, and flush() folds the log
+    into a new snapshot. Loading reads the snapshot and replays the log.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.identity = ("memory", os.path.abspath(path) if path else f"unnamed-{os.getpid()}-{next(_unnamed)}")
+        self._lock = threading.RLock()
+        self._journal = []
+        self._log_entries = 0
+        self._dirty = False
+        self._replaying = False
+        self._reset()
+
+    def _reset(self):
+        self.labels = []
+        self.properties = []
+        self.index = {}
+        self.by_label = {}
+        self.by_id = {}
+        self.edge_src = []
+        self.edge_dst = []
+        self.edge_type = []
+        self._edge_keys = set()
+        self._csr = None
+
+    # --- Write log ---
+
+    def _log(self, entry):
+        self._dirty = True
+        if self.path and not self._replaying:
+            self._journal.append(entry)
+
+    def _commit(self):
+        """ Appends the entries of the last write operation to the log. """
+        with self._lock:
+            if not self._journal:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(f"{self.path}.log", "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(entry) + "\n" for entry in self._journal)
+            self._log_entries += len(self._journal)
+            self._journal = []
+            if self._log_entries >= COMPACT_AFTER:
+                self.flush()
+
+    def flush(self):
+        """ Writes the snapshot and empties the log. """
+        with self._lock:
+            if not self.path or not self._dirty:
+                return
+            self.save()
+            if os.path.exists(f"{self.path}.log"):
+                os.remove(f"{self.path}.log")
+            self._journal = []
+            self._log_entries = 0
+            self._dirty = False
+
+    # --- Write primitives ---
+
+    def merge_node(self, label, node_id, properties=None):
+        """ MERGE (n:label {id: node_id}) SET n += properties; returns the node index. """
+        with self._lock:
+            key = (label, node_id)
+            if key not in self.index:
+                self.index[key] = len(self.labels)
+                self.labels.append(label)
+                self.properties.append({"id": node_id})
+                self.by_label.setdefault(label, []).append(self.index[key])
+                self.by_id.setdefault(node_id, []).append(self.index[key])
+            i = self.index[key]
+            properties = {k: v for k, v in (properties or {}).items() if v is not None}
+            self.properties[i].update(properties)
+            self._log(["node", label, node_id, properties])
+            return i
+
+    def merge_edge(self, source, rel_type, target):
+        """ MERGE (source)-[:rel_type]->(target), given node indexes. """
+        with self._lock:
+            key = (source, rel_type, target)
+            if key not in self._edge_keys:
+                self._edge_keys.add(key)
+                self.edge_src.append(source)
+                self.edge_dst.append(target)
+                self.edge_type.append(rel_type)
+                self._csr = None
+                self._log([
+                    "edge", self.labels[source], self.properties[source]["id"], rel_type,
+                    self.labels[target], self.properties[target]["id"]
+                ])
+
+    # --- GraphBackend writes ---
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            self._log(["clear"])
+            self._commit()
+
+    def create_constraints(self, labels):
+        # Nodes are already unique per (label, id) and indexed
+        pass
+
+    def merge_nodes(self, label, rows, batch_size=None):
+        with self._lock:
+            for row in rows:
+                self.merge_node(label, row["id"], row["properties"])
+            self._commit()
+        return len(rows)
+
+    def merge_edges(self, rel_type, source_label, target_label, rows, batch_size=None):
+        with self._lock:
+            for row in rows:
+                source, target = self.find(row["source"], source_label), self.find(row["target"], target_label)
+                if source is not None and target is not None:
+                    self.merge_edge(source, rel_type, target)
+            self._commit()
+        return len(rows)
+
+    def find(self, node_id, label=None):
+        """ Index of the node with this id (and label, when given), or None. """
+        with self._lock:
+            if label is not None:
+                return self.index.get((label, node_id))
+            return (self.by_id.get(node_id) or [None])[0]
+
+    # --- CSR adjacency ---
+
+    def _adjacency(self):
+        with self._lock:
+            if self._csr is None:
+                n = len(self.labels)
+                src, dst = np.array(self.edge_src, dtype=np.int64), np.array(self.edge_dst, dtype=np.int64)
+                types = np.array(self.edge_type, dtype=object)
+                self._csr = {}
+                for rel_type in sorted(set(self.edge_type)):
+                    selected = types == rel_type
+                    self._csr[rel_type] = {
+                        "out": self._build_csr(src[selected], dst[selected], n),
+                        "in": self._build_csr(dst[selected], src[selected], n)
+                    }
+            return self._csr
+
+    @staticmethod
+    def _build_csr(rows, columns, n):
+        order = np.argsort(rows, kind="stable")
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+        return indptr, columns[order]
+
+    def neighbours(self, i, rel_type=None, direction="out"):
+        """ Node indexes linked to node i by rel_type (any type when None), following direction "out" or "in". """
+        with self._lock:
+            adjacency = self._adjacency()
+            types = [rel_type] if rel_type else list(adjacency)
+            found = [
+                adjacency[t][direction][1][adjacency[t][direction][0][i]:adjacency[t][direction][0][i + 1]]
+                for t in types if t in adjacency
+            ]
+            return np.concatenate(found) if found else np.array([], dtype=np.int64)
+
+    def relationships(self, i):
+        """ (type, outgoing, other node index) of every relationship of node i. """
+        with self._lock:
+            adjacency = self._adjacency()
+            found = []
+            for rel_type, csr in adjacency.items():
+                for direction, outgoing in (("out", True), ("in", False)):
+                    indptr, indices = csr[direction]
+                    found.extend((rel_type, outgoing, int(j)) for j in indices[indptr[i]:indptr[i + 1]])
+            return found
+
+    def node(self, i):
+        with self._lock:
+            return MemoryNode([self.labels[i]], self.properties[i])
+
+    # --- GraphBackend reads ---
+
+    def nodes_with_label(self, label):
+        with self._lock:
+            return [self.node(i) for i in self.by_label.get(label, [])]
+
+    def concepts(self):
+        return [node["id"] for node in self.nodes_with_label("Concept")]
+
+    def concept_attributes(self, concept):
+        return self.linked_ids("Concept", concept, "HAS_ATTRIBUTE", "Attribute")
+
+    def subgraph(self, labels):
+        with self._lock:
+            nodes = [
+                {"label": label, "id": str(node["id"]), "name": str(node.get("name", node["id"])),
+                 "description": node.get("description", "No description available."), "image": node.get("image")}
+                for label in labels for node in self.nodes_with_label(label)
+            ]
+            return nodes, self.edge_rows(labels)
+
+    def edges(self):
+        return self.edge_rows()
+
+    def edge_rows(self, labels=None):
+        """ (start id, end id, type) of every relationship, or only of those between nodes of the given labels. """
+        with self._lock:
+            return [
+                (str(self.properties[s]["id"]), str(self.properties[d]["id"]), t)
+                for s, d, t in zip(self.edge_src, self.edge_dst, self.edge_type)
+                if labels is None or (self.labels[s] in labels and self.labels[d] in labels)
+            ]
+
+    def linked_ids(self, label, node_id, rel_type, target_label, direction="out"):
+        """ Ids of the target_label nodes linked to (label {id: node_id}) by rel_type. """
+        with self._lock:
+            i = self.find(node_id, label)
+            if i is None:
+                return []
+            return [self.properties[j]["id"] for j in self.neighbours(i, rel_type, direction) if self.labels[j] == target_label]
+
+    def checksum(self):
+        with self._lock:
+            return len(self.labels), len(self.edge_src)
+
+    def register_database(self, parameters, indicator="11.2.1"):
+        with self._lock:
+            if self.find(parameters["db_name"], "Database") is not None:
+                return None
+            db = self.merge_node("Database", parameters["db_name"], {
+                "geojson_filepath": parameters["geojson_path"], "csv_filepath": parameters["csv_path"],
+                "csv_encoding": parameters["encoding"], "csv_separator": parameters["separator"],
+                **parameters["metadata"]
+            })
+            concept = self.find(parameters["concept"], "Concept")
+            if concept is not None:
+                self.merge_edge(concept, "HAS_INSTANCE", db)
+            for row in parameters["columns"]:
+                column = self.merge_node("Column", row["id"], {"name": row["column"]})
+                attribute = self.merge_node("Attribute", row["attribute"])
+                self.merge_edge(column, "IS_MAPPED_TO", attribute)
+                self.merge_edge(db, "HAS_COLUMN", column)
+            self._commit()
+            return self.lineage_records(indicator, db) if parameters["return_subgraph"] else []
+
+    def lineage_records(self, indicator, db=None):
+        """ Records of (g:Goal)-->(t:Target)-->(i:Indicator)-[:HAS_CONCEPT]->(c)-[:HAS_INSTANCE]->(db)
+        -[:HAS_COLUMN]->(col)-[:IS_MAPPED_TO]->(attr), walked on the CSR adjacency. """
+        with self._lock:
+            i = self.find(indicator, "Indicator")
+            if i is None:
+                return []
+            records = []
+            targets = [t for t in self.neighbours(i, direction="in") if self.labels[t] == "Target"]
+            goals = [(g, t) for t in targets for g in self.neighbours(t, direction="in") if self.labels[g] == "Goal"]
+            for c in self.neighbours(i, "HAS_CONCEPT"):
+                for d in self.neighbours(c, "HAS_INSTANCE"):
+                    if db is not None and d != db:
+                        continue
+                    for col in self.neighbours(d, "HAS_COLUMN"):
+                        for attr in self.neighbours(col, "IS_MAPPED_TO"):
+                            records.extend({
+                                "g": self.node(g), "t": self.node(t), "i": self.node(i), "c": self.node(c),
+                                "db": self.node(d), "col": self.node(col), "attr": self.node(attr)
+                            } for g, t in goals)
+            return records
+
+    def lineage_rows(self, indicator):
+        with self._lock:
+            i = self.find(indicator, "Indicator")
+            if i is None:
+                return []
+            rows = []
+            for c in self.neighbours(i, "HAS_CONCEPT"):
+                for d in self.neighbours(c, "HAS_INSTANCE"):
+                    properties = self.properties[d]
+                    rows.append({
+                        "concept": self.properties[c]["id"], "database": properties["id"],
+                        "csv_path": properties.get("csv_filepath"), "geojson_path": properties.get("geojson_filepath"),
+                        "encoding": properties.get("csv_encoding"), "separator": properties.get("csv_separator"),
+                        "columns": [
+                            [self.properties[col].get("name", self.properties[col]["id"]), self.properties[attr]["id"]]
+                            for col in self.neighbours(d, "HAS_COLUMN") for attr in self.neighbours(col, "IS_MAPPED_TO")
+                        ]
+                    })
+            return sorted(rows, key=lambda row: (str(row["concept"]), str(row["database"])))
+
+    def catalog_rows(self, known):
+        with self._lock:
+            known = set(known)
+            rows = []
+            for d in self.by_label.get("Database", []):
+                properties = self.properties[d]
+                if properties["id"] in known:
+                    continue
+                rows.append({
+                    "name": properties["id"], "D_s": properties.get("space"), "D_t": properties.get("time"),
+                    "D_c": properties.get("context"), "D_r": properties.get("reliability"),
+                    "D_p": properties.get("completeness"),
+                    "concepts": [self.properties[c]["id"] for c in self.neighbours(d, "HAS_INSTANCE", "in")]
+                })
+            return rows
+
+    def neighbourhood_rows(self, label, frontier, seen, labels, page_size):
+        with self._lock:
+            seen = set(seen)
+            rows = []
+            for f in frontier:
+                i = self.find(f["id"], label)
+                if i is None:
+                    continue
+                relationships = sorted(self.relationships(i), key=lambda r: str(self.properties[r[2]]["id"]))
+                page = relationships[f["skip"]:f["skip"] + page_size] or [None]
+                for entry in page:
+                    row = {"origin": str(f["id"]), "degree": len(relationships), "type": None, "outgoing": None,
+                           "id": None, "label": None, "name": None}
+                    if entry is not None:
+                        rel_type, outgoing, j = entry
+                        other = str(self.properties[j]["id"])
+                        row.update(type=rel_type, outgoing=outgoing, id=other)
+                        if other not in seen:
+                            row.update(label=self.labels[j] if self.labels[j] in labels else None,
+                                       name=str(self.properties[j].get("name", other)))
+                    rows.append(row)
+            return rows
+
+    def find_rows(self, label, text, limit):
+        with self._lock:
+            rows = [
+                {"id": str(p["id"]), "name": str(p.get("name", p["id"]))}
+                for p in (self.properties[i] for i in self.by_label.get(label, []))
+                if str(p["id"]) == str(text) or str(text).lower() in str(p.get("name", "")).lower()
+            ]
+            return sorted(rows, key=lambda row: (len(row["id"]), row["id"]))[:limit]
+
+    # --- Persistence ---
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "nodes": [{"label": label, "properties": properties} for label, properties in zip(self.labels, self.properties)],
+                "edges": [[s, t, d] for s, t, d in zip(self.edge_src, self.edge_type, self.edge_dst)]
+            }
+
+    def save(self, path=None):
+        with self._lock:
+            path = path or self.path
+            if not path:
+                return
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f)
+            os.replace(tmp_path, path)
+
+    def _replay(self, entry):
+        if entry[0] == "clear":
+            self._reset()
+        elif entry[0] == "node":
+            self.merge_node(entry[1], entry[2], entry[3])
+        else:
+            _, source_label, source_id, rel_type, target_label, target_id = entry
+            self.merge_edge(self.find(source_id, source_label), rel_type, self.find(target_id, target_label))
+
+    @classmethod
+    def load(cls, path):
+        """ The graph of the snapshot at path (if any) with the writes of its log replayed. """
+        graph = cls(path)
+        graph._replaying = True
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for node in data["nodes"]:
+                graph.merge_node(node["label"], node["properties"]["id"], node["properties"])
+            for source, rel_type, target in data["edges"]:
+                graph.merge_edge(source, rel_type, target)
+        if os.path.exists(f"{path}.log"):
+            with open(f"{path}.log", "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        graph._replay(json.loads(line))
+                        graph._log_entries += 1
+        graph._replaying = False
+        graph._dirty = graph._log_entries > 0
+        return graph
+
+
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+
+def get_memory_graph(path=MEMORY_GRAPH_FILE, sdg_file=SDG_FILE):
+    """ The in-memory graph persisted at path, shared by the whole process. A new graph starts from the
+    SDG taxonomy of sdg_file. """
+    with _graphs_lock:
+        if path not in _graphs:
+            if os.path.exists(path) or os.path.exists(f"{path}.log"):
+                _graphs[path] = MemoryGraph.load(path)
+            else:
+                graph = MemoryGraph(path)
+                if sdg_file and os.path.exists(sdg_file):
+                    with open(sdg_file, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                    for node in data["nodes"]:
+                        graph.merge_node(node["type"], node["id"], {k: v for k, v in node.items() if k not in ["id", "type"]})
+                    for edge in data["edges"]:
+                        source, target = graph.find(edge["source"]), graph.find(edge["target"])
+                        if source is not None and target is not None:
+                            graph.merge_edge(source, edge["label"], target)
+                graph.flush()
+                _graphs[path] = graph
+        return _graphs[path]
+
+
+def flush_memory_graphs():
+    """ Writes the snapshot of every in-memory graph of the process. """
+    with _graphs_lock:
+        for graph in _graphs.values():
+            graph.flush()
+
+
+atexit.register(flush_memory_graphs)
@@ -0,0 +1,103 @@
+from core.functions import LABEL_COLORS
+
+# Node types a neighbourhood exploration can start from
+START_LABELS = ["Goal", "Indicator", "Database"]
+
+
+def find_nodes(session, text, labels=START_LABELS, limit=20):
+    """ Start-node candidates: nodes of the given labels whose id is text or whose name contains it. """
+    found = []
+    for label in [label for label in LABEL_COLORS if label in labels]:
+        for record in session.find_rows(label, text, limit):
+            found.append({"id": record["id"], "label": label, "name": record["name"]})
+    return found[:limit]
+
+
+def fetch_neighbourhood(session, frontier, seen, page_size=25):
+    """ One page of neighbours of each frontier node.
+
+    frontier is a list of {"id", "label", "skip"}; it is grouped by label so that every lookup hits the id
+    index of that label. Neighbours whose id is in seen come back without their data.
+    Returns the records as dicts.
+    """
+    groups = {}
+    for node in frontier:
+        if node["label"] in LABEL_COLORS:
+            groups.setdefault(node["label"], []).append({"id": node["id"], "skip": int(node.get("skip", 0))})
+    records = []
+    for label, rows in groups.items():
+        records.extend(session.neighbourhood_rows(label, rows, list(seen), list(LABEL_COLORS), page_size))
+    return records
+
+
+class NeighbourhoodBuffer:
+    """ Client-side buffer of the explored part of the graph.
+
+    Expansions are merged into it: nodes already in the buffer are never fetched again, each node remembers how
+    many of its neighbours were paged in (so expanding it again fetches the next page), and the buffer stops
+    growing at max_nodes so that the rendered payload stays bounded.
+    """
+
+    def __init__(self, max_nodes=500, page_size=25):
+        self.max_nodes = max_nodes
+        self.page_size = page_size
+        self.nodes = {}
+        self.edges = {}
+        self.loaded = {}
+        self.degrees = {}
+        self.truncated = False
+
+    def add_node(self, node_id, label, name=None):
+        if node_id not in self.nodes:
+            self.nodes[node_id] = {"id": node_id, "label": label, "name": name or node_id}
+
+    def remaining(self, node_id):
+        """ Neighbours of node_id not paged in yet (None until the node is expanded once). """
+        if node_id not in self.degrees:
+            return None
+        return max(self.degrees[node_id] - self.loaded.get(node_id, 0), 0)
+
+    def expand(self, session, node_ids, hops=1):
+        """ Pages in the neighbours of node_ids, then of the new nodes, for the given number of hops.
+        Returns the number of nodes added. """
+        before = len(self.nodes)
+        frontier = [node_id for node_id in node_ids if node_id in self.nodes]
+        for _ in range(hops):
+            if not frontier:
+                break
+            if len(self.nodes) >= self.max_nodes:
+                self.truncated = True
+                break
+            records = fetch_neighbourhood(
+                session,
+                [{"id": node_id, "label": self.nodes[node_id]["label"], "skip": self.loaded.get(node_id, 0)} for node_id in frontier],
+                self.nodes, self.page_size
+            )
+            added = []
+            for record in records:
+                origin = record["origin"]
+                self.degrees[origin] = record["degree"]
+                if record["id"] is None:
+                    continue
+                if record["id"] not in self.nodes:
+                    if len(self.nodes) >= self.max_nodes:
+                        # The rest stays unloaded, so the paged-in neighbours of every node remain a prefix
+                        self.truncated = True
+                        break
+                    self.add_node(record["id"], record["label"], record["name"])
+                    added.append(record["id"])
+                self.loaded[origin] = self.loaded.get(origin, 0) + 1
+                source, target = (origin, record["id"]) if record["outgoing"] else (record["id"], origin)
+                self.edges[(source, record["type"], target)] = True
+            frontier = added
+        return len(self.nodes) - before
+
+    def elements(self):
+        """ st-link-analysis elements of the buffer. """
+        return {
+            "nodes": [{"data": node} for node in self.nodes.values()],
+            "edges": [
+                {"data": {"id": f"e{i}", "label": label, "source": source, "target": target}}
+                for i, (source, label, target) in enumerate(self.edges, 1)
+            ]
+        }
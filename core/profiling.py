@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+PROFILE_DIR = os.path.join(".cache", "profiles")
+
+
+class HyperLogLog:
+    """ Approximate distinct counter over 64-bit pandas hashes, with 2**p registers (~1.04 / sqrt(2**p) error). """
+
+    def __init__(self, p=12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def update(self, series):
+        if series.empty:
+            return
+        hashes = pd.util.hash_pandas_object(series, index=False).to_numpy(dtype=np.uint64)
+        index = (hashes & np.uint64(self.m - 1)).astype(np.int64)
+        # Bit length of the remaining 64 - p bits, from their two 32-bit halves: each half is exact as a float64
+        # (the whole value is not once it has more than 53 bits, i.e. for p < 11), so frexp gives its bit length
+        rest = hashes >> np.uint64(self.p)
+        _, high = np.frexp((rest >> np.uint64(32)).astype(np.float64))
+        _, low = np.frexp((rest & np.uint64(0xFFFFFFFF)).astype(np.float64))
+        bit_length = np.where(high > 0, high + 32, low)
+        rank = (64 - self.p - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m ** 2 / np.sum(2.0 ** -self.registers.astype(np.float64))
+        zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * np.log(self.m / zeros)
+        return int(round(estimate))
+
+
+class Reservoir:
+    """ Uniform sample of k distinct non-null values of a column seen chunk by chunk (algorithm R over the values
+    not already held, so a column with few frequent values still yields up to k different samples). """
+
+    def __init__(self, k=10, seed=0):
+        self.k = k
+        self.seen = 0
+        self.values = []
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, series):
+        held = set(self.values)
+        values = pd.unique(series.dropna().to_numpy())
+        values = values[[value not in held for value in values]] if held else values
+        if len(values) == 0:
+            return
+        fill = max(0, min(self.k - len(self.values), len(values)))
+        self.values.extend(values[:fill].tolist())
+        rest = values[fill:]
+        if len(rest):
+            positions = self.seen + fill + np.arange(1, len(rest) + 1)
+            slots = (self.rng.random(len(rest)) * positions).astype(np.int64)
+            for slot, value in zip(slots[slots < self.k], rest[slots < self.k]):
+                self.values[slot] = value.item() if hasattr(value, "item") else value
+        self.seen += len(values)
+
+
+def _merge_dtype(current, dtype):
+    """ Widens the dtype inferred so far with the dtype pandas inferred for a new chunk. """
+    if current is None or current == dtype:
+        return dtype
+    numeric = {"bool", "int64", "float64"}
+    if current in numeric and dtype in numeric and "bool" not in (current, dtype):
+        return "float64"
+    return "object"
+
+
+def upload_hash(file, memo=None):
+    """ SHA-1 of an uploaded file (or path), read in blocks.
+    With memo (e.g. st.session_state), the hash of an uploaded file is kept per file_id, so reruns of the page
+    do not read the upload again. """
+    file_id = getattr(file, "file_id", None)
+    if memo is not None and file_id is not None:
+        key = f"upload_hash_{file_id}"
+        if key not in memo:
+            memo[key] = upload_hash(file)
+        return memo[key]
+    digest = hashlib.sha1()
+    if isinstance(file, str):
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    else:
+        file.seek(0)
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+        file.seek(0)
+    return digest.hexdigest()
+
+
+def profile_csv(file, encoding="utf-8", separator=",", chunksize=100_000, sample_size=10, preview_rows=5):
+    """ Profiles a CSV in one streaming pass: per column dtype, null ratio, approximate distinct count
+    and a reservoir sample of values, plus a preview of the first rows. """
+    if not isinstance(file, str):
+        file.seek(0)
+    rows = 0
+    preview = None
+    columns = {}
+    for chunk in pd.read_csv(file, encoding=encoding, sep=separator, chunksize=chunksize):
+        if preview is None:
+            preview = chunk.head(preview_rows)
+        rows += len(chunk)
+        for column in chunk.columns:
+            stats = columns.setdefault(column, {
+                "dtype": None, "nulls": 0, "hll": HyperLogLog(), "sample": Reservoir(sample_size)
+            })
+            series = chunk[column]
+            stats["dtype"] = _merge_dtype(stats["dtype"], str(series.dtype) if series.notna().any() else stats["dtype"])
+            stats["nulls"] += int(series.isna().sum())
+            non_null = series.dropna()
+            stats["hll"].update(non_null)
+            stats["sample"].update(non_null)
+
+    return {
+        "rows": rows,
+        "preview": json.loads(preview.to_json(orient="records")) if preview is not None else [],
+        "columns": {
+            column: {
+                "dtype": stats["dtype"] or "object",
+                "null_ratio": stats["nulls"] / rows if rows else 0.0,
+                "approx_distinct": stats["hll"].count(),
+                "sample": [str(v) if not isinstance(v, (int, float, bool)) else v for v in stats["sample"].values]
+            }
+            for column, stats in columns.items()
+        }
+    }
+
+
+def cached_profile(file, encoding="utf-8", separator=",", memo=None, **options):
+    """ profile_csv cached on disk by file hash, encoding and separator (memo: see upload_hash). """
+    key = hashlib.sha1(f"{upload_hash(file, memo)}|{encoding}|{separator}".encode("utf-8")).hexdigest()
+    path = os.path.join(PROFILE_DIR, f"{key}.json")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    profile = profile_csv(file, encoding, separator, **options)
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(profile, f)
+    return profile
+
+
+def profile_samples(profile):
+    """ Distinct sample values per column, as used in the column mapping prompt. """
+    return {column: list(dict.fromkeys(stats["sample"])) for column, stats in profile["columns"].items()}
+
+
+def profile_table(profile):
+    return pd.DataFrame([
+        {"column": column, "dtype": stats["dtype"], "null_ratio": round(stats["null_ratio"], 3),
+         "approx_distinct": stats["approx_distinct"]}
+        for column, stats in profile["columns"].items()
+    ])
@@ -1,6 +1,9 @@
 from st_link_analysis import st_link_analysis, NodeStyle, EdgeStyle
+from core.graph_layout import LayoutService, preset_layout
 
-def render_graph(nodes, edges, title="Graph Visualization", layout="cose"):
+_layout_service = LayoutService()
+
+def render_graph(nodes, edges, title="Graph Visualization", layout="preset"):
     import streamlit as st
 
     # Construire les éléments pour st-link-analysis
@@ -51,5 +54,8 @@ def render_graph(nodes, edges, title="Graph Visualization", layout="cose"):
         EdgeStyle("HAS_ATTRIBUTE", caption="label", directed=True),
     ]
 
+    if layout == "preset":
+        elements, layout = preset_layout(elements, _layout_service)
+
     st.markdown(f"### ✅ {title}")
     st_link_analysis(elements, layout=layout, node_style=node_styles, edge_style=edge_styles)
@@ -0,0 +1,167 @@
+import re
+import numpy as np
+import pandas as pd
+
+COUNTRY = "FR"
+
+# INSEE region code -> département codes (regions since 2016)
+REGIONS = {
+    "01": ["971"], "02": ["972"], "03": ["973"], "04": ["974"], "06": ["976"],
+    "11": ["75", "77", "78", "91", "92", "93", "94", "95"],
+    "24": ["18", "28", "36", "37", "41", "45"],
+    "27": ["21", "25", "39", "58", "70", "71", "89", "90"],
+    "28": ["14", "27", "50", "61", "76"],
+    "32": ["02", "59", "60", "62", "80"],
+    "44": ["08", "10", "51", "52", "54", "55", "57", "67", "68", "88"],
+    "52": ["44", "49", "53", "72", "85"],
+    "53": ["22", "29", "35", "56"],
+    "75": ["16", "17", "19", "23", "24", "33", "40", "47", "64", "79", "86", "87"],
+    "76": ["09", "11", "12", "30", "31", "32", "34", "46", "48", "65", "66", "81", "82"],
+    "84": ["01", "03", "07", "15", "26", "38", "42", "43", "63", "69", "73", "74"],
+    "93": ["04", "05", "06", "13", "83", "84"],
+    "94": ["2A", "2B"]
+}
+DEPARTEMENT_REGION = {dep: region for region, deps in REGIONS.items() for dep in deps}
+
+LEVELS = ["COUNTRY", "REGION", "DEPARTEMENT", "COMMUNE", "IRIS"]
+
+# Containment scores used for space matching: same unit, dataset area containing the query, dataset inside it
+SIM_EQUAL, SIM_CONTAINS, SIM_WITHIN = 1.0, 0.75, 0.5
+
+_CODE = re.compile(r"^\s*(R?\d{2}|2[AB]\d{0,7}|\d{3,9}|FR)\b", re.IGNORECASE)
+
+
+def normalize_code(text):
+    """ Extracts the INSEE code of a space description such as "92 - Hauts-de-Seine" or "R11"; regions are "R11". """
+    match = _CODE.match(str(text or ""))
+    return match.group(1).upper() if match else str(text or "").strip()
+
+
+def level_of(code):
+    if code == COUNTRY:
+        return "COUNTRY"
+    if code.startswith("R"):
+        return "REGION"
+    if len(code) == 9:
+        return "IRIS"
+    if len(code) == 5:
+        return "COMMUNE"
+    if len(code) in (2, 3):
+        return "DEPARTEMENT"
+    return None
+
+
+def parent_of(code):
+    """ Parent code: IRIS (9) -> commune (5) -> département (2, or 3 overseas) -> region ("R11") -> "FR". """
+    level = level_of(code)
+    if level == "IRIS":
+        return code[:5]
+    if level == "COMMUNE":
+        return code[:3] if code.startswith("97") else code[:2]
+    if level == "DEPARTEMENT":
+        region = DEPARTEMENT_REGION.get(code)
+        return f"R{region}" if region else COUNTRY
+    if level == "REGION":
+        return COUNTRY
+    return None
+
+
+class SpatialHierarchy:
+    """ Index of INSEE spatial codes with their ancestor chains and descendant sets precomputed,
+    so ancestor / descendant / containment lookups are dictionary hits. """
+
+    def __init__(self, codes=()):
+        self.ancestors = {}
+        self.descendants = {}
+        for code in codes:
+            self.add(code)
+
+    def add(self, code):
+        code = normalize_code(code)
+        if code in self.ancestors:
+            return code
+        chain = []
+        parent = parent_of(code)
+        while parent:
+            chain.append(parent)
+            parent = parent_of(parent)
+        self.ancestors[code] = tuple(chain)
+        self.descendants.setdefault(code, set())
+        for ancestor in chain:
+            self.ancestors.setdefault(ancestor, ())
+            self.descendants.setdefault(ancestor, set()).add(code)
+        # Register the ancestors themselves so that they are known codes too
+        for i, ancestor in enumerate(chain):
+            if not self.ancestors[ancestor]:
+                self.ancestors[ancestor] = tuple(chain[i + 1:])
+            for higher in chain[i + 1:]:
+                self.descendants.setdefault(higher, set()).add(ancestor)
+        return code
+
+    def ancestor_at(self, code, level):
+        code = normalize_code(code)
+        if level_of(code) == level:
+            return code
+        ancestors = self.ancestors.get(code) or self.ancestors.get(self.add(code))
+        return next((a for a in ancestors if level_of(a) == level), None)
+
+    def contains(self, area, code):
+        """ True when code is area itself or lies inside it. """
+        area, code = normalize_code(area), normalize_code(code)
+        if code not in self.ancestors:
+            self.add(code)
+        return area == code or area in self.ancestors[code]
+
+    def within(self, area, level=None):
+        """ Known codes inside area, optionally only those of one level. """
+        codes = self.descendants.get(normalize_code(area), set())
+        return {c for c in codes if level is None or level_of(c) == level}
+
+    def similarity(self, dataset_code, query_code):
+        """ Containment score of a dataset space against a query space. """
+        dataset_code, query_code = normalize_code(dataset_code), normalize_code(query_code)
+        if not dataset_code or not query_code:
+            return 0.0
+        if dataset_code == query_code:
+            return SIM_EQUAL
+        if self.contains(dataset_code, query_code):
+            return SIM_CONTAINS
+        if self.contains(query_code, dataset_code):
+            return SIM_WITHIN
+        return 0.0
+
+    def code_column(self, codes, level):
+        """ Vectorized roll-up of a column of codes to the given level (one lookup per distinct code). """
+        codes = pd.Categorical(pd.Series(codes).astype(str))
+        parents = np.array([self.ancestor_at(c, level) for c in codes.categories], dtype=object)
+        return parents[codes.codes]
+
+    def rollup(self, df, code_column, value_columns, by=(), levels=("IRIS", "COMMUNE", "DEPARTEMENT")):
+        """ Sums of value_columns per unit for each level, computed once: level -> frame with a CODE column. """
+        tables = {}
+        for level in levels:
+            codes = self.code_column(df[code_column], level)
+            frame = df[list(by) + list(value_columns)].copy()
+            frame["CODE"] = codes
+            tables[level] = frame.groupby(["CODE"] + list(by), observed=True, as_index=False)[list(value_columns)].sum()
+        return tables
+
+
+def unit_table(units_gdf, crs="EPSG:4326"):
+    """ Deduplicated lookup of spatial units indexed by id: name, level, commune, département and bbox (in crs),
+    built with column operations only. """
+    units_gdf = units_gdf.drop_duplicates("id")
+    ids = units_gdf["id"].astype(str)
+    codes = pd.Categorical(ids)
+    levels = np.array([level_of(normalize_code(c)) for c in codes.categories], dtype=object)[codes.codes]
+    hierarchy = SpatialHierarchy(codes.categories)
+    table = pd.DataFrame({
+        "name": units_gdf["name"].to_numpy() if "name" in units_gdf.columns else ids.to_numpy(),
+        "level": levels,
+        "CODE_COMMUNE": hierarchy.code_column(ids, "COMMUNE"),
+        "CODE_DEPARTEMENT": hierarchy.code_column(ids, "DEPARTEMENT")
+    }, index=pd.Index(ids.to_numpy(), name="id"))
+    bounds = units_gdf.to_crs(crs).bounds.to_numpy()
+    table[["minx", "miny", "maxx", "maxy"]] = bounds
+    table["label"] = table["name"].astype(str) + " (" + table.index + ")"
+    return table
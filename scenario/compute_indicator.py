@@ -1,78 +1,164 @@
 import streamlit as st
 import pandas as pd
-import geopandas as gpd
 import matplotlib.pyplot as plt
-import numpy as np
 import folium
 from streamlit_folium import st_folium
+from core.data_cache import DATASETS, dataset_version, load_dataset, memory_report
+from core.distance_engine import StopDistanceEngine
+from core.graph_utils import get_graph_session
+from core.indicators.cube import load_or_build_cube
+from core.indicators.sdg_11_2_1 import ATTRIBUTES, Indicator11_2_1, inputs_from_attributes
+from core.lineage import load_attributes, resolve_lineage, source_datasets, source_names
+from core.map_rendering import base_map, cached_geojson, map_view, stop_layer
+from core.spatial_hierarchy import unit_table
+
+INDICATOR = "11.2.1"
+BUNDLED = {"Population": ("population", "population_geo"), "PublicTransport": ("transport", "transport_geo")}
+
+def select_sources(config):
+    # Databases registered in the SDGraph for the concepts of the indicator; the bundled files otherwise
+    try:
+        with get_graph_session(config) as session:
+            lineage = resolve_lineage(session, INDICATOR)
+    except Exception as e:
+        st.warning(f"The data sources could not be resolved from the graph: {e}")
+        return None
+    candidates = {
+        concept: [source for source in lineage.get(concept, []) if source["csv_path"] and source["geojson_path"]]
+        for concept in ATTRIBUTES
+    }
+    if not all(candidates.values()):
+        return None
+    sources = {}
+    for concept, concept_sources in candidates.items():
+        names = [source["database"] for source in concept_sources]
+        selected = st.selectbox(f"{concept} data source", names) if len(names) > 1 else names[0]
+        sources[concept] = concept_sources[names.index(selected)]
+    return sources
+
+def dataset_names(sources):
+    if sources is None:
+        return BUNDLED["Population"] + BUNDLED["PublicTransport"]
+    return source_names(sources["Population"]) + source_names(sources["PublicTransport"])
+
+def dataset_registry(sources):
+    # The bundled datasets, plus the files of the selected sources
+    if sources is None:
+        return DATASETS
+    return {**source_datasets(sources["Population"]), **source_datasets(sources["PublicTransport"])}
+
+@st.cache_data
+def load_data(sources=None):
+    if sources is not None:
+        # Only the columns mapped to the attributes the indicator needs are read
+        _, population_geo, _, transport_geo = dataset_names(sources)
+        return inputs_from_attributes(
+            load_attributes(sources["Population"], ATTRIBUTES["Population"]),
+            load_attributes(sources["PublicTransport"], ATTRIBUTES["PublicTransport"]),
+            load_dataset(population_geo, datasets=dataset_registry(sources)),
+            load_dataset(transport_geo, datasets=dataset_registry(sources))
+        )
+    population_df = load_dataset("population")
+    population_gdf = load_dataset("population_geo")
+    transport_df = load_dataset("transport")
+    transport_gdf = load_dataset("transport_geo")
+    return population_df, population_gdf, transport_df, transport_gdf
+
+@st.cache_resource
+def get_distance_engine(sources=None):
+    _, _, transport_df, transport_gdf = load_data(sources)
+    return StopDistanceEngine(transport_gdf, transport_df)
+
+@st.cache_resource
+def get_indicator(sources=None, per_year=True):
+    population_df, population_gdf, _, _ = load_data(sources)
+    return Indicator11_2_1(population_df, population_gdf, get_distance_engine(sources), per_year=per_year)
+
+@st.cache_resource
+def get_cube(sources=None, per_year=True):
+    # Built once per version of the input files, column mapping and distance mode, then loaded from disk
+    mapping = None if sources is None else {concept: source["columns"] for concept, source in sources.items()}
+    version = dataset_version(*dataset_names(sources), datasets=dataset_registry(sources))
+    return load_or_build_cube(get_indicator(sources, per_year), version, mapping)
 
 @st.cache_data
-def load_data():
-    population_df = pd.read_csv("data/Population (2017-2021, INSEE).csv", dtype={'CODE_IRIS': str, 'CODE_COMMUNE': str})
-    population_gdf = gpd.read_file("data/Population (2017-2021, INSEE).geojson")
-    transport_df = pd.read_csv("data/PublicTransportStop (2014-2024, OpenStreetMap).csv", dtype={'osm_id': str})
-    transport_gdf = gpd.read_file("data/PublicTransportStop (2014-2024, OpenStreetMap).geojson")
-    distances_df = pd.read_csv("data/distances_2017_2021.csv", dtype={'population_id': str, 'transport_id': str})
-    return population_df, population_gdf, transport_df, transport_gdf, distances_df
-
-def run():
+def get_unit_table(version, sources=None):
+    # id -> name, commune, département and bbox of every unit, rebuilt when the geometry file changes
+    _, population_gdf, _, _ = load_data(sources)
+    return unit_table(population_gdf)
+
+def run(config=None):
     st.title("Compute an Indicator")
     st.subheader("Indicator 11.2.1")
 
-    population_df, population_gdf, transport_df, transport_gdf, distances_df = load_data()
+    sources = select_sources(config) if config else None
+    if sources is None:
+        st.caption("Data: bundled INSEE population and OpenStreetMap stop files")
+    else:
+        st.caption(f'Data: {sources["Population"]["database"]} and {sources["PublicTransport"]["database"]} (from the SDGraph)')
+    per_year = not st.checkbox(
+        "Nearest stop over all the years",
+        help="Measure every year against the stops of all the years, as in data/distances_2017_2021.csv, "
+             "instead of the stops present that year."
+    )
+    try:
+        population_df, population_gdf, transport_df, transport_gdf = load_data(sources)
+        indicator = get_indicator(sources, per_year)
+        cube = get_cube(sources, per_year)
+    except (ValueError, KeyError, OSError) as e:
+        st.warning(f"The registered data sources could not be used ({e}); using the bundled files.")
+        sources = None
+        population_df, population_gdf, transport_df, transport_gdf = load_data(sources)
+        indicator = get_indicator(sources, per_year)
+        cube = get_cube(sources, per_year)
+
+    with st.expander("Memory footprint of the loaded datasets"):
+        st.dataframe(memory_report({
+            "population": population_df,
+            "population_geo": population_gdf,
+            "transport": transport_df,
+            "transport_geo": transport_gdf
+        }))
 
     st.header("1. Configure Filters")
     spatial_level = st.radio("Select Spatial Level", ["COMMUNE", "IRIS"])
-    years = sorted(population_df['ANNEE_DONNEES'].unique())
+    years = indicator.years
     selected_years = st.multiselect("Select Years", years, default=years)
 
-    transport_classes = sorted(transport_df['fclass'].unique())
+    transport_classes = indicator.fclasses
     selected_transport_classes = st.multiselect("Select Transport Classes", transport_classes, default=transport_classes)
 
-    modes_of_transport = sorted(population_df['MODE_TRANS'].unique())
+    modes_of_transport = indicator.modes
     selected_modes_of_transport = st.multiselect("Select Modes of Transport", modes_of_transport, default=modes_of_transport)
 
-    population_df = population_df[
-        population_df['ANNEE_DONNEES'].isin(selected_years) &
-        population_df['MODE_TRANS'].isin(selected_modes_of_transport)
-    ]
-    transport_df = transport_df[
-        transport_df['fclass'].isin(selected_transport_classes) &
-        transport_df['year'].isin(selected_years)
-    ]
-
-    if spatial_level == "COMMUNE":
-        population_df = population_df.drop("CODE_IRIS", axis=1).groupby(["CODE_COMMUNE", "ANNEE_DONNEES", "MODE_TRANS"]).sum("VALEUR").reset_index()
-        merge_key = "CODE_COMMUNE"
-    else:
-        population_df = population_df.drop("CODE_COMMUNE", axis=1)
-        merge_key = "CODE_IRIS"
-
-    population_gdf = population_gdf.merge(population_df, left_on='id', right_on=merge_key)
-    transport_gdf = transport_gdf.merge(transport_df, left_on='id', right_on='osm_id')
-
-    min_distances = distances_df.groupby('population_id')['distance'].min().reset_index()
-    min_distances = min_distances.merge(distances_df, on=['population_id', 'distance'])
-    min_distances = min_distances[min_distances['transport_id'].isin(transport_gdf['id'])]
-    min_distances = min_distances[min_distances['population_id'].isin(population_gdf['id'])]
-
-    transport_gdf = transport_gdf[transport_gdf['id'].isin(min_distances['transport_id'])]
-    population_gdf = population_gdf.merge(min_distances, left_on='id', right_on='population_id').to_crs("EPSG:4326")
+    filters = {
+        "years": selected_years,
+        "modes": selected_modes_of_transport,
+        "fclasses": selected_transport_classes,
+        "level": spatial_level
+    }
+    rows = indicator.rows(**filters)
+    # Version of the unit geometry file, shared by the unit table and the map layer caches
+    units_version = dataset_version(dataset_names(sources)[1], datasets=dataset_registry(sources))
+    units = get_unit_table(units_version, sources)
+    level_units = units[(units["level"] == spatial_level) & units.index.isin(rows["unit_id"].unique())].sort_values("label")
 
     st.header("2. Select Cities and Threshold")
-    city_options = np.unique([f'{x["name"]} ({x["id"]})' for _, x in population_gdf.iterrows()])
-    selected_cities = st.multiselect("Select Cities", city_options)
+    city_labels = {
+        **{code: f"Département {code} ({code})" for code in sorted(indicator.population_by_level["DEPARTEMENT"]["CODE"].unique())},
+        **level_units["label"].to_dict()
+    }
+    selected_city_ids = st.multiselect("Select Cities", list(city_labels), format_func=city_labels.get)
     threshold = st.slider("Select Distance Threshold (meters)", 1, 1000, 100)
 
-    selected_city_ids = [x.split('(')[-1].strip(')') for x in selected_cities]
-    filtered_population_gdf = population_gdf[population_gdf['id'].isin(selected_city_ids)]
-
     st.header("3. Indicator Result")
-    if not filtered_population_gdf.empty:
-        filtered_population_gdf['under_threshold'] = filtered_population_gdf['distance'] <= threshold
-        proportion_under_threshold = filtered_population_gdf.groupby('ANNEE_DONNEES')['under_threshold'].mean()
+    proportion_under_threshold = cube.query(threshold, units=selected_city_ids, **filters) if selected_city_ids else pd.Series(dtype=float)
+    if not proportion_under_threshold.empty:
+        weighted_under_threshold = cube.query(threshold, units=selected_city_ids, weighted=True, **filters)
 
-        st.metric("Mean Indicator Value", round(proportion_under_threshold.mean(), 3))
+        col_metric, col_weighted = st.columns(2)
+        col_metric.metric("Mean Indicator Value", round(proportion_under_threshold.mean(), 3))
+        col_weighted.metric("Population-weighted Indicator Value", round(weighted_under_threshold.mean(), 3))
 
         fig, ax = plt.subplots(figsize=(10, 6))
         ax.plot(proportion_under_threshold.index, proportion_under_threshold.values, marker='o', linestyle='-', color='steelblue')
@@ -90,22 +176,69 @@ def run():
                     ha='center', fontsize=10, arrowprops=dict(arrowstyle="->", color='black'))
 
         st.pyplot(fig)
+
+        with st.expander("Stops around the selected units"):
+            # Stops of the selected classes in the latest selected year (all the years without per_year)
+            stop_years = [max(selected_years)] if per_year else indicator.years
+            around_gdf = population_gdf[
+                population_gdf["id"].isin(indicator.rows(units=selected_city_ids, **filters)["unit_id"].unique())
+            ].drop_duplicates("id")
+            engine = get_distance_engine(sources)
+            nearest = engine.k_nearest(around_gdf, 3, stop_years, selected_transport_classes)
+            around = nearest.pivot(index="population_id", columns="rank", values="distance").round(0).add_prefix("Stop #")
+            around.insert(0, f"Stops within {threshold} m", engine.count_within(
+                around_gdf, threshold, stop_years, selected_transport_classes
+            ))
+            st.caption("Stop #k: distance in meters from the unit centroid to its k-th nearest stop.")
+            st.dataframe(around.rename_axis(index="Unit", columns=None))
+
+        if st.checkbox("Sweep every threshold from 1 to 1000 m"):
+            # One pass per mode over the sorted thresholds instead of one rerun per slider value
+            thresholds = list(range(1, 1001))
+            shares = indicator.sweep(thresholds, units=selected_city_ids, **filters)
+            weighted_shares = indicator.sweep(thresholds, units=selected_city_ids, weighted=True, **filters)
+            unit_shares = indicator.sweep(thresholds, units=selected_city_ids, weighted=True, by_unit=True, **filters)
+
+            fig, (ax_share, ax_weighted) = plt.subplots(1, 2, figsize=(12, 5), sharey=True)
+            for ax, sweep, title in [(ax_share, shares, "Share of Units"), (ax_weighted, weighted_shares, "Population-weighted Share")]:
+                for year, curve in sweep.iterrows():
+                    ax.plot(sweep.columns, curve.values, label=str(year))
+                ax.axvline(x=threshold, color='red', linestyle='--', linewidth=1)
+                ax.set_title(title, fontsize=12)
+                ax.set_xlabel("Distance Threshold (meters)")
+            ax_share.set_ylabel("Proportion")
+            ax_weighted.legend(title="Year")
+            st.pyplot(fig)
+
+            st.markdown("**Population-weighted share, year x threshold**")
+            st.dataframe(weighted_shares)
+            st.download_button(
+                "Download the per-unit sweep (CSV)",
+                unit_shares.to_csv().encode("utf-8"),
+                file_name="sdg_11_2_1_sweep.csv",
+                mime="text/csv"
+            )
     else:
         st.info("Please select at least one city to compute the indicator.")
 
     st.header("4. Population & Distance Maps")
+    # One simplified, cached geometry layer of the units (latest selected year) shared by both maps
+    latest = rows[rows["ANNEE_DONNEES"] == rows["ANNEE_DONNEES"].max()]
+    map_data = latest.groupby("unit_id", as_index=False).agg(VALEUR=("VALEUR", "sum"), distance=("distance", "min")).rename(
+        columns={"unit_id": "id"}
+    )
+    units_gdf = population_gdf.loc[population_gdf["id"].isin(level_units.index), ["id", "geometry"]].drop_duplicates("id")
+    view = map_view(units_gdf)
+    units_geojson = cached_geojson(units_version, filters, units_gdf, view["zoom"], properties=["id"])
+    show_stops = st.checkbox("Show public transport stops of the selected years and classes")
     col1, col2 = st.columns(2)
 
     with col1:
         st.markdown("**Population Distribution**")
-        m1 = folium.Map(
-            location=[population_gdf.geometry.centroid.y.mean(), population_gdf.geometry.centroid.x.mean()],
-            zoom_start=11,
-            tiles="CartoDB positron"
-        )
+        m1 = base_map(view)
         folium.Choropleth(
-            geo_data=population_gdf,
-            data=population_gdf,
+            geo_data=units_geojson,
+            data=map_data,
             columns=["id", "VALEUR"],
             key_on="feature.properties.id",
             fill_color="YlGnBu",
@@ -117,14 +250,10 @@ def run():
 
     with col2:
         st.markdown("**Distance to Nearest Public Transport Stop**")
-        m2 = folium.Map(
-            location=[population_gdf.geometry.centroid.y.mean(), population_gdf.geometry.centroid.x.mean()],
-            zoom_start=11,
-            tiles="CartoDB positron"
-        )
+        m2 = base_map(view)
         folium.Choropleth(
-            geo_data=population_gdf,
-            data=population_gdf,
+            geo_data=units_geojson,
+            data=map_data,
             columns=["id", "distance"],
             key_on="feature.properties.id",
             fill_color="OrRd",
@@ -132,4 +261,9 @@ def run():
             line_opacity=0.2,
             legend_name="Distance (m)"
         ).add_to(m2)
+        if show_stops:
+            stop_ids = transport_df.loc[
+                transport_df["year"].isin(selected_years) & transport_df["fclass"].isin(selected_transport_classes), "osm_id"
+            ].astype(str)
+            stop_layer(transport_gdf[transport_gdf["id"].astype(str).isin(stop_ids)], name="Stops", color="#555555").add_to(m2)
         st_folium(m2, width=450, height=500)
@@ -0,0 +1,66 @@
+import json
+import streamlit as st
+from st_link_analysis import st_link_analysis, NodeStyle, EdgeStyle
+from config.config_handler import show_configuration
+from core.graph_layout import LayoutService, preset_layout
+
+SDG_ELEMENTS_FILE = "sdg_initt_reformatted.json"
+
+@st.cache_resource
+def load_sdg_elements(path=SDG_ELEMENTS_FILE):
+    # Static file: parsed once per process and shared by every session (never mutated)
+    with open(path, "r", encoding="utf-8") as f:
+        elements = json.load(f)
+    types = sorted(set(n["data"]["label"] for n in elements["nodes"]))
+    # Laid out once on the whole graph, so that filtered views keep the same positions
+    layout_service = LayoutService()
+    layout_service.positions_for(elements)
+    return elements, types, layout_service
+
+def run(config):
+    elements, all_types, layout_service = load_sdg_elements()
+
+    # 🎛️ Extraire types de nœuds
+    selected_types = st.multiselect("Filter node types", all_types, default=all_types[:3])
+
+    # 🔍 Filtrage dynamique
+    filtered_nodes = [n for n in elements["nodes"] if n["data"]["label"] in selected_types]
+    visible_ids = {n["data"]["id"] for n in filtered_nodes}
+    filtered_edges = [
+        e for e in elements["edges"]
+        if e["data"]["source"] in visible_ids and e["data"]["target"] in visible_ids
+    ]
+
+    filtered_elements = {"nodes": filtered_nodes, "edges": filtered_edges}
+
+    # 🎨 Styles des nœuds
+    node_styles = [
+        NodeStyle(label='Goal', color='#f16667', caption='name', icon="wallet"),
+        NodeStyle(label='Target', color='#f79767', caption='name', icon="flag"),
+        NodeStyle(label='Indicator', color='#ffc454', caption='name', icon="monitor"),
+        NodeStyle(label='Concept', color='#8dcc93', caption='id'),
+        NodeStyle(label='Attribute', color='#4c8eda', caption='id'),
+        NodeStyle(label='Column', color='#a5abb6', caption='id'),
+        NodeStyle(label='Database', color='#c990c0', caption='id'),
+    ]
+
+    # 🎨 Styles des arêtes
+    edge_styles = [
+        EdgeStyle("HAS_TARGET", caption="label", directed=True),
+        EdgeStyle("HAS_INDICATOR", caption="label", directed=True),
+        EdgeStyle("HAS_CONCEPT", caption="label", directed=True),
+        EdgeStyle("HAS_INSTANCE", caption="label", directed=True),
+        EdgeStyle("HAS_COLUMN", caption="label", directed=True),
+        EdgeStyle("IS_MAPPED_TO", caption="label", directed=True),
+        EdgeStyle("HAS_ATTRIBUTE", caption="label", directed=True)
+    ]
+
+    # ⚙️ Positions précalculées côté serveur
+    filtered_elements, layout = preset_layout(filtered_elements, layout_service)
+
+    # 🚀 Affichage
+    st.markdown("### 📊 SDGraph Preview")
+    st_link_analysis(filtered_elements, layout, node_styles, edge_styles, height=800)
+
+    # 🔧 Configuration de base
+    show_configuration(config)
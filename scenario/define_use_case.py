@@ -1,18 +1,20 @@
 import streamlit as st
-import pandas as pd
-
-def sim_space(ds, qs):
-    return 1.0 if ds == qs else 0.5 if qs in ds else 0.0
-
-def sim_time(dt, qt):
-    return 1.0 if qt.split("-")[0] in dt else 0.5 if qt[:4] in dt else 0.0
-
-def sim_context(dc, qc):
-    return 1.0 if qc.lower() in dc.lower() else 0.5 if any(qc.lower() in d.lower() for d in dc.split(',')) else 0.0
-
-weights = {"s": 0.25, "t": 0.25, "c": 0.2, "r": 0.15, "p": 0.15}
-
-def run():
+from core.catalog import DatasetCatalog, WEIGHTS
+from core.graph_utils import get_graph_session
+
+DEMO_DATASETS = {
+    "INSEE": {"D_s": "92", "D_t": "2017-2022", "D_c": "Women, Age", "D_r": 0.90, "D_p": 0.95},
+    "WorldPop": {"D_s": "FR", "D_t": "2015-2021", "D_c": "Age, Women", "D_r": 0.80, "D_p": 0.85},
+    "Open Data Paris": {"D_s": "75", "D_t": "2018-2023", "D_c": "Sex, Transport, Disability", "D_r": 0.83, "D_p": 0.86}
+}
+
+@st.cache_resource
+def get_catalog():
+    catalog = DatasetCatalog()
+    catalog.add_many(DEMO_DATASETS)
+    return catalog
+
+def run(config):
     st.title("Define a Use Case")
 
     # Étape 1 : choix du scénario
@@ -45,29 +47,21 @@ def run():
         if step2_confirm:
             st.header("Relevant Data Sources")
 
-            datasets = {
-                "INSEE": {"D_s": "92", "D_t": "2017-2022", "D_c": "Women, Age", "D_r": 0.90, "D_p": 0.95},
-                "WorldPop": {"D_s": "FR", "D_t": "2015-2021", "D_c": "Age, Women", "D_r": 0.80, "D_p": 0.85},
-                "Open Data Paris": {"D_s": "75", "D_t": "2018-2023", "D_c": "Sex, Transport, Disability", "D_r": 0.83, "D_p": 0.86}
-            }
+            catalog = get_catalog()
+            try:
+                with get_graph_session(config) as session:
+                    catalog.refresh(session)
+            except Exception as e:
+                st.warning(f"Registered databases could not be loaded from the graph: {e}")
 
             Q = {"q_s": "92", "q_t": "2017-2024", "q_c": "Women"}
 
-            st.subheader("Top scores (overview)")
-            score_preview = []
-            for name, data in datasets.items():
-                sim_s = sim_space(data["D_s"], Q["q_s"])
-                sim_t = sim_time(data["D_t"], Q["q_t"])
-                sim_c = sim_context(data["D_c"], Q["q_c"])
-                r = data["D_r"]
-                p = data["D_p"]
-
-                tsm = round((weights["s"] * sim_s + weights["t"] * sim_t + weights["c"] * sim_c +
-                             weights["r"] * r + weights["p"] * p) / sum(weights.values()), 3)
+            # Scores de toutes les sources en une seule passe, réutilisés pour l'aperçu et les détails
+            details = catalog.top_k(Q, k=10, weights=WEIGHTS)
 
-                score_preview.append((name, tsm))
-
-            score_preview = sorted(score_preview, key=lambda x: x[1], reverse=True)
+            st.subheader("Top scores (overview)")
+            st.caption(f"{len(catalog.overlapping(Q['q_t']))} of {len(catalog)} sources overlap the period {Q['q_t']}")
+            score_preview = list(zip(details["Source"], details["Final TSM Score"]))
             for name, score in score_preview:
                 st.markdown(f"**{name}** — TSM Score: `{score}`")
 
@@ -75,27 +69,7 @@ def run():
 
             if step3_confirm:
                 st.header("TSM Calculation Details")
-                details = []
-                for name, data in datasets.items():
-                    sim_s = sim_space(data["D_s"], Q["q_s"])
-                    sim_t = sim_time(data["D_t"], Q["q_t"])
-                    sim_c = sim_context(data["D_c"], Q["q_c"])
-                    r = data["D_r"]
-                    p = data["D_p"]
-                    tsm = round((weights["s"] * sim_s + weights["t"] * sim_t + weights["c"] * sim_c +
-                                 weights["r"] * r + weights["p"] * p) / sum(weights.values()), 3)
-
-                    details.append({
-                        "Source": name,
-                        "Spatial Sim": sim_s,
-                        "Temporal Sim": sim_t,
-                        "Context Sim": sim_c,
-                        "Reliability": r,
-                        "Completeness": p,
-                        "Final TSM Score": tsm
-                    })
-
-                df = pd.DataFrame(details)
+                df = details
                 st.dataframe(df.style.format(precision=2), use_container_width=True)
 
                 st.header("Select the database to use")
@@ -1,102 +1,140 @@
 import streamlit as st
-from core.graph_utils import get_neo4j_session, fetch_nodes, fetch_edges, load_sdg_data
+from core.graph_utils import batch_size_from_config, get_graph_session, clear_graph, fetch_graph, load_sdg_data
+from core.graph_cache import cached_elements
 from core.functions import LABEL_COLORS
+from core.graph_layout import ALGORITHMS, LayoutService, preset_layout
+from core.neighbourhood import NeighbourhoodBuffer, find_nodes
 from st_link_analysis import st_link_analysis, NodeStyle, EdgeStyle
 
+def build_elements(session, selected_types):
+    # Seuls les noeuds des types choisis et les edges entre eux sont chargés
+    filtered_nodes, filtered_edges = fetch_graph(session, selected_types)
+
+    # Convertir en format st-link-analysis
+    elements = {
+        "nodes": [
+            {
+                "data": {
+                    "id": node.id,
+                    "label": node.title.split("[")[0],
+                    "name": node.label
+                }
+            }
+            for node in filtered_nodes.values()
+        ],
+        "edges": [
+            {
+                "data": {
+                    "id": f"e{i}",
+                    "label": edge.label,
+                    "source": edge.source,
+                    "target": edge.target
+                }
+            }
+            for i, edge in enumerate(filtered_edges, 1)
+        ]
+    }
+    return elements
+
+@st.cache_resource
+def get_layout_service(algorithm):
+    # Positions are shared by all sessions of the process and survive reruns
+    return LayoutService(algorithm)
+
+def explore_neighbourhood(session):
+    # The explored part of the graph lives in the session; each expansion only fetches unseen nodes
+    buffer = st.session_state.setdefault("neighbourhood", NeighbourhoodBuffer())
+
+    text = st.text_input("Start from a Goal, Indicator or Database (id or name)", "11.2.1")
+    candidates = find_nodes(session, text) if text else []
+    start = st.selectbox(
+        "Start node", candidates, format_func=lambda node: f'{node["label"]} {node["id"]} - {node["name"]}'
+    )
+    hops = st.slider("Hops", 1, 4, 1)
+    buffer.page_size = st.slider("Neighbours per node and expansion", 5, 100, buffer.page_size)
+
+    col_start, col_expand, col_clear = st.columns(3)
+    if col_start.button("Explore from start node") and start:
+        buffer = st.session_state["neighbourhood"] = NeighbourhoodBuffer(buffer.max_nodes, buffer.page_size)
+        buffer.add_node(start["id"], start["label"], start["name"])
+        buffer.expand(session, [start["id"]], hops)
+    expandable = list(buffer.nodes)
+    selected = col_expand.selectbox(
+        "Node to expand", expandable,
+        format_func=lambda node_id: f'{buffer.nodes[node_id]["label"]} {node_id} ({buffer.remaining(node_id) if buffer.remaining(node_id) is not None else "?"} more)'
+    ) if expandable else None
+    if selected and col_expand.button("Expand"):
+        buffer.expand(session, [selected], hops)
+    if col_clear.button("Clear"):
+        buffer = st.session_state["neighbourhood"] = NeighbourhoodBuffer(buffer.max_nodes, buffer.page_size)
+
+    st.caption(f"{len(buffer.nodes)} nodes, {len(buffer.edges)} edges on screen (max {buffer.max_nodes})")
+    if buffer.truncated:
+        st.warning("The node limit was reached; some neighbours were not loaded.")
+    return buffer.elements()
+
 def run(config):
     st.title("Visualize the SDGraph")
 
     try:
-        session = get_neo4j_session(
-            config["neo4j"]["URI"],
-            config["neo4j"]["Username"],
-            config["neo4j"]["Password"]
-        )
-
-        if st.button("Reinitialize the Graph"):
-            try:
-                session.run("MATCH (n) DETACH DELETE n")
-                st.success("Graph cleared. Reloading SDG data...")
-                load_sdg_data(session)
-            except Exception as e:
-                st.error(f"Error reinitializing graph: {e}")
-
-        all_nodes = fetch_nodes(session)
-        all_edges = fetch_edges(session)
-
-        all_node_types = list(LABEL_COLORS.keys())
-        selected_types = st.multiselect("Filter by node type:", all_node_types, default=["Goal", "Target", "Indicator"])
-
-        # Filtrer les noeuds par type
-        filtered_nodes = {
-            node_id: node for node_id, node in all_nodes.items()
-            if node.to_dict()["title"].split("[")[0] in selected_types
-        }
-
-        visible_ids = set(filtered_nodes.keys())
-
-        # Garder les edges connectés à des noeuds visibles
-        filtered_edges = [
-            edge for edge in all_edges
-            if edge.source in visible_ids and edge.target in visible_ids
-        ]
+        with get_graph_session(config) as session:
 
-        # Convertir en format st-link-analysis
-        elements = {
-            "nodes": [
-                {
-                    "data": {
-                        "id": node.id,
-                        "label": node.title.split("[")[0],
-                        "name": node.label
-                    }
-                }
-                for node in filtered_nodes.values()
-            ],
-            "edges": [
-                {
-                    "data": {
-                        "id": f"e{i}",
-                        "label": edge.label,
-                        "source": edge.source,
-                        "target": edge.target
-                    }
-                }
-                for i, edge in enumerate(filtered_edges, 1)
+            if st.button("Reinitialize the Graph"):
+                try:
+                    clear_graph(session)
+                    st.success("Graph cleared. Reloading SDG data...")
+                    load_sdg_data(session, batch_size=batch_size_from_config(config))
+                    for algorithm in ALGORITHMS:
+                        get_layout_service(algorithm).reset()
+                    st.session_state.pop("neighbourhood", None)
+                except Exception as e:
+                    st.error(f"Error reinitializing graph: {e}")
+
+            view = st.radio("View", ["Node types", "Neighbourhood"], horizontal=True)
+            if view == "Neighbourhood":
+                elements = explore_neighbourhood(session)
+            else:
+                all_node_types = list(LABEL_COLORS.keys())
+                selected_types = st.multiselect("Filter by node type:", all_node_types, default=["Goal", "Target", "Indicator"])
+                elements = cached_elements(
+                    session, selected_types,
+                    lambda: build_elements(session, selected_types),
+                    config.get("cache")
+                )
+
+            algorithm = st.radio("Layout", list(ALGORITHMS), horizontal=True)
+            layout_service = get_layout_service(algorithm)
+            if st.button("Recompute layout"):
+                layout_service.reset()
+
+            # Styles des nœuds
+            node_styles = [
+                NodeStyle(label='Goal', color='#f16667', caption='name', icon="wallet"),
+                NodeStyle(label='Target', color='#f79767', caption='name', icon="flag"),
+                NodeStyle(label='Indicator', color='#ffc454', caption='name', icon="monitor"),
+                NodeStyle(label='Concept', color='#8dcc93', caption='id'),
+                NodeStyle(label='Attribute', color='#4c8eda', caption='id'),
+                NodeStyle(label='Column', color='#a5abb6', caption='id'),
+                NodeStyle(label='Database', color='#c990c0', caption='id'),
             ]
-        }
-
-        # Styles des nœuds
-        node_styles = [
-            NodeStyle(label='Goal', color='#f16667', caption='name', icon="wallet"),
-            NodeStyle(label='Target', color='#f79767', caption='name', icon="flag"),
-            NodeStyle(label='Indicator', color='#ffc454', caption='name', icon="monitor"),
-            NodeStyle(label='Concept', color='#8dcc93', caption='id'),
-            NodeStyle(label='Attribute', color='#4c8eda', caption='id'),
-            NodeStyle(label='Column', color='#a5abb6', caption='id'),
-            NodeStyle(label='Database', color='#c990c0', caption='id'),
-        ]
 
-        # Styles des arêtes
-        edge_styles = [
-            EdgeStyle("HAS_TARGET", caption="label", directed=True),
-            EdgeStyle("HAS_INDICATOR", caption="label", directed=True),
-            EdgeStyle("HAS_CONCEPT", caption="label", directed=True),
-            EdgeStyle("HAS_INSTANCE", caption="label", directed=True),
-            EdgeStyle("HAS_COLUMN", caption="label", directed=True),
-            EdgeStyle("IS_MAPPED_TO", caption="label", directed=True),
-            EdgeStyle("HAS_ATTRIBUTE", caption="label", directed=True),
-        ]
+            # Styles des arêtes
+            edge_styles = [
+                EdgeStyle("HAS_TARGET", caption="label", directed=True),
+                EdgeStyle("HAS_INDICATOR", caption="label", directed=True),
+                EdgeStyle("HAS_CONCEPT", caption="label", directed=True),
+                EdgeStyle("HAS_INSTANCE", caption="label", directed=True),
+                EdgeStyle("HAS_COLUMN", caption="label", directed=True),
+                EdgeStyle("IS_MAPPED_TO", caption="label", directed=True),
+                EdgeStyle("HAS_ATTRIBUTE", caption="label", directed=True),
+            ]
 
-        layout = {
-            "name": "concentric",
-            "animate": "end",
-            "nodeDimensionsIncludeLabels": False
-        }
+            # Positions are computed here, the browser only draws them
+            elements, layout = preset_layout(elements, layout_service)
 
-        # Affichage
-        st.markdown("### 📊 SDGraph from Neo4j")
-        st_link_analysis(elements, layout, node_styles, edge_styles, height=800)
+            # Affichage
+            st.markdown("### 📊 SDGraph from Neo4j")
+            st_link_analysis(elements, layout, node_styles, edge_styles, height=800)
 
     except Exception as e:
         st.error(f"An error occurred: {e}")
@@ -0,0 +1,54 @@
+""" Headless entry point, e.g.
+
+    python -m sdgkg compute 11.2.1 --level IRIS --years 2017-2021 --threshold 500 --output results/sdg_11_2_1.parquet
+"""
+import argparse
+from core.batch import INDICATORS, run_batch
+from core.intervals import parse_interval
+
+
+def _list(text):
+    return [item.strip() for item in text.split(",") if item.strip()] if text else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="sdgkg", description="SDG-KG batch tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compute = commands.add_parser("compute", help="Compute an indicator for every region, without the UI")
+    compute.add_argument("indicator", choices=sorted(INDICATORS))
+    compute.add_argument("--level", choices=["COMMUNE", "IRIS"], default="COMMUNE")
+    compute.add_argument("--years", help='Year or range, e.g. "2017-2021" (default: all)')
+    compute.add_argument("--threshold", type=float, action="append",
+                         help="Distance threshold in meters, repeatable (default: 500)")
+    compute.add_argument("--modes", help="Comma-separated MODE_TRANS values (default: all)")
+    compute.add_argument("--fclasses", help="Comma-separated transport classes (default: all)")
+    compute.add_argument("--method", choices=["geometry", "centroid"], default="geometry")
+    compute.add_argument("--all-years", action="store_true",
+                         help="Nearest stop over the stops of all the years, as data/distances_2017_2021.csv")
+    compute.add_argument("--region-level", choices=["COMMUNE", "DEPARTEMENT", "REGION"], default="COMMUNE",
+                         help="Unit of work sent to each process")
+    compute.add_argument("--workers", type=int, help="Number of processes (default: CPU count)")
+    compute.add_argument("--output", default="sdg_results.parquet", help="Output file (.parquet or .csv)")
+    args = parser.parse_args(argv)
+
+    years = None
+    if args.years:
+        interval = parse_interval(args.years)
+        if interval is None:
+            parser.error(f"Cannot parse --years {args.years!r}")
+        years = list(range(interval[0], interval[1] + 1))
+
+    params = {
+        "level": args.level,
+        "thresholds": sorted(args.threshold or [500.0]),
+        "modes": _list(args.modes),
+        "fclasses": _list(args.fclasses),
+        "method": args.method,
+        "per_year": not args.all_years
+    }
+    run_batch(args.indicator, args.output, params, years=years, region_level=args.region_level, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import geopandas as gpd
+import pandas as pd
+import pytest
+from shapely.geometry import Point, box
+from core import batch
+
+DATASETS = {
+    "population": pd.DataFrame({
+        "CODE_IRIS": ["920040101", "920040102", "750010101"] * 2,
+        "CODE_COMMUNE": ["92004", "92004", "75001"] * 2,
+        "ANNEE_DONNEES": [2017] * 3 + [2018] * 3,
+        "MODE_TRANS": ["all"] * 6,
+        "VALEUR": [10.0, 30.0, 60.0] * 2
+    }),
+    "population_geo": gpd.GeoDataFrame(
+        {"id": ["920040101", "920040102", "92004", "750010101", "75001"]},
+        geometry=[box(0, 0, 100, 100), box(100, 0, 200, 100), box(0, 0, 200, 100), box(0, 1000, 100, 1100),
+                  box(0, 1000, 100, 1100)],
+        crs="EPSG:2154"
+    ),
+    "transport": pd.DataFrame({"osm_id": ["a", "a", "b"], "fclass": ["bus_stop"] * 3, "year": [2017, 2018, 2018]}),
+    "transport_geo": gpd.GeoDataFrame({"id": ["a", "b"]}, geometry=[Point(50, 150), Point(50, 1300)], crs="EPSG:2154")
+}
+PARAMS = {"level": "IRIS", "thresholds": [100.0, 300.0], "modes": None, "fclasses": None, "method": "geometry"}
+
+
+def load_dataset(name, columns=None, years=None):
+    df = DATASETS[name]
+    if years is not None and name in ("population", "transport"):
+        df = df[df["ANNEE_DONNEES" if name == "population" else "year"].isin(years)]
+    return df
+
+
+@pytest.fixture
+def computed(monkeypatch):
+    """ Runs batches on the synthetic datasets, with threads for processes. Returns the regions computed so far,
+    and the regions made to fail. """
+    state = {"regions": [], "failing": set()}
+    compute = batch.INDICATORS["11.2.1"]
+
+    def counting(region, region_level, params):
+        state["regions"].append(region)
+        if region in state["failing"]:
+            raise RuntimeError(f"{region} failed")
+        return compute(region, region_level, params)
+
+    monkeypatch.setattr(batch, "load_dataset", load_dataset)
+    monkeypatch.setattr(batch, "build_cache", lambda name: None)
+    monkeypatch.setattr(batch, "dataset_version", lambda *names: "v1")
+    monkeypatch.setattr(batch, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(batch, "_worker", {})
+    monkeypatch.setitem(batch.INDICATORS, "11.2.1", counting)
+    return state
+
+
+def run(output, params=PARAMS):
+    return batch.run_batch("11.2.1", str(output), params, workers=2, log=lambda message: None)
+
+
+def test_regions_of():
+    assert batch.regions_of(DATASETS["population"], "COMMUNE") == ["75001", "92004"]
+    assert batch.regions_of(DATASETS["population"], "REGION") == ["R11"]
+
+
+def test_run_batch(tmp_path, computed):
+    result = pd.read_parquet(run(tmp_path / "results.parquet"))
+    assert sorted(computed["regions"]) == ["75001", "92004"]
+    assert list(result.columns) == ["region", "unit_id", "ANNEE_DONNEES", "threshold", "share", "weighted_share"]
+    # Regions in order, each with its units x years x thresholds
+    assert result["region"].tolist() == ["75001"] * 4 + ["92004"] * 8
+    shares = result.set_index(["unit_id", "ANNEE_DONNEES", "threshold"])["share"]
+    assert shares[("750010101", 2017, 300.0)] == 0.0
+    assert shares[("750010101", 2018, 300.0)] == 1.0
+    assert shares[("920040102", 2018, 100.0)] == 1.0
+
+
+def test_run_batch_resumes_after_a_failure(tmp_path, computed):
+    output = tmp_path / "results.parquet"
+    computed["failing"].add("92004")
+    with pytest.raises(RuntimeError, match="92004 failed"):
+        run(output)
+    assert not os.path.exists(output)
+
+    computed["failing"].clear()
+    computed["regions"].clear()
+    result = pd.read_parquet(run(output))
+    # Only the failed region is computed again
+    assert computed["regions"] == ["92004"]
+    assert sorted(result["region"].unique()) == ["75001", "92004"]
+
+    computed["regions"].clear()
+    run(output)
+    assert computed["regions"] == []
+    # Other parameters are another run
+    run(output, {**PARAMS, "thresholds": [500.0]})
+    assert sorted(computed["regions"]) == ["75001", "92004"]
+
+
+def test_csv_output_matches_parquet(tmp_path, computed):
+    parquet = pd.read_parquet(run(tmp_path / "results.parquet"))
+    csv = pd.read_csv(run(tmp_path / "results.csv"), dtype={"region": str, "unit_id": str})
+    pd.testing.assert_frame_equal(csv, parquet, check_dtype=False)
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".csv"])
+def test_combine(tmp_path, suffix):
+    parts = {}
+    for region, rows in [("75001", 1), ("92004", 2)]:
+        parts[region] = str(tmp_path / f"{region}.parquet")
+        pd.DataFrame({"region": [region] * rows, "share": [0.5] * rows}).to_parquet(parts[region], index=False)
+    output = str(tmp_path / f"combined{suffix}")
+
+    batch._combine(["92004", "75001"], parts, output)
+    read = pd.read_parquet if suffix == ".parquet" else lambda path: pd.read_csv(path, dtype={"region": str})
+    assert read(output)["region"].tolist() == ["92004", "92004", "75001"]
+    assert not os.path.exists(f"{output}.tmp")
+
+    batch._combine([], {}, output)
+    assert os.path.exists(output)
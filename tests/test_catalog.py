@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from core.catalog import DatasetCatalog
+from core.graph_backend import registration_parameters
+from core.memory_graph import MemoryGraph
+
+DEMO = {
+    "INSEE": {"D_s": "92", "D_t": "2017-2022", "D_c": "Women, Age", "D_r": 0.9, "D_p": 0.95},
+    "Paris": {"D_s": "75", "D_t": "2018-2023", "D_c": "Sex, Transport, Disability", "D_r": 0.8, "D_p": 0.85}
+}
+
+
+def register(graph, name, **metadata):
+    graph.register_database(registration_parameters(
+        name, f"{name}.csv", f"{name}.geojson", "utf-8", ",", "Population", {}, metadata=metadata
+    ))
+
+
+@pytest.fixture
+def catalog():
+    catalog = DatasetCatalog()
+    catalog.add_many(DEMO)
+    return catalog
+
+
+def test_refresh_follows_the_graph(catalog):
+    graph = MemoryGraph()
+    register(graph, "OSM", space="92", time="2014-2024", context="Transport", reliability=0.7)
+    assert catalog.refresh(graph)
+    assert catalog.names == ["INSEE", "Paris", "OSM"]
+    assert not catalog.refresh(graph)
+
+    # Metadata updated and a database removed, with unchanged node and relationship counts
+    graph.clear()
+    register(graph, "OSM", space="75", time="2014-2024", context="Transport", reliability=0.7)
+    assert catalog.refresh(graph)
+    assert catalog.entries[catalog.names.index("OSM")]["D_s"] == "75"
+
+    graph.clear()
+    assert catalog.refresh(graph)
+    assert catalog.names == ["INSEE", "Paris"]
+
+
+def test_added_datasets_take_precedence(catalog):
+    graph = MemoryGraph()
+    register(graph, "INSEE", space="13")
+    catalog.refresh(graph)
+    assert catalog.names == ["INSEE", "Paris"] and catalog.entries[0]["D_s"] == "92"
+
+
+@pytest.mark.parametrize("query", ["women", "Transport", "port", "age", "elderly", ""])
+def test_sim_context(catalog, query):
+    expected = [
+        float(any(query.lower() in token.strip().lower() for token in data["D_c"].split(",")))
+        for data in DEMO.values()
+    ]
+    assert np.array_equal(catalog.sim_context(query), expected)
+
+
+def test_top_k(catalog):
+    details = catalog.top_k({"q_s": "92", "q_t": "2017-2024", "q_c": "Women"}, k=1)
+    assert details["Source"].tolist() == ["INSEE"]
+    assert DatasetCatalog().sim_context("women").size == 0
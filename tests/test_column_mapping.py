@@ -0,0 +1,137 @@
+import json
+import pandas as pd
+import pytest
+from core import column_mapping
+from core.column_mapping import map_columns, map_columns_batch
+
+ATTRIBUTES = ["Space", "Time", "Value"]
+SAMPLES = {
+    "CODE_IRIS": ["920040101", "920040102"],
+    "ANNEE": [2017, 2018],
+    "VALEUR": [10.5, 30.0]
+}
+
+
+class StubCompletion:
+    """ Completion endpoint that answers from a column -> attribute dict and records its prompts. """
+
+    def __init__(self, answers, failures=()):
+        self.answers = answers
+        self.failures = list(failures)
+        self.prompts = []
+
+    def __call__(self, prompt, config, timeout):
+        self.prompts.append(prompt)
+        if self.failures:
+            raise self.failures.pop(0)
+        return json.dumps({column: attribute for column, attribute in self.answers.items() if column in prompt})
+
+    def columns(self, call):
+        """ Columns sent in the given call, read back from the JSON block of the prompt. """
+        prompt = self.prompts[call]
+        return list(json.loads(prompt[prompt.index("{"):prompt.index("}") + 1]))
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "column_mapping.json")
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(column_mapping.time, "sleep", lambda seconds: None)
+
+
+def test_answers_are_cached(cache_path):
+    completion = StubCompletion({"CODE_IRIS": "Space", "ANNEE": "Time", "VALEUR": "Value"})
+    mapping = map_columns(SAMPLES, ATTRIBUTES, completion=completion, cache_path=cache_path)
+    assert {column: m["attribute"] for column, m in mapping.items()} == {
+        "CODE_IRIS": "Space", "ANNEE": "Time", "VALEUR": "Value"
+    }
+    assert {m["source"] for m in mapping.values()} == {"llm"}
+    assert len(completion.prompts) == 1
+
+    # Another run (e.g. another process) reads the answers back from the cache file
+    assert map_columns(SAMPLES, ATTRIBUTES, completion=completion, cache_path=cache_path) == mapping
+    assert len(completion.prompts) == 1
+    # Other samples are another question
+    map_columns({"ANNEE": [2019]}, ATTRIBUTES, completion=completion, cache_path=cache_path)
+    assert len(completion.prompts) == 2
+
+
+def test_misses_are_batched_across_datasets(cache_path):
+    completion = StubCompletion({"CODE_IRIS": "Space", "ANNEE": "Time", "VALEUR": "Value", "osm_id": "Space"})
+    datasets = {
+        "Population": SAMPLES,
+        "Transport": {"osm_id": ["123", "456"], "ANNEE": [2014, 2024]}
+    }
+    mapping = map_columns_batch(datasets, ATTRIBUTES, completion=completion, batch_size=3, max_workers=1,
+                                cache_path=cache_path)
+    assert mapping["Transport"]["osm_id"]["attribute"] == "Space"
+    assert mapping["Transport"]["ANNEE"]["attribute"] == "Time"
+    # Five columns in batches of three, each column name at most once per request
+    batches = [completion.columns(call) for call in range(len(completion.prompts))]
+    assert sorted(len(batch) for batch in batches) == [2, 3]
+    assert all(len(set(batch)) == len(batch) for batch in batches)
+    assert sorted(column for batch in batches for column in batch) == sorted(
+        ["CODE_IRIS", "ANNEE", "VALEUR", "osm_id", "ANNEE"]
+    )
+
+
+def test_transient_errors_are_retried(cache_path):
+    completion = StubCompletion({"CODE_IRIS": "Space", "ANNEE": "Time", "VALEUR": "Value"},
+                                failures=[TimeoutError("slow"), TimeoutError("slow")])
+    mapping = map_columns(SAMPLES, ATTRIBUTES, completion=completion, retries=2, cache_path=cache_path)
+    assert len(completion.prompts) == 3
+    assert {m["source"] for m in mapping.values()} == {"llm"}
+
+
+def test_exhausted_retries_fall_back_to_heuristic(cache_path):
+    completion = StubCompletion({}, failures=[TimeoutError("slow")] * 2)
+    mapping = map_columns(SAMPLES, ATTRIBUTES, completion=completion, retries=1, cache_path=cache_path)
+    assert len(completion.prompts) == 2
+    assert mapping["CODE_IRIS"] == {
+        "attribute": "Space", "source": "heuristic", "error": "TimeoutError: slow (after 2 attempts)"
+    }
+
+
+@pytest.mark.parametrize("completion, error", [
+    (StubCompletion({}, failures=[PermissionError("bad key")]), "PermissionError: bad key"),
+    (lambda prompt, config, timeout: "not json", "Invalid JSON answer"),
+    (lambda prompt, config, timeout: "[]", "Invalid answer: not a JSON object"),
+    (lambda prompt, config, timeout: json.dumps({"ANNEE": "Colour"}), "No valid attribute in the answer")
+])
+def test_endpoint_failures_fall_back_to_heuristic(cache_path, completion, error):
+    mapping = map_columns(SAMPLES, ATTRIBUTES, completion=completion, cache_path=cache_path)
+    assert {column: m["attribute"] for column, m in mapping.items()} == {
+        "CODE_IRIS": "Space", "ANNEE": "Time", "VALEUR": "Value"
+    }
+    assert all(m["source"] == "heuristic" and m["error"].startswith(error) for m in mapping.values())
+    if isinstance(completion, StubCompletion):
+        # Not a transient error: a single attempt
+        assert len(completion.prompts) == 1
+
+
+def test_heuristic_answers_are_not_cached(cache_path):
+    map_columns(SAMPLES, ATTRIBUTES, use_llm=False, cache_path=cache_path)
+    completion = StubCompletion({"CODE_IRIS": "Space", "ANNEE": "Time", "VALEUR": "Value"})
+    mapping = map_columns(SAMPLES, ATTRIBUTES, completion=completion, cache_path=cache_path)
+    assert len(completion.prompts) == 1
+    assert {m["source"] for m in mapping.values()} == {"llm"}
+
+
+def test_mapp_columns_with_openai_contract(tmp_path, monkeypatch):
+    pytest.importorskip("streamlit")
+    from core.functions import Mapp_columns_with_openai
+    # The default cache file is relative to the working directory
+    monkeypatch.chdir(tmp_path)
+
+    df = pd.DataFrame({"CODE_IRIS": ["920040101", None, "920040102"], "ANNEE": [2017, 2018, 2018]})
+    mapping = Mapp_columns_with_openai(df, ATTRIBUTES, config=None)
+    assert mapping == {
+        "CODE_IRIS": {"attribute": "Space", "source": "heuristic", "error": "OpenAI is not configured"},
+        "ANNEE": {"attribute": "Time", "source": "heuristic", "error": "OpenAI is not configured"}
+    }
+    # Profile samples (column -> values) are accepted too, and offline mapping reports no error
+    mapping = Mapp_columns_with_openai(SAMPLES, ATTRIBUTES, config=None, use_llm=False)
+    assert mapping["VALEUR"] == {"attribute": "Value", "source": "heuristic", "error": None}
@@ -0,0 +1,67 @@
+import os
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import Point, box
+from core.distance_engine import StopDistanceEngine
+from core.indicators.cube import AccessibilityCube, load_or_build_cube
+from core.indicators.sdg_11_2_1 import Indicator11_2_1, weighted_accessibility
+
+UNITS = gpd.GeoDataFrame(
+    {"id": ["920040101", "920040102", "92004", "920050101", "92005"]},
+    geometry=[box(0, 0, 100, 100), box(100, 0, 200, 100), box(0, 0, 200, 100), box(0, 300, 100, 400), box(0, 300, 100, 400)],
+    crs="EPSG:2154"
+)
+STOPS = gpd.GeoDataFrame(
+    {"id": ["a", "b", "c"]}, geometry=[Point(50, 150), Point(450, 50), Point(50, 700)], crs="EPSG:2154"
+)
+STOP_YEARS = pd.DataFrame({
+    "osm_id": ["a", "b", "c", "c"], "fclass": ["bus_stop", "tram_stop", "bus_stop", "bus_stop"], "year": [2017, 2017, 2017, 2018]
+})
+POPULATION = pd.DataFrame({
+    "CODE_IRIS": ["920040101", "920040102", "920050101"] * 2,
+    "CODE_COMMUNE": ["92004", "92004", "92005"] * 2,
+    "ANNEE_DONNEES": [2017] * 3 + [2018] * 3,
+    "MODE_TRANS": ["all"] * 6,
+    "VALEUR": [10.0, 30.0, 60.0] * 2
+})
+
+
+@pytest.fixture
+def indicator():
+    return Indicator11_2_1(POPULATION, UNITS, StopDistanceEngine(STOPS, STOP_YEARS))
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"fclasses": ["bus_stop"]},
+    {"fclasses": ["tram_stop"], "level": "IRIS"},
+    {"years": [2018], "units": ["92004"], "level": "IRIS"},
+    {"units": ["92"]}
+])
+@pytest.mark.parametrize("threshold", [1, 50, 300])
+def test_query_matches_indicator(indicator, tmp_path, filters, threshold):
+    path = tmp_path / "cube.npz"
+    AccessibilityCube.build(indicator).save(path)
+    cube = AccessibilityCube.load(path, indicator.hierarchy)
+    pd.testing.assert_series_equal(cube.query(threshold, **filters), indicator.query(threshold, **filters))
+    rows = indicator.rows(**filters)
+    weighted = weighted_accessibility(rows, rows["distance"].to_numpy() <= threshold, by=["ANNEE_DONNEES"])
+    assert np.allclose(cube.query(threshold, weighted=True, **filters).to_numpy(), weighted["ratio"].to_numpy())
+
+
+def test_query_rejects_threshold_beyond_max_distance(indicator):
+    with pytest.raises(ValueError):
+        AccessibilityCube.build(indicator, max_distance=100).query(101)
+
+
+def test_cube_file_depends_on_mapping_and_distance_mode(indicator, tmp_path):
+    load_or_build_cube(indicator, "v1", cube_dir=tmp_path)
+    load_or_build_cube(indicator, "v1", cube_dir=tmp_path)
+    assert len(os.listdir(tmp_path)) == 1
+    load_or_build_cube(indicator, "v1", mapping={"Population": {"CODE_IRIS": "Space"}}, cube_dir=tmp_path)
+    all_years = Indicator11_2_1(POPULATION, UNITS, StopDistanceEngine(STOPS, STOP_YEARS), per_year=False)
+    cube = load_or_build_cube(all_years, "v1", cube_dir=tmp_path)
+    assert len(os.listdir(tmp_path)) == 3
+    pd.testing.assert_series_equal(cube.query(300, level="IRIS"), all_years.query(300, level="IRIS"))
@@ -0,0 +1,105 @@
+import os
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import Point, box
+from core.distance_engine import StopDistanceEngine
+from core.indicators.sdg_11_2_1 import Indicator11_2_1
+
+DISTANCES_CSV = "data/distances_2017_2021.csv"
+UNITS_GEOJSON = "data/Population (2017-2021, INSEE).geojson"
+STOPS_GEOJSON = "data/PublicTransportStop (2014-2024, OpenStreetMap).geojson"
+
+# Two 100 m IRIS side by side (one commune), in Lambert-93 meters
+UNITS = gpd.GeoDataFrame(
+    {"id": ["920040101", "920040102", "92004"]},
+    geometry=[box(0, 0, 100, 100), box(100, 0, 200, 100), box(0, 0, 200, 100)],
+    crs="EPSG:2154"
+)
+STOPS = gpd.GeoDataFrame(
+    {"id": ["a", "b", "c", "d"]},
+    geometry=[Point(50, 150), Point(450, 50), Point(250, 50), Point(50, 50)],
+    crs="EPSG:2154"
+)
+STOP_YEARS = pd.DataFrame({
+    "osm_id": ["a", "a", "b", "c", "d"],
+    "fclass": ["bus_stop", "bus_stop", "tram_stop", "bus_stop", "tram_stop"],
+    "year": [2017, 2018, 2017, 2018, 2018]
+})
+
+
+def all_pairs(units_gdf, stops_gdf, method):
+    """ The nearest stop of every unit the way the distances CSV is read: every unit x stop distance, then the minimum. """
+    geometries = units_gdf.geometry.centroid if method == "centroid" else units_gdf.geometry
+    pairs = pd.DataFrame([
+        {"population_id": unit, "transport_id": stop, "distance": geometry.distance(point)}
+        for unit, geometry in zip(units_gdf["id"], geometries)
+        for stop, point in zip(stops_gdf["id"], stops_gdf.geometry)
+    ])
+    return pairs.groupby("population_id")["distance"].min()
+
+
+@pytest.mark.parametrize("method", ["geometry", "centroid"])
+def test_nearest_matches_all_pairs(method):
+    engine = StopDistanceEngine(STOPS, STOP_YEARS)
+    nearest = engine.nearest(UNITS, method=method).set_index("population_id")["distance"]
+    expected = all_pairs(UNITS, STOPS, method)
+    assert np.allclose(nearest.reindex(expected.index), expected)
+
+
+def test_nearest_per_subset():
+    engine = StopDistanceEngine(STOPS, STOP_YEARS)
+    nearest = engine.nearest(UNITS, years=[2017], fclasses=["tram_stop"]).set_index("population_id")
+    assert set(nearest["transport_id"]) == {"b"}
+    assert nearest.loc["920040102", "distance"] == pytest.approx(250)
+    assert engine.nearest(UNITS, years=[2016]).empty
+
+
+def test_count_within_and_k_nearest():
+    engine = StopDistanceEngine(STOPS, STOP_YEARS)
+    counts = engine.count_within(UNITS, 60, years=[2018])
+    assert counts.to_dict() == {"920040101": 2, "920040102": 2, "92004": 3}
+    nearest = engine.k_nearest(UNITS.iloc[:1], 2)
+    assert nearest["transport_id"].tolist() == ["d", "a"]
+    assert nearest["distance"].tolist() == pytest.approx([0, 100])
+    assert nearest["rank"].tolist() == [1, 2]
+
+
+def test_indicator_distance_modes():
+    population_df = pd.DataFrame({
+        "CODE_IRIS": ["920040101", "920040102"] * 2,
+        "CODE_COMMUNE": ["92004"] * 4,
+        "ANNEE_DONNEES": [2017, 2017, 2018, 2018],
+        "MODE_TRANS": ["all"] * 4,
+        "VALEUR": [10.0, 30.0, 10.0, 30.0]
+    })
+    engine = StopDistanceEngine(STOPS, STOP_YEARS)
+    per_year = Indicator11_2_1(population_df, UNITS, engine).rows(level="IRIS")
+    all_years = Indicator11_2_1(population_df, UNITS, engine, per_year=False).rows(level="IRIS")
+    # Stop d opens in 2018 inside the first IRIS: only the all-years mode counts it in 2017
+    first_2017 = (per_year["unit_id"] == "920040101") & (per_year["ANNEE_DONNEES"] == 2017)
+    assert per_year.loc[first_2017, "distance"].tolist() == pytest.approx([50])
+    first_2017 = (all_years["unit_id"] == "920040101") & (all_years["ANNEE_DONNEES"] == 2017)
+    assert all_years.loc[first_2017, "distance"].tolist() == pytest.approx([0])
+    expected = all_pairs(UNITS, STOPS, "geometry")
+    assert np.allclose(all_years["distance"], expected.reindex(all_years["unit_id"]).to_numpy())
+
+
+@pytest.mark.skipif(
+    not all(os.path.exists(path) for path in (DISTANCES_CSV, UNITS_GEOJSON, STOPS_GEOJSON)),
+    reason="the precomputed distances CSV and the population geometries are not in the tree"
+)
+def test_nearest_matches_distances_csv():
+    pairs = pd.read_csv(DISTANCES_CSV, dtype={"population_id": str, "transport_id": str})
+    sample = pd.Series(pairs["population_id"].unique()).sample(min(50, pairs["population_id"].nunique()), random_state=0)
+    expected = pairs[pairs["population_id"].isin(sample)].groupby("population_id")["distance"].min()
+
+    stops_gdf = gpd.read_file(STOPS_GEOJSON)
+    stops_gdf = stops_gdf[stops_gdf["id"].astype(str).isin(pairs["transport_id"].unique())]
+    stops_df = pd.DataFrame({"osm_id": stops_gdf["id"].astype(str), "fclass": "any", "year": 0})
+    units_gdf = gpd.read_file(UNITS_GEOJSON)
+    units_gdf = units_gdf[units_gdf["id"].astype(str).isin(sample)].drop_duplicates("id")
+
+    nearest = StopDistanceEngine(stops_gdf, stops_df).nearest(units_gdf).set_index("population_id")["distance"]
+    assert np.allclose(nearest.reindex(expected.index), expected, atol=1)
@@ -0,0 +1,78 @@
+import threading
+import pytest
+import core.driver_registry as registry
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def run(self, query, **parameters):
+        return query
+
+    def execute_write(self, work):
+        return work(self)
+
+    def close(self):
+        pass
+
+
+class FakeDriver:
+    def __init__(self, uri, auth, **options):
+        self.closed = False
+
+    def session(self, database=None):
+        return FakeSession(self)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fake_driver(monkeypatch):
+    monkeypatch.setattr(registry.GraphDatabase, "driver", FakeDriver)
+    yield
+    registry._close_all_drivers()
+
+
+def test_pool_metrics():
+    with registry.open_session("bolt://a", "neo4j", "pw") as first, registry.open_session("bolt://a", "neo4j", "pw") as second:
+        first.run("RETURN 1")
+        metrics = registry.get_pool_metrics("bolt://a", "neo4j")
+        assert (metrics["in_use"], metrics["idle"], metrics["open_sessions"]) == (1, 0, 2)
+        second.run("RETURN 1")
+        # The transaction reuses the connection first held since run() and returns it when it ends
+        first.execute_write(lambda tx: tx.run("RETURN 2"))
+        metrics = registry.get_pool_metrics("bolt://a", "neo4j")
+        assert (metrics["in_use"], metrics["acquisitions"], metrics["calls"]) == (1, 2, 3)
+    metrics = registry.get_pool_metrics("bolt://a", "neo4j")
+    assert (metrics["in_use"], metrics["idle"], metrics["open_sessions"]) == (0, 2, 0)
+    assert registry.get_pool_metrics("bolt://b", "neo4j") is None
+
+
+def test_acquisition_waits_for_a_free_connection():
+    options = {"max_connection_pool_size": 1, "connection_acquisition_timeout": 0.05}
+    with registry.open_session("bolt://a", "neo4j", "pw", **options) as first:
+        first.run("RETURN 1")
+        with registry.open_session("bolt://a", "neo4j", "pw", **options) as second:
+            with pytest.raises(TimeoutError):
+                second.run("RETURN 1")
+            released = threading.Timer(0.01, first.close)
+            released.start()
+            second.execute_write(lambda tx: None)
+            released.join()
+    metrics = registry.get_pool_metrics("bolt://a", "neo4j")
+    assert metrics["acquisitions"] == 2 and metrics["max_acquisition_wait"] > 0
+
+
+def test_replaced_driver_is_closed_with_its_last_session():
+    session = registry.open_session("bolt://a", "neo4j", "old")
+    old = session._entry["driver"]
+    new = registry.get_neo4j_driver("bolt://a", "neo4j", "new")
+    assert new is not old and not old.closed
+    session.run("RETURN 1")
+    session.close()
+    assert old.closed and not new.closed
+
+    registry.close_neo4j_drivers()
+    assert new.closed
@@ -0,0 +1,183 @@
+import os
+import threading
+import pytest
+from core.graph_backend import GraphBackend, Neo4jBackend, registration_parameters
+from core.memory_graph import MemoryGraph
+
+# The Neo4j runs need a disposable database: NEO4J_TEST_URI, NEO4J_TEST_USER, NEO4J_TEST_PASSWORD
+BACKENDS = ["memory", "neo4j"]
+
+NODES = {
+    "Goal": [{"id": "11", "properties": {"name": "Goal 11"}}],
+    "Target": [{"id": "11.2", "properties": {}}],
+    "Indicator": [{"id": "11.2.1", "properties": {}}],
+    "Concept": [{"id": "Population", "properties": {}}, {"id": "PublicTransport", "properties": {}}],
+    "Attribute": [{"id": "Space", "properties": {}}, {"id": "Time", "properties": {}}, {"id": "Value", "properties": {}}]
+}
+EDGES = [
+    ("HAS_TARGET", "Goal", "Target", "11", "11.2"),
+    ("HAS_INDICATOR", "Target", "Indicator", "11.2", "11.2.1"),
+    ("HAS_CONCEPT", "Indicator", "Concept", "11.2.1", "Population"),
+    ("HAS_CONCEPT", "Indicator", "Concept", "11.2.1", "PublicTransport"),
+    ("HAS_ATTRIBUTE", "Concept", "Attribute", "Population", "Space"),
+    ("HAS_ATTRIBUTE", "Concept", "Attribute", "Population", "Time")
+]
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    if request.param == "memory":
+        graph = MemoryGraph()
+    else:
+        if not os.environ.get("NEO4J_TEST_URI"):
+            pytest.skip("NEO4J_TEST_URI is not set")
+        from core.graph_utils import get_neo4j_session
+        graph = Neo4jBackend(get_neo4j_session(
+            os.environ["NEO4J_TEST_URI"], os.environ.get("NEO4J_TEST_USER", "neo4j"), os.environ["NEO4J_TEST_PASSWORD"]
+        ))
+    graph.clear()
+    for label, rows in NODES.items():
+        graph.merge_nodes(label, rows)
+    for rel_type, source_label, target_label, source, target in EDGES:
+        graph.merge_edges(rel_type, source_label, target_label, [{"source": source, "target": target}])
+    yield graph
+    graph.close()
+
+
+def register(graph, name, concept="Population", mapping=None, return_subgraph=False, metadata=None):
+    return graph.register_database(registration_parameters(
+        name, f"data/{name}.csv", f"data/{name}.geojson", "utf-8", ";", concept,
+        mapping if mapping is not None else {"CODE_IRIS": "Space", "ANNEE": "Time", "LIBELLE": "Drop"},
+        return_subgraph, metadata
+    ))
+
+
+def test_register_database(backend):
+    records = register(backend, "INSEE", return_subgraph=True)
+    assert sorted((r["col"]["name"], r["attr"]["id"]) for r in records) == [("ANNEE", "Time"), ("CODE_IRIS", "Space")]
+    assert sorted(r["col"]["id"] for r in records) == ["INSEE/ANNEE", "INSEE/CODE_IRIS"]
+    record = records[0]
+    assert (record["g"]["id"], record["t"]["id"], record["i"]["id"], record["c"]["id"]) == ("11", "11.2", "11.2.1", "Population")
+    assert "Database" in record["db"].labels
+    assert record["db"]["csv_filepath"] == "data/INSEE.csv" and record["db"]["csv_separator"] == ";"
+    assert register(backend, "INSEE") is None
+    assert register(backend, "OSM", concept="PublicTransport", mapping={"osm_id": "Space"}) == []
+
+
+def test_lineage_rows(backend):
+    register(backend, "INSEE")
+    register(backend, "OSM", concept="PublicTransport", mapping={"osm_id": "Space", "year": "Time"})
+    rows = backend.lineage_rows("11.2.1")
+    assert [(row["concept"], row["database"]) for row in rows] == [("Population", "INSEE"), ("PublicTransport", "OSM")]
+    assert sorted(map(tuple, rows[0]["columns"])) == [("ANNEE", "Time"), ("CODE_IRIS", "Space")]
+    assert sorted(map(tuple, rows[1]["columns"])) == [("osm_id", "Space"), ("year", "Time")]
+    assert (rows[0]["csv_path"], rows[0]["geojson_path"], rows[0]["encoding"], rows[0]["separator"]) == (
+        "data/INSEE.csv", "data/INSEE.geojson", "utf-8", ";"
+    )
+    assert backend.lineage_rows("1.1.1") == []
+
+
+def test_lineage_rows_keep_each_database_mapping(backend):
+    register(backend, "Stops", concept="PublicTransport", mapping={"osm_id": "Space", "year": "Time"})
+    register(backend, "Counts", concept="PublicTransport", mapping={"year": "Value"})
+    rows = {row["database"]: sorted(map(tuple, row["columns"])) for row in backend.lineage_rows("11.2.1")}
+    assert rows["Stops"] == [("osm_id", "Space"), ("year", "Time")]
+    assert rows["Counts"] == [("year", "Value")]
+
+
+def test_catalog_rows(backend):
+    register(backend, "INSEE", metadata={"space": "92", "time": "2017-2022", "context": "Women", "reliability": 0.9})
+    register(backend, "OSM", concept="PublicTransport", mapping={})
+    rows = {row["name"]: row for row in backend.catalog_rows([])}
+    assert set(rows) == {"INSEE", "OSM"}
+    assert (rows["INSEE"]["D_s"], rows["INSEE"]["D_t"], rows["INSEE"]["D_c"], rows["INSEE"]["D_r"]) == ("92", "2017-2022", "Women", 0.9)
+    assert rows["INSEE"]["D_p"] is None
+    assert rows["INSEE"]["concepts"] == ["Population"] and rows["OSM"]["concepts"] == ["PublicTransport"]
+    assert [row["name"] for row in backend.catalog_rows(["INSEE"])] == ["OSM"]
+
+
+def test_subgraph(backend):
+    nodes, edges = backend.subgraph(["Goal", "Target", "Indicator"])
+    assert sorted((n["label"], n["id"], n["name"]) for n in nodes) == [
+        ("Goal", "11", "Goal 11"), ("Indicator", "11.2.1", "11.2.1"), ("Target", "11.2", "11.2")
+    ]
+    assert all(n["description"] == "No description available." and n["image"] is None for n in nodes)
+    assert sorted(edges) == [("11", "11.2", "HAS_TARGET"), ("11.2", "11.2.1", "HAS_INDICATOR")]
+    assert backend.checksum() == (8, 6)
+
+
+def test_fetch_graph(backend):
+    pytest.importorskip("streamlit")
+    pytest.importorskip("streamlit_agraph")
+    from core.graph_utils import fetch_graph
+    nodes, edges = fetch_graph(backend, ["Indicator", "Concept"])
+    assert sorted(nodes) == ["11.2.1", "Population", "PublicTransport"]
+    assert sorted((e.source, e.target, e.label) for e in edges) == [
+        ("11.2.1", "Population", "HAS_CONCEPT"), ("11.2.1", "PublicTransport", "HAS_CONCEPT")
+    ]
+
+
+def test_memory_graph_log(tmp_path):
+    path = str(tmp_path / "graph.json")
+    graph = MemoryGraph(path)
+    graph.merge_nodes("Concept", NODES["Concept"])
+    register(graph, "INSEE")
+    # Writes go to the log, the snapshot is only written by flush
+    assert not os.path.exists(path) and os.path.exists(f"{path}.log")
+    assert MemoryGraph.load(path).lineage_rows("11.2.1") == graph.lineage_rows("11.2.1")
+    assert MemoryGraph.load(path).checksum() == graph.checksum()
+    graph.flush()
+    assert os.path.exists(path) and not os.path.exists(f"{path}.log")
+    graph.clear()
+    assert MemoryGraph.load(path).checksum() == (0, 0)
+
+
+def test_memory_graph_reads_wait_for_writes():
+    graph = MemoryGraph()
+    graph.merge_nodes("Concept", NODES["Concept"])
+    read = threading.Event()
+    reader = threading.Thread(target=lambda: (graph.checksum(), graph.find_rows("Concept", "Pop", 5), read.set()))
+    with graph._lock:
+        # A write operation in progress holds the lock: the reader waits for it
+        reader.start()
+        assert not read.wait(0.2)
+    assert read.wait(5)
+    reader.join()
+
+
+def test_incomplete_backend_fails_at_instantiation():
+    class ReadOnlyGraph(GraphBackend):
+        def concepts(self):
+            return []
+
+    with pytest.raises(TypeError, match="abstract"):
+        ReadOnlyGraph()
+
+
+class RecordingTransaction:
+    def __init__(self):
+        self.batches = []
+
+    def run(self, query, rows):
+        self.batches.append(len(rows))
+        return self
+
+    def consume(self):
+        pass
+
+
+class RecordingSession:
+    def __init__(self):
+        self.tx = RecordingTransaction()
+
+    def execute_write(self, work):
+        return work(self.tx)
+
+
+def test_neo4j_bulk_writes_are_batched():
+    session = RecordingSession()
+    graph = Neo4jBackend(session, batch_size=2)
+    rows = [{"id": str(i), "properties": {}} for i in range(5)]
+    assert graph.merge_nodes("Goal", rows) == 5
+    assert graph.merge_edges("HAS_TARGET", "Goal", "Target", [{"source": "1", "target": "2"}] * 5, batch_size=3) == 5
+    assert session.tx.batches == [2, 2, 1, 3, 2]
@@ -0,0 +1,38 @@
+import pytest
+from core import graph_cache
+from core.graph_cache import SnapshotCache, cached_elements
+from core.memory_graph import MemoryGraph
+
+
+@pytest.fixture(autouse=True)
+def snapshot_cache(monkeypatch):
+    cache = SnapshotCache()
+    monkeypatch.setattr(graph_cache, "snapshot_cache", cache)
+    return cache
+
+
+def graph(path, goal):
+    graph = MemoryGraph(path)
+    graph.merge_node("Goal", goal)
+    return graph
+
+
+def test_graphs_with_the_same_counts_do_not_share_snapshots(tmp_path):
+    config = {"snapshot_dir": str(tmp_path / "snapshots")}
+    first, second = graph(None, "11"), graph(None, "12")
+    assert first.checksum() == second.checksum()
+    build = lambda session: lambda: {"nodes": [session.properties[0]["id"]]}
+    assert cached_elements(first, ["Goal"], build(first), config) == {"nodes": ["11"]}
+    assert cached_elements(second, ["Goal"], build(second), config) == {"nodes": ["12"]}
+    assert cached_elements(first, ["Goal"], lambda: pytest.fail("rebuilt"), config) == {"nodes": ["11"]}
+
+
+def test_snapshots_persist_per_graph_file(tmp_path, snapshot_cache):
+    config = {"snapshot_dir": str(tmp_path / "snapshots")}
+    sdgraph = graph(str(tmp_path / "sdgraph.json"), "11")
+    cached_elements(sdgraph, ["Goal"], lambda: {"nodes": ["11"]}, config)
+    # A new process: only the files on disk are left
+    snapshot_cache._entries.clear()
+    assert cached_elements(sdgraph, ["Goal"], lambda: pytest.fail("rebuilt"), config) == {"nodes": ["11"]}
+    other = graph(str(tmp_path / "other.json"), "12")
+    assert cached_elements(other, ["Goal"], lambda: {"nodes": ["12"]}, config) == {"nodes": ["12"]}
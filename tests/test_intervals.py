@@ -0,0 +1,63 @@
+import datetime
+import numpy as np
+import pytest
+from core.intervals import EARLIEST_YEAR, IntervalTree, overlap_fraction, parse_interval
+
+TODAY = datetime.date(2024, 6, 1)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2017-2022", (2017, 2022)),
+    ("2022 to 2017", (2017, 2022)),
+    ("Since 2017", (2017, 2024)),
+    ("2017+", (2017, 2024)),
+    ("after 2017", (2018, 2024)),
+    ("après 2024", (2025, 2025)),
+    ("until 2020", (EARLIEST_YEAR, 2020)),
+    ("jusqu'en 2020", (EARLIEST_YEAR, 2020)),
+    ("before 2020", (EARLIEST_YEAR, 2019)),
+    ("Avant 2020", (EARLIEST_YEAR, 2019)),
+    ("2019", (2019, 2019)),
+    ("census of 2015, updated 2018", (2015, 2018)),
+    ("", None),
+    (None, None)
+])
+def test_parse_interval(text, expected):
+    assert parse_interval(text, today=TODAY) == expected
+
+
+def test_overlap_fraction():
+    starts, ends = np.array([2014, 2018, 2023, 2019]), np.array([2024, 2019, 2025, 2019])
+    assert overlap_fraction(starts, ends, (2017, 2020)).tolist() == pytest.approx([1.0, 0.5, 0.0, 0.25])
+
+
+INTERVALS = [(2014, 2024, "OSM"), (2017, 2022, "INSEE"), (2018, 2023, "Paris"), (2019, 2019, "Census"),
+             (2000, 2010, "Old"), (2023, 2025, "New")]
+
+
+@pytest.mark.parametrize("query", [(2017, 2020), (2019, 2019), (2011, 2013), (2024, 2030), (1990, 2000), (2010, 2014)])
+def test_interval_tree_matches_brute_force(query):
+    tree = IntervalTree(INTERVALS)
+    start, end = query
+    assert sorted(tree.overlapping(start, end)) == sorted(
+        name for s, e, name in INTERVALS if s <= end and e >= start
+    )
+    assert sorted(tree.covering(start, end)) == sorted(
+        name for s, e, name in INTERVALS if s <= start and e >= end
+    )
+
+
+def test_interval_tree_random():
+    rng = np.random.default_rng(0)
+    starts = rng.integers(1990, 2030, 200)
+    intervals = [(int(s), int(s + length), i) for i, (s, length) in enumerate(zip(starts, rng.integers(0, 15, 200)))]
+    tree = IntervalTree(intervals)
+    for start in range(1985, 2045, 3):
+        end = start + 4
+        assert sorted(tree.overlapping(start, end)) == [i for s, e, i in intervals if s <= end and e >= start]
+        assert sorted(tree.covering(start, end)) == [i for s, e, i in intervals if s <= start and e >= end]
+
+
+def test_empty_interval_tree():
+    tree = IntervalTree([])
+    assert tree.overlapping(2017, 2020) == [] and tree.covering(2017, 2020) == []
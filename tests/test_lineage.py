@@ -0,0 +1,69 @@
+import pytest
+from core.graph_backend import registration_parameters
+from core import data_cache
+from core.lineage import load_attributes, resolve_lineage, source_datasets
+from core.memory_graph import MemoryGraph
+
+
+def graph_with_concept():
+    graph = MemoryGraph()
+    indicator = graph.merge_node("Indicator", "11.2.1")
+    graph.merge_edge(indicator, "HAS_CONCEPT", graph.merge_node("Concept", "PublicTransport"))
+    return graph
+
+
+def test_resolve_lineage_per_database():
+    graph = graph_with_concept()
+    for name, mapping in [("Stops", {"osm_id": "Space", "year": "Time"}), ("Counts", {"year": "Value"})]:
+        graph.register_database(registration_parameters(
+            name, f"{name}.csv", f"{name}.geojson", "latin-1", ";", "PublicTransport", mapping
+        ))
+    sources = {source["database"]: source for source in resolve_lineage(graph, "11.2.1")["PublicTransport"]}
+    assert sources["Stops"]["columns"] == {"osm_id": "Space", "year": "Time"}
+    assert sources["Counts"]["columns"] == {"year": "Value"}
+    assert (sources["Stops"]["encoding"], sources["Stops"]["separator"]) == ("latin-1", ";")
+
+
+def test_resolve_lineage_rejects_a_column_with_several_attributes():
+    # Column nodes shared between databases, as registered before they were scoped to their database
+    graph = graph_with_concept()
+    column = graph.merge_node("Column", "year")
+    for name, attribute in [("Stops", "Time"), ("Counts", "Value")]:
+        db = graph.merge_node("Database", name, {"csv_filepath": f"{name}.csv", "geojson_filepath": f"{name}.geojson"})
+        graph.merge_edge(graph.find("PublicTransport", "Concept"), "HAS_INSTANCE", db)
+        graph.merge_edge(db, "HAS_COLUMN", column)
+        graph.merge_edge(column, "IS_MAPPED_TO", graph.merge_node("Attribute", attribute))
+    with pytest.raises(ValueError, match="several attributes"):
+        resolve_lineage(graph, "11.2.1")
+
+
+def register(graph, name, mapping, csv_path=None):
+    graph.register_database(registration_parameters(
+        name, csv_path or f"{name}.csv", f"{name}.geojson", "utf-8", ",", "PublicTransport", mapping
+    ))
+
+
+def test_resolve_lineage_is_cached_per_graph():
+    first, second = graph_with_concept(), graph_with_concept()
+    register(first, "Stops", {"year": "Time"})
+    register(second, "Stops", {"year": "Space"})
+    lineage = resolve_lineage(first, "11.2.1")
+    assert resolve_lineage(first, "11.2.1") is lineage
+    # Same node and relationship counts, another graph
+    assert resolve_lineage(second, "11.2.1")["PublicTransport"][0]["columns"] == {"year": "Space"}
+
+    register(first, "Counts", {"year": "Value"})
+    assert [source["database"] for source in resolve_lineage(first, "11.2.1")["PublicTransport"]] == ["Counts", "Stops"]
+
+
+def test_load_attributes_leaves_the_bundled_datasets_as_is(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_cache, "CACHE_DIR", str(tmp_path / "parquet"))
+    csv_path = tmp_path / "stops.csv"
+    csv_path.write_text("osm_id;year;name\n0012;2017;a\n0013;2018;b\n", encoding="utf-8")
+    bundled = dict(data_cache.DATASETS)
+    source = {"database": "My Stops", "csv_path": str(csv_path), "geojson_path": "", "encoding": "utf-8",
+              "separator": ";", "columns": {"osm_id": "Space", "year": "Time", "gone": "Capacity"}}
+    frame = load_attributes(source, ["Space", "Time", "Capacity"], years=[2018])
+    assert frame.to_dict("records") == [{"Space": "0013", "Time": 2018}]
+    assert data_cache.DATASETS == bundled
+    assert set(source_datasets(source)) - set(bundled) == {"db_my_stops"}
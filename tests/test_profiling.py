@@ -0,0 +1,59 @@
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from core.profiling import HyperLogLog, Reservoir, profile_csv, profile_samples, upload_hash
+
+
+@pytest.mark.parametrize("p", [4, 8, 12, 14])
+def test_hyperloglog_rank_is_exact(p):
+    hll = HyperLogLog(p)
+    hll.update(pd.Series(np.arange(50_000)))
+    hashes = pd.util.hash_pandas_object(pd.Series(np.arange(50_000)), index=False).to_numpy(dtype=np.uint64)
+    expected = np.zeros(1 << p, dtype=np.uint8)
+    for value in hashes.tolist():
+        rest = value >> p
+        rank = 64 - p - rest.bit_length() + 1
+        expected[value & ((1 << p) - 1)] = max(expected[value & ((1 << p) - 1)], rank)
+    assert np.array_equal(hll.registers, expected)
+
+
+def test_hyperloglog_count():
+    hll = HyperLogLog()
+    for start in range(0, 100_000, 10_000):
+        hll.update(pd.Series(np.arange(start, start + 10_000) % 30_000))
+    assert hll.count() == pytest.approx(30_000, rel=0.05)
+
+
+def test_reservoir_keeps_distinct_values():
+    reservoir = Reservoir(k=10)
+    for _ in range(3):
+        reservoir.update(pd.Series(["bus"] * 1000 + ["tram"] * 10 + [f"line {i}" for i in range(20)]))
+    assert len(reservoir.values) == len(set(reservoir.values)) == 10
+
+    reservoir = Reservoir(k=10)
+    reservoir.update(pd.Series([2017, 2017, 2018, None]))
+    reservoir.update(pd.Series([2018, 2019]))
+    assert sorted(reservoir.values) == [2017, 2018, 2019]
+
+
+def test_profile_samples_are_distinct():
+    csv = "ANNEE,MODE\n" + "".join(f"{2017 + i % 3},{'bus' if i % 5 else 'tram'}\n" for i in range(500))
+    profile = profile_csv(io.StringIO(csv), chunksize=100)
+    assert sorted(profile_samples(profile)["ANNEE"]) == [2017, 2018, 2019]
+    assert sorted(profile_samples(profile)["MODE"]) == ["bus", "tram"]
+    assert profile["rows"] == 500
+
+
+class Upload(io.BytesIO):
+    file_id = "upload-1"
+
+
+def test_upload_hash_is_memoized_per_file_id():
+    memo = {}
+    upload = Upload(b"a,b\n1,2\n")
+    digest = upload_hash(upload, memo)
+    assert memo == {"upload_hash_upload-1": digest}
+    # A rerun of the page does not read the upload again
+    upload.read = None
+    assert upload_hash(upload, memo) == digest
@@ -0,0 +1,107 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import Point, box
+from core.distance_engine import StopDistanceEngine
+from core.indicators.sdg_11_2_1 import Indicator11_2_1, weighted_accessibility
+
+# Two IRIS of Antony (92) under bus stop a, one IRIS of Paris (75) reached by the tram stop b from 2018 on
+UNITS = gpd.GeoDataFrame(
+    {"id": ["920040101", "920040102", "92004", "750010101", "75001"]},
+    geometry=[box(0, 0, 100, 100), box(100, 0, 200, 100), box(0, 0, 200, 100), box(0, 1000, 100, 1100),
+              box(0, 1000, 100, 1100)],
+    crs="EPSG:2154"
+)
+STOPS = gpd.GeoDataFrame({"id": ["a", "b"]}, geometry=[Point(50, 150), Point(50, 1300)], crs="EPSG:2154")
+STOP_YEARS = pd.DataFrame({
+    "osm_id": ["a", "a", "b"], "fclass": ["bus_stop", "bus_stop", "tram_stop"], "year": [2017, 2018, 2018]
+})
+POPULATION = pd.DataFrame({
+    "CODE_IRIS": ["920040101", "920040102", "750010101"] * 2,
+    "CODE_COMMUNE": ["92004", "92004", "75001"] * 2,
+    "ANNEE_DONNEES": [2017] * 3 + [2018] * 3,
+    "MODE_TRANS": ["all"] * 6,
+    "VALEUR": [10.0, 30.0, 60.0] * 2
+})
+DIAGONAL = np.hypot(50, 50)
+
+
+@pytest.fixture(scope="module")
+def indicator():
+    return Indicator11_2_1(POPULATION, UNITS, StopDistanceEngine(STOPS, STOP_YEARS))
+
+
+def test_weighted_accessibility():
+    df = pd.DataFrame({"year": [2017, 2017, 2017, 2018], "VALEUR": [10.0, 30.0, 60.0, 5.0]})
+    grouped = weighted_accessibility(df, [True, False, True, False], by=["year"])
+    assert grouped["year"].tolist() == [2017, 2018]
+    assert grouped["total_VALEUR"].tolist() == [100.0, 5.0]
+    assert grouped["accessible_VALEUR"].tolist() == [70.0, 0.0]
+    assert grouped["ratio"].tolist() == pytest.approx([0.7, 0.0])
+
+
+def test_rows_hold_the_nearest_stop_of_each_year(indicator):
+    rows = indicator.rows(level="IRIS").set_index(["unit_id", "ANNEE_DONNEES"])
+    assert rows.loc[("920040102", 2017), "distance"] == pytest.approx(DIAGONAL)
+    assert rows.loc[("750010101", 2017), ["transport_id", "distance"]].tolist() == ["a", pytest.approx(850)]
+    assert rows.loc[("750010101", 2018), ["transport_id", "distance"]].tolist() == ["b", pytest.approx(200)]
+    communes = indicator.rows(level="COMMUNE", years=[2018]).set_index("unit_id")
+    assert communes["VALEUR"].to_dict() == {"75001": 60.0, "92004": 40.0}
+    assert communes.loc["92004", "distance"] == pytest.approx(50)
+
+
+@pytest.mark.parametrize("filters, expected", [
+    ({"level": "IRIS"}, {2017: 2 / 3, 2018: 2 / 3}),
+    ({"level": "COMMUNE"}, {2017: 1 / 2, 2018: 1 / 2}),
+    ({"level": "IRIS", "units": ["92"]}, {2017: 1.0, 2018: 1.0}),
+    ({"level": "IRIS", "units": ["750010101"], "years": [2018]}, {2018: 0.0}),
+    # No tram stop in 2017: that year has no row left
+    ({"level": "IRIS", "fclasses": ["tram_stop"]}, {2018: 0.0})
+])
+def test_query_filters(indicator, filters, expected):
+    shares = indicator.query(100, **filters)
+    assert shares.to_dict() == pytest.approx(expected)
+    assert shares.name == "under_threshold"
+
+
+def brute_force_sweep(rows, thresholds, weighted):
+    """ Year x threshold shares computed threshold by threshold from the filtered rows. """
+    weights = rows["VALEUR"] if weighted else pd.Series(1.0, index=rows.index)
+    return pd.DataFrame({
+        float(threshold): (weights * (rows["distance"] <= threshold)).groupby(rows["ANNEE_DONNEES"]).sum()
+        / weights.groupby(rows["ANNEE_DONNEES"]).sum()
+        for threshold in thresholds
+    })
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+@pytest.mark.parametrize("filters", [
+    {"level": "IRIS"},
+    {"level": "COMMUNE"},
+    {"level": "IRIS", "units": ["75"], "fclasses": ["tram_stop"]}
+])
+def test_sweep_matches_brute_force(indicator, filters, weighted):
+    thresholds = [1000, 50, 60, DIAGONAL, 100, 200, 850]
+    sweep = indicator.sweep(thresholds, weighted=weighted, **filters)
+    expected = brute_force_sweep(indicator.rows(**filters), sorted(thresholds), weighted)
+    assert list(sweep.columns) == sorted(thresholds)
+    assert np.allclose(sweep.to_numpy(), expected.to_numpy())
+    assert sweep.index.tolist() == expected.index.tolist()
+
+
+def test_sweep_values(indicator):
+    # A distance equal to the threshold is within it
+    sweep = indicator.sweep([50, 100, 300, 1000], level="IRIS", weighted=True)
+    assert sweep.loc[2017].tolist() == pytest.approx([0.1, 0.4, 0.4, 1.0])
+    assert sweep.loc[2018].tolist() == pytest.approx([0.1, 0.4, 1.0, 1.0])
+    assert indicator.sweep([100], level="IRIS").iloc[:, 0].tolist() == pytest.approx([2 / 3, 2 / 3])
+
+
+def test_sweep_by_unit(indicator):
+    sweep = indicator.sweep([100, 300], level="IRIS", weighted=True, by_unit=True)
+    assert sweep.index.names == ["unit_id", "ANNEE_DONNEES"]
+    assert sweep.loc[("750010101", 2017)].tolist() == [0.0, 0.0]
+    assert sweep.loc[("750010101", 2018)].tolist() == [0.0, 1.0]
+    assert sweep.loc[("920040102", 2018)].tolist() == [1.0, 1.0]
+    assert len(sweep) == 6
@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+from core.spatial_hierarchy import (
+    SIM_CONTAINS, SIM_EQUAL, SIM_WITHIN, SpatialHierarchy, level_of, normalize_code, parent_of
+)
+
+# Antony (92), Ajaccio (2A), Bastia (2B) and Les Abymes (971) IRIS, and the commune of Mamoudzou (976)
+CODES = ["920040101", "920040102", "2A0040101", "2B0330000", "971010101", "97611"]
+
+
+@pytest.mark.parametrize("text, code", [
+    ("92 - Hauts-de-Seine", "92"),
+    ("2A - Corse-du-Sud", "2A"),
+    ("2b033", "2B033"),
+    ("971 - Guadeloupe", "971"),
+    ("97101", "97101"),
+    ("r94 Corse", "R94"),
+    ("FR", "FR"),
+    ("Hauts-de-Seine", "Hauts-de-Seine"),
+    (None, "")
+])
+def test_normalize_code(text, code):
+    assert normalize_code(text) == code
+
+
+@pytest.mark.parametrize("code, level, parent", [
+    ("920040101", "IRIS", "92004"),
+    ("2A004", "COMMUNE", "2A"),
+    ("97101", "COMMUNE", "971"),
+    ("2B", "DEPARTEMENT", "R94"),
+    ("976", "DEPARTEMENT", "R06"),
+    ("R11", "REGION", "FR"),
+    ("FR", "COUNTRY", None)
+])
+def test_levels_and_parents(code, level, parent):
+    assert level_of(code) == level
+    assert parent_of(code) == parent
+
+
+@pytest.fixture
+def hierarchy():
+    return SpatialHierarchy(CODES)
+
+
+def test_ancestors(hierarchy):
+    assert hierarchy.ancestors["2A0040101"] == ("2A004", "2A", "R94", "FR")
+    assert hierarchy.ancestors["971010101"] == ("97101", "971", "R01", "FR")
+    assert hierarchy.ancestors["97611"] == ("976", "R06", "FR")
+    # Ancestors are known codes too
+    assert hierarchy.ancestors["2B033"] == ("2B", "R94", "FR")
+
+
+def test_within(hierarchy):
+    assert hierarchy.within("R94", "IRIS") == {"2A0040101", "2B0330000"}
+    assert hierarchy.within("92 - Hauts-de-Seine", "COMMUNE") == {"92004"}
+    assert hierarchy.within("971") == {"97101", "971010101"}
+    assert hierarchy.within("75") == set()
+
+
+def test_similarity(hierarchy):
+    assert hierarchy.similarity("92", "92") == SIM_EQUAL
+    assert hierarchy.similarity("92 - Hauts-de-Seine", "92004") == SIM_CONTAINS
+    assert hierarchy.similarity("920040101", "R11") == SIM_WITHIN
+    assert hierarchy.similarity("2A", "2B033") == 0.0
+    assert hierarchy.similarity("R01", "97101") == SIM_CONTAINS
+    assert hierarchy.similarity("", "92") == 0.0
+
+
+def test_code_column(hierarchy):
+    codes = ["920040101", "2A0040101", "971010101", "920040102"]
+    assert hierarchy.code_column(codes, "COMMUNE").tolist() == ["92004", "2A004", "97101", "92004"]
+    assert hierarchy.code_column(codes, "DEPARTEMENT").tolist() == ["92", "2A", "971", "92"]
+    assert hierarchy.code_column(codes, "REGION").tolist() == ["R11", "R94", "R01", "R11"]
+
+
+def test_rollup(hierarchy):
+    df = pd.DataFrame({
+        "CODE_IRIS": ["920040101", "920040102", "2A0040101", "2B0330000"] * 2,
+        "year": [2017] * 4 + [2018] * 4,
+        "VALEUR": [1.0, 2.0, 4.0, 8.0, 10.0, 20.0, 40.0, 80.0]
+    })
+    tables = hierarchy.rollup(df, "CODE_IRIS", ["VALEUR"], by=["year"], levels=["COMMUNE", "DEPARTEMENT", "REGION"])
+    communes = tables["COMMUNE"].set_index(["CODE", "year"])["VALEUR"]
+    assert communes[("92004", 2017)] == 3.0 and communes[("2B033", 2018)] == 80.0
+    regions = tables["REGION"].set_index(["CODE", "year"])["VALEUR"].to_dict()
+    assert regions == {("R11", 2017): 3.0, ("R11", 2018): 30.0, ("R94", 2017): 12.0, ("R94", 2018): 120.0}